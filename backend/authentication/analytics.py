@@ -0,0 +1,192 @@
+"""
+Daily rollup of the admin analytics counts.
+
+Every DailyStats row holds one day's new users, uploaded documents and
+average originality. Creating or deleting a user, or saving or deleting a
+document, recomputes the row of the day it belongs to, so the analytics
+endpoint only reads pre-aggregated rows instead of grouping raw tables on
+every request. Bulk writes bypass the signals; `python manage.py
+rebuild_daily_stats` recomputes the rows from scratch.
+
+The originality score distribution is not rolled up: score_distribution
+counts every band in one CASE aggregate served by the Document score index.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Avg, Case, Count, IntegerField, Q, Sum, When
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from document_processor.models import Document
+
+from .models import DailyStats, User
+
+# Document fields that feed the rollup; saves touching only other fields are skipped
+ROLLUP_DOCUMENT_FIELDS = {'uploaded_at', 'originality_score'}
+
+# Originality score bands of the distribution chart, as (label, lowest score)
+SCORE_BANDS = [
+    ('Verified', 90),
+    ('Minor issues', 75),
+    ('Significant issues', 50),
+    ('Critical issues', None),
+]
+VERIFIED_SCORE = SCORE_BANDS[0][1]  # Scored documents below this count towards the plagiarism rate
+
+
+def day_bounds(day):
+    """Return the aware [start, end) datetimes of a calendar day in the current time zone."""
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def _grouped(queryset, field, **aggregates):
+    """Aggregate a queryset per calendar day of a datetime field."""
+    rows = (
+        queryset.annotate(day=TruncDate(field, tzinfo=timezone.get_current_timezone()))
+        .values('day')
+        .annotate(**aggregates)
+        .order_by()
+    )
+    return {row.pop('day'): row for row in rows}
+
+
+def compute_days(since=None, until=None):
+    """
+    Compute the rollup of every day with activity between two dates.
+
+    Args:
+        since: First day to include; None for the beginning
+        until: Day after the last one to include; None for no end
+
+    Returns:
+        dict: DailyStats field values keyed by date
+    """
+    def window(field):
+        bounds = {}
+        if since is not None:
+            bounds[f'{field}__gte'] = day_bounds(since)[0]
+        if until is not None:
+            bounds[f'{field}__lt'] = day_bounds(until)[0]
+        return bounds
+
+    sources = [
+        _grouped(
+            User.objects.filter(**window('date_joined')), 'date_joined',
+            new_users=Count('id'),
+        ),
+        _grouped(
+            Document.objects.filter(**window('uploaded_at')), 'uploaded_at',
+            documents=Count('id'),
+            scored_documents=Count('originality_score'),
+            avg_originality=Avg('originality_score'),
+        ),
+    ]
+
+    days = defaultdict(dict)
+    for source in sources:
+        for day, values in source.items():
+            days[day].update(values)
+    return days
+
+
+def refresh_day(day):
+    """Recompute the DailyStats row of one day, deleting it once the day has no activity left."""
+    values = compute_days(day, day + datetime.timedelta(days=1)).get(day)
+    if values:
+        defaults = {field.name: field.get_default() for field in DailyStats._meta.concrete_fields
+                    if field.name not in ('id', 'date', 'updated_at')}
+        defaults.update(values)
+        DailyStats.objects.update_or_create(date=day, defaults=defaults)
+    else:
+        DailyStats.objects.filter(date=day).delete()
+
+
+def rebuild(since=None):
+    """
+    Recompute every DailyStats row from the raw tables.
+
+    Args:
+        since: Only rebuild days from this date on; None rebuilds everything
+
+    Returns:
+        int: Number of rows written
+    """
+    days = compute_days(since)
+    rows = [DailyStats(date=day, **values) for day, values in sorted(days.items())]
+    with transaction.atomic():
+        stale = DailyStats.objects.all()
+        if since is not None:
+            stale = stale.filter(date__gte=since)
+        stale.delete()
+        DailyStats.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _count(condition):
+    return Sum(Case(When(condition, then=1), default=0, output_field=IntegerField()))
+
+
+def score_distribution(period_start):
+    """
+    Count scored documents per score band in a single CASE-based aggregate.
+
+    Args:
+        period_start: Start of the current period; documents uploaded before
+            it are also counted separately for the period-over-period change
+
+    Returns:
+        dict: 'bands' as (label, count) pairs in SCORE_BANDS order, plus
+            'previous_scored' and 'previous_flagged' document counts
+    """
+    aggregates = {}
+    upper = None
+    for i, (label, lower) in enumerate(SCORE_BANDS):
+        condition = Q()
+        if lower is not None:
+            condition &= Q(originality_score__gte=lower)
+        if upper is not None:
+            condition &= Q(originality_score__lt=upper)
+        aggregates[f'band_{i}'] = _count(condition)
+        upper = lower
+    before = Q(uploaded_at__lt=period_start)
+    aggregates['previous_scored'] = _count(before)
+    aggregates['previous_flagged'] = _count(before & Q(originality_score__lt=VERIFIED_SCORE))
+
+    counts = Document.objects.filter(originality_score__isnull=False).aggregate(**aggregates)
+    return {
+        'bands': [(label, counts[f'band_{i}'] or 0) for i, (label, _) in enumerate(SCORE_BANDS)],
+        'previous_scored': counts['previous_scored'] or 0,
+        'previous_flagged': counts['previous_flagged'] or 0,
+    }
+
+
+def refresh_for(value):
+    if value is not None:
+        refresh_day(timezone.localdate(value))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        refresh_for(instance.date_joined)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    refresh_for(instance.date_joined)
+
+
+@receiver(post_save, sender=Document)
+def document_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or ROLLUP_DOCUMENT_FIELDS.intersection(update_fields):
+        refresh_for(instance.uploaded_at)
+
+
+@receiver(post_delete, sender=Document)
+def document_deleted(sender, instance, **kwargs):
+    refresh_for(instance.uploaded_at)
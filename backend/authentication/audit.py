@@ -0,0 +1,171 @@
+"""
+Persistent audit event log.
+
+The auth, upload and suggestion paths write AuditEvent rows through
+record(). The admin logs page reads them newest first with keyset
+pagination: the cursor holds the (timestamp, id) of the last event shown, so
+a page costs the same however deep it is. Without a level filter a page is
+one range scan of the (timestamp, id) index. With one, every requested level
+is its own range scan of the (level, timestamp, id) index, and the per-level
+pages are merged: an IN over several levels would make the database read
+every matching row to sort them. Searching goes through an SQLite FTS5 index over message and
+source (created by migration 0007); other databases fall back to icontains.
+"""
+import base64
+import heapq
+import logging
+import re
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'authentication_auditevent_fts'
+MAX_PAGE_SIZE = 100
+
+_fts_available = None
+
+
+class InvalidCursor(ValueError):
+    """Raised for a pagination cursor that was not produced by encode_cursor."""
+
+
+def record(level, source, message, user=None, **details):
+    """
+    Write an audit event.
+
+    Failures are logged rather than raised, so an event can never break the
+    request that reports it.
+
+    Args:
+        level: 'info', 'warning' or 'error'
+        source: Component that emitted the event, e.g. 'auth-service'
+        message: Human-readable summary; indexed for search
+        user: User the event is about, if any
+        **details: JSON-serializable context shown with the event
+
+    Returns:
+        AuditEvent: The saved event, or None if it could not be written
+    """
+    if user is not None and not user.is_authenticated:
+        user = None
+    try:
+        # Savepoint, so a failed insert leaves an enclosing transaction usable
+        with transaction.atomic():
+            return AuditEvent.objects.create(
+                level=level, source=source, message=message, user=user, details=details
+            )
+    except DatabaseError as e:
+        logger.warning(f"Could not record audit event '{message}': {e}")
+        return None
+
+
+def encode_cursor(event):
+    """Return the opaque cursor pointing just past an event."""
+    raw = f'{event.timestamp.isoformat()}|{event.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor produced by encode_cursor.
+
+    Returns:
+        tuple: (timestamp, id) of the last event of the previous page
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+
+def fts_available():
+    """Whether the FTS5 index exists; checked once per process."""
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_available
+
+
+def search(queryset, query):
+    """
+    Filter events to those whose message or source matches every word of a query.
+
+    With FTS5 each word is matched as a prefix ("verif" finds "verification");
+    without it each word is matched as a substring.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return queryset
+    if fts_available():
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)
+        ))
+    for word in words:
+        queryset = queryset.filter(Q(message__icontains=word) | Q(source__icontains=word))
+    return queryset
+
+
+def page_events(levels=None, start=None, end=None, query='', cursor=None, page_size=10):
+    """
+    Return one page of events, newest first.
+
+    Args:
+        levels: Levels to include; None for all. Each level is queried separately
+        start: Only events at or after this time
+        end: Only events before this time
+        query: Search words, see search()
+        cursor: Cursor returned with the previous page; None for the first page
+        page_size: Events per page, capped at MAX_PAGE_SIZE
+
+    Returns:
+        tuple: (list of AuditEvent, cursor of the next page or None)
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    if levels is not None:
+        levels = sorted(set(levels))
+        if set(levels) >= {level for level, _ in AuditEvent.LEVELS}:
+            levels = None  # Every level: no filter, so one scan of the timestamp index
+    events = AuditEvent.objects.all()
+    if start is not None:
+        events = events.filter(timestamp__gte=start)
+    if end is not None:
+        events = events.filter(timestamp__lt=end)
+    if query:
+        events = search(events, query)
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        events = events.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    # One extra row tells whether another page follows
+    scans = [events] if levels is None else [events.filter(level=level) for level in levels]
+    ordered = [scan.order_by('-timestamp', '-id')[:page_size + 1] for scan in scans]
+    page = list(islice(heapq.merge(*ordered, key=attrgetter('timestamp', 'pk'), reverse=True), page_size + 1))
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return page[:page_size], next_cursor
+
+
+def serialize_event(event):
+    return {
+        'id': str(event.pk),
+        'timestamp': event.timestamp.isoformat(),
+        'level': event.level,
+        'message': event.message,
+        'source': event.source,
+        'details': event.details,
+    }
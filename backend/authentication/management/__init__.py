@@ -0,0 +1,3 @@
+"""
+Management commands package for authentication app.
+"""
\ No newline at end of file
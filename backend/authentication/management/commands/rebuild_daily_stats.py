@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from authentication import analytics
+
+class Command(BaseCommand):
+    help = 'Recomputes the DailyStats rollup behind the admin analytics page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Only rebuild the last N days (default: all history)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+        written = analytics.rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} daily rows'))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_systemsetting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('new_users', models.PositiveIntegerField(default=0)),
+                ('verified_users', models.PositiveIntegerField(default=0)),
+                ('profiles', models.PositiveIntegerField(default=0)),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('scored_documents', models.PositiveIntegerField(default=0)),
+                ('avg_originality', models.FloatField(blank=True, null=True)),
+                ('checks', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+    ]
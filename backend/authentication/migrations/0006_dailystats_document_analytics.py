@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:06
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0005_daily_stats'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='dailystats',
+            name='checks',
+        ),
+        migrations.RemoveField(
+            model_name='dailystats',
+            name='profiles',
+        ),
+        migrations.RemoveField(
+            model_name='dailystats',
+            name='verified_users',
+        ),
+    ]
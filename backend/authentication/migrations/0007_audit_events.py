@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models, utils
+
+FTS_TABLE = 'authentication_auditevent_fts'
+
+# External-content FTS5 index over message and source, kept in sync by triggers
+CREATE_FTS = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(message, source, content='authentication_auditevent', content_rowid='id')",
+    f"""CREATE TRIGGER authentication_auditevent_ai AFTER INSERT ON authentication_auditevent BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, message, source) VALUES (new.id, new.message, new.source);
+    END""",
+    f"""CREATE TRIGGER authentication_auditevent_ad AFTER DELETE ON authentication_auditevent BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, message, source) VALUES ('delete', old.id, old.message, old.source);
+    END""",
+    f"""CREATE TRIGGER authentication_auditevent_au AFTER UPDATE ON authentication_auditevent BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, message, source) VALUES ('delete', old.id, old.message, old.source);
+        INSERT INTO {FTS_TABLE} (rowid, message, source) VALUES (new.id, new.message, new.source);
+    END""",
+]
+
+DROP_FTS = [
+    'DROP TRIGGER IF EXISTS authentication_auditevent_ai',
+    'DROP TRIGGER IF EXISTS authentication_auditevent_ad',
+    'DROP TRIGGER IF EXISTS authentication_auditevent_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def create_fts(apps, schema_editor):
+    # Only SQLite builds with FTS5 get the index; audit.py falls back to icontains otherwise
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.fts5_probe")
+    except utils.OperationalError:
+        return
+    for statement in CREATE_FTS:
+        schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_FTS:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0006_dailystats_document_analytics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('level', models.CharField(choices=[('info', 'Info'), ('warning', 'Warning'), ('error', 'Error')], default='info', max_length=10)),
+                ('source', models.CharField(max_length=50)),
+                ('message', models.TextField()),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['level', '-timestamp', '-id'], name='auditevent_level_ts_idx'), models.Index(fields=['-timestamp', '-id'], name='auditevent_ts_idx')],
+            },
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:10
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Avg, Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """Roll up the users and documents that existed before DailyStats, keeping any day already rolled up."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Document = apps.get_model('document_processor', 'Document')
+    DailyStats = apps.get_model('authentication', 'DailyStats')
+    tzinfo = timezone.get_current_timezone()
+
+    def grouped(queryset, field, **aggregates):
+        rows = (
+            queryset.annotate(day=TruncDate(field, tzinfo=tzinfo))
+            .values('day')
+            .annotate(**aggregates)
+            .order_by()
+        )
+        return {row.pop('day'): row for row in rows}
+
+    days = {}
+    for source in (
+        grouped(User.objects.all(), 'date_joined', new_users=Count('id')),
+        grouped(
+            Document.objects.all(), 'uploaded_at',
+            documents=Count('id'),
+            scored_documents=Count('originality_score'),
+            avg_originality=Avg('originality_score'),
+        ),
+    ):
+        for day, values in source.items():
+            days.setdefault(day, {}).update(values)
+
+    existing = set(DailyStats.objects.values_list('date', flat=True))
+    DailyStats.objects.bulk_create([
+        DailyStats(date=day, **values) for day, values in sorted(days.items()) if day not in existing
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_audit_events'),
+        ('document_processor', '0015_document_analytics_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -167,3 +167,43 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+class DailyStats(models.Model):
+    """Per-day rollup of the counts shown on the admin analytics page (see analytics.py)"""
+    date = models.DateField(unique=True)
+    new_users = models.PositiveIntegerField(default=0)
+    documents = models.PositiveIntegerField(default=0)
+    scored_documents = models.PositiveIntegerField(default=0)
+    avg_originality = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date}"
+
+class AuditEvent(models.Model):
+    """Event written by the auth, upload and suggestion paths and shown on the admin logs page (see audit.py)"""
+    LEVELS = (
+        ('info', 'Info'),
+        ('warning', 'Warning'),
+        ('error', 'Error'),
+    )
+
+    timestamp = models.DateTimeField(default=timezone.now)
+    level = models.CharField(max_length=10, choices=LEVELS, default='info')
+    source = models.CharField(max_length=50)
+    message = models.TextField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='audit_events')
+    details = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pages walk (timestamp, id) downwards, per level or across all levels
+            models.Index(fields=['level', '-timestamp', '-id'], name='auditevent_level_ts_idx'),
+            models.Index(fields=['-timestamp', '-id'], name='auditevent_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.level}] {self.message}"
@@ -1,10 +1,21 @@
+import importlib
+from datetime import timedelta
+
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
 from django.test import TestCase
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 
+from document_processor.models import Document
+
+from . import analytics, audit
+from .models import AuditEvent, DailyStats, OTPVerification
+
 class AuthenticationTestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -70,3 +81,196 @@ class AuthenticationTestCase(TestCase):
         
         # Verify token is deleted
         self.assertEqual(Token.objects.count(), 0)
+
+
+class AdminAnalyticsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('admin-analytics')
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'StrongPass123')
+        self.client.force_authenticate(self.admin)
+
+    def create_otps(self, user, offsets):
+        # created_at is auto_now_add, so set it after the insert
+        now = timezone.now()
+        for seconds in offsets:
+            otp = OTPVerification.objects.create(user=user, otp_code='123456', is_used=True)
+            OTPVerification.objects.filter(pk=otp.pk).update(created_at=now - timedelta(seconds=seconds))
+        analytics.rebuild()
+
+    def test_response_time_uses_next_otp_of_same_user(self):
+        other = User.objects.create_user('other', 'other@example.com', 'StrongPass123')
+        self.create_otps(self.admin, [100, 90, 60])
+        self.create_otps(other, [95])
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Gaps of 10s and 30s; the last OTP of each user has no successor
+        self.assertEqual(response.data['stats']['responseTime']['value'], '20.0s')
+
+    def test_query_count_does_not_grow_with_otps(self):
+        self.create_otps(self.admin, [300, 200, 100])
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
+        for i in range(5):
+            user = User.objects.create_user(f'user{i}', f'user{i}@example.com', 'StrongPass123')
+            self.create_otps(user, [50, 40, 30, 20])
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def create_documents(self, scores):
+        for i, score in enumerate(scores):
+            Document.objects.create(title=f'Essay {i}', file_type='pdf', uploaded_by=self.admin, originality_score=score)
+
+    def test_charts_read_daily_rollup(self):
+        self.create_documents([95.0, None])
+
+        response = self.client.get(self.url, {'timeRange': 'week'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        today = timezone.localdate().strftime('%Y-%m-%d')
+        self.assertEqual(len(response.data['charts']['userGrowth']), 7)
+        self.assertEqual(response.data['charts']['userGrowth'][-1], {'date': today, 'users': 1})
+        self.assertEqual(response.data['charts']['documentChecks'][-1], {'date': today, 'checks': 2})
+        self.assertEqual(response.data['stats']['users']['total'], 1)
+        self.assertEqual(response.data['stats']['documents']['total'], 2)
+
+    def test_score_bands_come_from_document_scores(self):
+        self.create_documents([100.0, 92.0, 80.0, 60.0, 10.0, None])
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.data['charts']['plagiarismDistribution'], [
+            {'category': 'Verified', 'value': 40},
+            {'category': 'Minor issues', 'value': 20},
+            {'category': 'Significant issues', 'value': 20},
+            {'category': 'Critical issues', 'value': 20},
+        ])
+        self.assertEqual(response.data['stats']['plagiarismRate']['value'], '60.0%')
+
+
+class DailyStatsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('writer', 'writer@example.com', 'StrongPass123')
+
+    def test_signals_keep_todays_row_current(self):
+        today = timezone.localdate()
+        self.assertEqual(DailyStats.objects.get(date=today).new_users, 1)
+
+        document = Document.objects.create(title='Essay', file_type='pdf', uploaded_by=self.user)
+        document.originality_score = 80.0
+        document.save(update_fields=['originality_score'])
+        Document.objects.create(title='Draft', file_type='pdf', uploaded_by=self.user, originality_score=60.0)
+
+        stats = DailyStats.objects.get(date=today)
+        self.assertEqual((stats.documents, stats.scored_documents, stats.avg_originality), (2, 2, 70.0))
+
+        self.user.delete()
+        self.assertFalse(DailyStats.objects.filter(date=today).exists())
+
+    def test_rebuild_matches_incremental_rows(self):
+        Document.objects.create(title='Essay', file_type='pdf', uploaded_by=self.user, originality_score=75.0)
+        fields = ('date', 'new_users', 'documents', 'avg_originality')
+        expected = list(DailyStats.objects.values_list(*fields))
+        DailyStats.objects.all().delete()
+
+        self.assertEqual(analytics.rebuild(), 1)
+        self.assertEqual(list(DailyStats.objects.values_list(*fields)), expected)
+
+    def test_migration_backfills_existing_rows(self):
+        Document.objects.create(title='Essay', file_type='pdf', uploaded_by=self.user, originality_score=75.0)
+        fields = ('date', 'new_users', 'documents', 'avg_originality')
+        expected = list(DailyStats.objects.values_list(*fields))
+        DailyStats.objects.all().delete()
+
+        migration = importlib.import_module('authentication.migrations.0008_backfill_daily_stats')
+        state = MigrationLoader(connection).project_state(('authentication', '0008_backfill_daily_stats'))
+        migration.backfill_daily_stats(state.apps, None)
+
+        self.assertEqual(list(DailyStats.objects.values_list(*fields)), expected)
+
+
+class AdminLogsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('admin-logs')
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'StrongPass123')
+        self.client.force_authenticate(self.admin)
+
+    def get_logs(self, **params):
+        params.setdefault('timeRange', 'week')
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_cursor_pages_cover_every_event_once(self):
+        for i in range(25):
+            audit.record('info', 'user-service', f'Event {i}')
+
+        ids = []
+        cursor = None
+        sizes = []
+        while True:
+            params = {'pageSize': 10}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.get_logs(**params)
+            sizes.append(len(data['logs']))
+            ids.extend(log['id'] for log in data['logs'])
+            cursor = data['nextCursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(sizes, [10, 10, 5])
+        expected = [str(pk) for pk in AuditEvent.objects.order_by('-timestamp', '-id').values_list('id', flat=True)]
+        self.assertEqual(ids, expected)
+
+    def test_deep_page_costs_one_query(self):
+        for i in range(30):
+            audit.record('warning' if i % 2 else 'info', 'auth-service', f'Login attempt {i}')
+        audit.fts_available()
+        first = self.get_logs(pageSize=5, levels=['warning'], search='login')
+
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'pageSize': 5, 'levels': ['warning'], 'search': 'login',
+                                       'timeRange': 'week', 'cursor': first['nextCursor']})
+
+    def test_several_levels_are_merged_from_one_scan_each(self):
+        for i in range(12):
+            audit.record(['info', 'warning', 'error'][i % 3], 'auth-service', f'Event {i}')
+
+        with self.assertNumQueries(2):
+            events, cursor = audit.page_events(levels=['error', 'warning', 'error'], page_size=5)
+        with self.assertNumQueries(1):
+            audit.page_events(levels=['info', 'warning', 'error'], page_size=5)
+
+        expected = list(AuditEvent.objects.exclude(level='info').order_by('-timestamp', '-id')[:5])
+        self.assertEqual(events, expected)
+        rest, _ = audit.page_events(levels=['warning', 'error'], page_size=5, cursor=cursor)
+        self.assertEqual(rest, list(AuditEvent.objects.exclude(level='info').order_by('-timestamp', '-id')[5:8]))
+
+    def test_search_and_level_filters(self):
+        audit.record('warning', 'auth-service', 'OTP verification failed for user bob')
+        audit.record('info', 'document-service', 'Document uploaded: essay.pdf')
+        audit.record('error', 'document-service', 'Text extraction failed for document essay.pdf')
+
+        messages = [log['message'] for log in self.get_logs(search='verif')['logs']]
+        self.assertEqual(messages, ['OTP verification failed for user bob'])
+        messages = [log['message'] for log in self.get_logs(search='essay document')['logs']]
+        self.assertEqual(len(messages), 2)
+        messages = [log['message'] for log in self.get_logs(search='essay', levels=['error'])['logs']]
+        self.assertEqual(messages, ['Text extraction failed for document essay.pdf'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_failed_login_is_recorded(self):
+        APIClient().post(reverse('login'), {'username': 'admin', 'password': 'wrong'}, format='json')
+
+        event = AuditEvent.objects.get()
+        self.assertEqual((event.level, event.source), ('warning', 'auth-service'))
+        self.assertEqual(event.details, {'username': 'admin'})
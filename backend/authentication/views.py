@@ -7,12 +7,13 @@ from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
-from django.db.models import Count
-from django.db.models.functions import TruncMonth, TruncDay, TruncYear
+from django.db.models import F, Q, Sum, Window
+from django.db.models.functions import Lead
 from datetime import timedelta
 from django.db import models
 import requests
 import json
+from collections import defaultdict
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 from decouple import config
@@ -24,7 +25,8 @@ from .serializers import (
     OTPVerificationSerializer,
     ResendOTPSerializer
 )
-from .models import OTPVerification, UserProfile, SystemSetting
+from . import analytics, audit
+from .models import DailyStats, OTPVerification, UserProfile, SystemSetting
 from .utils import send_otp_email
 
 # Google OAuth settings
@@ -41,6 +43,7 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
+            audit.record('info', 'user-service', f'New user registered: {user.username}', user, email=user.email)
             
             # Generate and send OTP
             otp_record = send_otp_email(user)
@@ -74,6 +77,7 @@ class VerifyOTPView(APIView):
                 # Mark user as verified
                 user.profile.is_email_verified = True
                 user.profile.save()
+                audit.record('info', 'auth-service', f'OTP verification successful for user {user.username}', user)
                 
                 # Generate token for the user
                 token, _ = Token.objects.get_or_create(user=user)
@@ -86,6 +90,8 @@ class VerifyOTPView(APIView):
                     'message': 'Email verification successful'
                 }, status=status.HTTP_200_OK)
             else:
+                audit.record('warning', 'auth-service', f'OTP verification failed for user {user.username}', user,
+                             reason='Invalid or expired OTP')
                 return Response({'error': 'Invalid or expired OTP'}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -175,6 +181,7 @@ class LoginView(APIView):
                 
                 # If verified, return token
                 token, _ = Token.objects.get_or_create(user=user)
+                audit.record('info', 'auth-service', f'User logged in: {user.username}', user)
                 return Response({
                     'token': token.key,
                     'user_id': user.pk,
@@ -182,6 +189,7 @@ class LoginView(APIView):
                     'email': user.email,
                     'is_admin': user.is_staff or user.is_superuser
                 }, status=status.HTTP_200_OK)
+            audit.record('warning', 'auth-service', f'Failed login for username {username}', username=username)
             return Response(
                 {'error': 'Invalid credentials'},
                 status=status.HTTP_401_UNAUTHORIZED
@@ -218,68 +226,65 @@ class AdminAnalyticsView(APIView):
     def get(self, request):
         time_range = request.query_params.get('timeRange', 'month')
         
-        # Get exact user count from database
-        user_count = User.objects.count()
-        
-        # Calculate new users in the last 30 days
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        new_users_last_period = User.objects.filter(
-            date_joined__gte=thirty_days_ago
-        ).count()
+        # Counts come from the DailyStats rollup (see analytics.py): one aggregate
+        # over its rows for the totals and one read of the charted days
+        today = timezone.localdate()
+        thirty_days_ago = today - timedelta(days=30)
+        sixty_days_ago = today - timedelta(days=60)
+        recent = Q(date__gte=thirty_days_ago)
+        previous = Q(date__gte=sixty_days_ago, date__lt=thirty_days_ago)
+        totals = {
+            name: value or 0
+            for name, value in DailyStats.objects.aggregate(
+                total_users=Sum('new_users'),
+                recent_users=Sum('new_users', filter=recent),
+                previous_users=Sum('new_users', filter=previous),
+                total_documents=Sum('documents'),
+                recent_documents=Sum('documents', filter=recent),
+                previous_documents=Sum('documents', filter=previous),
+            ).items()
+        }
+        
+        user_count = totals['total_users']
         
         # Calculate growth percentage by comparing with previous 30 days
-        sixty_days_ago = timezone.now() - timedelta(days=60)
-        previous_period_users = User.objects.filter(
-            date_joined__gte=sixty_days_ago,
-            date_joined__lt=thirty_days_ago
-        ).count()
+        new_users_last_period = totals['recent_users']
+        previous_period_users = totals['previous_users']
         
         user_growth_percentage = 0
         if previous_period_users > 0:
             user_growth_percentage = ((new_users_last_period - previous_period_users) / previous_period_users) * 100
         
-        # Use OTP verifications as a proxy for document checks/activity
-        document_count = OTPVerification.objects.count()
+        # Uploaded documents
+        document_count = totals['total_documents']
         
         # Calculate document growth by comparing with previous period
-        recent_document_checks = OTPVerification.objects.filter(
-            created_at__gte=thirty_days_ago
-        ).count()
-        
-        previous_document_checks = OTPVerification.objects.filter(
-            created_at__gte=sixty_days_ago,
-            created_at__lt=thirty_days_ago
-        ).count()
+        recent_document_checks = totals['recent_documents']
+        previous_document_checks = totals['previous_documents']
         
         document_growth = 0
         if previous_document_checks > 0:
             document_growth = ((recent_document_checks - previous_document_checks) / previous_document_checks) * 100
         
-        # Calculate average response time (using OTP verification as a proxy)
-        recent_otps = OTPVerification.objects.filter(
-            created_at__gte=thirty_days_ago,
-            is_used=True
-        )
+        # Average time between a used OTP and the same user's next OTP (as a proxy
+        # for response time). LEAD pairs every OTP with its successor in a single
+        # query; is_used is read per row so the window still sees unused OTPs.
+        response_times = [
+            (next_created_at - created_at).total_seconds()
+            for created_at, next_created_at, is_used in (
+                OTPVerification.objects.filter(created_at__gte=timezone.now() - timedelta(days=30))
+                .annotate(next_created_at=Window(
+                    Lead('created_at'),
+                    partition_by=[F('user_id')],
+                    order_by=F('created_at').asc(),
+                ))
+                .values_list('created_at', 'next_created_at', 'is_used')
+            )
+            if is_used and next_created_at is not None
+        ]
         
-        # Average time between OTP creation and usage (as a proxy for response time)
-        avg_response_time = 0
-        response_count = 0
-        response_times = []
-        
-        for otp in recent_otps:
-            # Find a later OTP or activity from the same user as proxy for "usage"
-            later_activity = OTPVerification.objects.filter(
-                user=otp.user,
-                created_at__gt=otp.created_at
-            ).order_by('created_at').first()
-            
-            if later_activity:
-                time_diff = (later_activity.created_at - otp.created_at).total_seconds()
-                response_times.append(time_diff)
-                response_count += 1
-        
-        if response_count > 0:
-            avg_response_time = sum(response_times) / response_count
+        if response_times:
+            avg_response_time = sum(response_times) / len(response_times)
         else:
             avg_response_time = 2.3  # Fallback to default if no data
         
@@ -287,122 +292,77 @@ class AdminAnalyticsView(APIView):
         # (If we don't have enough data, we'll use a default value)
         response_time_change = -0.5  # Default value
         
-        # Calculate plagiarism rate - using verified vs unverified users as a proxy
-        verified_users = UserProfile.objects.filter(is_email_verified=True).count()
-        total_users = UserProfile.objects.count()
+        # Plagiarism rate: share of scored documents below the verified band,
+        # from one CASE aggregate over Document
+        distribution = analytics.score_distribution(
+            timezone.now() - timedelta(days=30)
+        )
+        band_counts = distribution['bands']
+        scored_documents = sum(count for _, count in band_counts)
+        flagged_documents = scored_documents - band_counts[0][1]
         
         plagiarism_rate = 0
-        if total_users > 0:
-            # Unverified percentage as a proxy for "plagiarism rate"
-            plagiarism_rate = ((total_users - verified_users) / total_users) * 100
+        if scored_documents > 0:
+            plagiarism_rate = (flagged_documents / scored_documents) * 100
             
-        # For rate change, check previous period
-        previous_verified = UserProfile.objects.filter(
-            user__date_joined__lt=thirty_days_ago,
-            is_email_verified=True
-        ).count()
-        
-        previous_total = UserProfile.objects.filter(
-            user__date_joined__lt=thirty_days_ago
-        ).count()
+        # For rate change, check documents uploaded before the current period
+        previous_total = distribution['previous_scored']
+        previous_flagged = distribution['previous_flagged']
         
         previous_plagiarism_rate = 0
         if previous_total > 0:
-            previous_plagiarism_rate = ((previous_total - previous_verified) / previous_total) * 100
+            previous_plagiarism_rate = (previous_flagged / previous_total) * 100
             
         plagiarism_rate_change = previous_plagiarism_rate - plagiarism_rate
         
-        # User growth over time
+        # User growth and document checks over time, from at most 365 rollup rows
         if time_range == 'week':
-            date_trunc = TruncDay
             days = 7
         elif time_range == 'year':
-            date_trunc = TruncMonth
             days = 365
         else:  # month
-            date_trunc = TruncDay
             days = 30
-            
-        start_date = timezone.now() - timedelta(days=days)
         
-        user_growth_data = (
-            User.objects.filter(date_joined__gte=start_date)
-            .annotate(date=date_trunc('date_joined'))
-            .values('date')
-            .annotate(count=Count('id'))
-            .order_by('date')
-        )
-        
-        user_growth_chart = [
-            {'date': item['date'].strftime('%Y-%m-%d' if time_range != 'year' else '%Y-%m'), 'users': item['count']} 
-            for item in user_growth_data
-        ]
-        
-        # Fill in missing dates with zero values
+        # Charted dates: days, or months for the year view
         if time_range == 'week':
             date_format = '%Y-%m-%d'
-            date_range = [(timezone.now() - timedelta(days=i)).strftime(date_format) for i in range(days-1, -1, -1)]
+            date_range = [(today - timedelta(days=i)).strftime(date_format) for i in range(days-1, -1, -1)]
         elif time_range == 'year':
             date_format = '%Y-%m'
-            date_range = [(timezone.now() - timedelta(days=30*i)).strftime(date_format) for i in range(12-1, -1, -1)]
+            date_range = [(today - timedelta(days=30*i)).strftime(date_format) for i in range(12-1, -1, -1)]
         else:  # month
             date_format = '%Y-%m-%d'
-            date_range = [(timezone.now() - timedelta(days=i)).strftime(date_format) for i in range(30-1, -1, -1)]
+            date_range = [(today - timedelta(days=i)).strftime(date_format) for i in range(30-1, -1, -1)]
         
-        # Convert user_growth_chart to a dict for easier lookup
-        growth_dict = {item['date']: item['users'] for item in user_growth_chart}
+        growth_dict = defaultdict(int)
+        checks_dict = defaultdict(int)
+        for day, new_users, documents in DailyStats.objects.filter(
+            date__gt=today - timedelta(days=days)
+        ).values_list('date', 'new_users', 'documents'):
+            growth_dict[day.strftime(date_format)] += new_users
+            checks_dict[day.strftime(date_format)] += documents
         
-        # Create a complete list with zeros for missing dates
+        # Create complete lists with zeros for missing dates
         complete_growth_chart = [
             {'date': date, 'users': growth_dict.get(date, 0)} 
             for date in date_range
         ]
         
-        # Document checks chart - use real OTP data by date
-        document_checks_query = (
-            OTPVerification.objects.filter(created_at__gte=start_date)
-            .annotate(date=date_trunc('created_at'))
-            .values('date')
-            .annotate(count=Count('id'))
-            .order_by('date')
-        )
-        
-        document_checks_data = [
-            {'date': item['date'].strftime('%Y-%m-%d' if time_range != 'year' else '%Y-%m'), 'checks': item['count']} 
-            for item in document_checks_data
-        ]
-        
-        # Fill in missing dates for document checks
-        checks_dict = {item['date']: item['checks'] for item in document_checks_data}
-        
         complete_checks_chart = [
             {'date': date, 'checks': checks_dict.get(date, 0)} 
             for date in date_range
         ]
         
-        # Plagiarism distribution - using verified status as a proxy
-        verified_count = UserProfile.objects.filter(is_email_verified=True).count()
-        unverified_count = UserProfile.objects.filter(is_email_verified=False).count()
-        
+        # Score band distribution, in percent of scored documents
         plagiarism_distribution = [
-            {'category': 'Verified', 'value': int((verified_count / max(1, user_count)) * 100)},
-            {'category': 'Unverified', 'value': int((unverified_count / max(1, user_count)) * 100)},
+            {'category': label, 'value': int((count / max(1, scored_documents)) * 100)}
+            for label, count in band_counts
         ]
         
-        # If we need more granular categories, we can split further
-        if plagiarism_distribution[1]['value'] > 0:
-            unverified_value = plagiarism_distribution[1]['value']
-            plagiarism_distribution = [
-                {'category': 'Verified', 'value': plagiarism_distribution[0]['value']},
-                {'category': 'Minor issues', 'value': int(unverified_value * 0.6)},
-                {'category': 'Significant issues', 'value': int(unverified_value * 0.3)},
-                {'category': 'Critical issues', 'value': int(unverified_value * 0.1)},
-            ]
-            
-            # Ensure total adds up to 100%
-            total = sum(item['value'] for item in plagiarism_distribution)
-            if total < 100:
-                plagiarism_distribution[0]['value'] += (100 - total)
+        # Ensure total adds up to 100%
+        total = sum(item['value'] for item in plagiarism_distribution)
+        if scored_documents and total < 100:
+            plagiarism_distribution[0]['value'] += (100 - total)
         
         return Response({
             'stats': {
@@ -435,6 +395,11 @@ class AdminAnalyticsView(APIView):
         })
 
 class AdminLogsView(APIView):
+    """
+    Page through audit events, newest first.
+    Pass the returned nextCursor as `cursor` to get the following page; every
+    page costs one indexed range query, however deep it is.
+    """
     permission_classes = [IsAuthenticated, IsAdminUser]
     
     def get(self, request):
@@ -442,10 +407,15 @@ class AdminLogsView(APIView):
         log_levels = request.query_params.getlist('levels', ['info', 'warning', 'error'])
         search_query = request.query_params.get('search', '')
         time_range = request.query_params.get('timeRange', 'today')
-        page = int(request.query_params.get('page', 1))
-        page_size = int(request.query_params.get('pageSize', 10))
+        cursor = request.query_params.get('cursor')
+        try:
+            page_size = int(request.query_params.get('pageSize', 10))
+        except ValueError:
+            return Response({'error': 'pageSize must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = max(1, min(page_size, audit.MAX_PAGE_SIZE))
         
         # Determine date range based on time_range
+        end_date = None
         if time_range == 'today':
             start_date = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
         elif time_range == 'yesterday':
@@ -458,132 +428,22 @@ class AdminLogsView(APIView):
         else:  # default to all time
             start_date = timezone.now() - timedelta(days=365)  # One year ago as a reasonable limit
         
-        # Build logs from real system data
-        all_logs = []
-        log_id = 1
-        
-        # User registration logs (info)
-        if 'info' in log_levels:
-            recent_users = User.objects.filter(
-                date_joined__gte=start_date
-            ).order_by('-date_joined')
-            
-            for user in recent_users:
-                all_logs.append({
-                    'id': str(log_id),
-                    'timestamp': user.date_joined.isoformat(),
-                    'level': 'info',
-                    'message': f'New user registered: {user.username}',
-                    'source': 'user-service',
-                    'details': {
-                        'userId': user.id,
-                        'email': user.email,
-                        'isActive': user.is_active
-                    }
-                })
-                log_id += 1
-        
-        # OTP verification logs
-        recent_otps = OTPVerification.objects.filter(
-            created_at__gte=start_date
-        ).order_by('-created_at')
-        
-        for otp in recent_otps:
-            if otp.is_used and 'info' in log_levels:
-                # Successful verification (info)
-                all_logs.append({
-                    'id': str(log_id),
-                    'timestamp': otp.created_at.isoformat(),
-                    'level': 'info',
-                    'message': f'OTP verification successful for user {otp.user.username}',
-                    'source': 'auth-service',
-                    'details': {
-                        'userId': otp.user.id,
-                        'otpType': otp.otp_type,
-                        'verifiedAt': otp.created_at.isoformat()
-                    }
-                })
-                log_id += 1
-            elif otp.is_expired and not otp.is_used and 'warning' in log_levels:
-                # Expired OTP (warning)
-                all_logs.append({
-                    'id': str(log_id),
-                    'timestamp': otp.expires_at.isoformat(),
-                    'level': 'warning',
-                    'message': f'OTP expired without verification for user {otp.user.username}',
-                    'source': 'auth-service',
-                    'details': {
-                        'userId': otp.user.id,
-                        'otpType': otp.otp_type,
-                        'createdAt': otp.created_at.isoformat(),
-                        'expiredAt': otp.expires_at.isoformat()
-                    }
-                })
-                log_id += 1
-        
-        # Generate some system logs
-        if 'error' in log_levels:
-            # Get users with failed verification attempts
-            unverified_users = UserProfile.objects.filter(is_email_verified=False)
-            for i, profile in enumerate(unverified_users):
-                # Only add some of these to avoid too many error logs
-                if i % 3 == 0:  # Add every third one
-                    all_logs.append({
-                        'id': str(log_id),
-                        'timestamp': (timezone.now() - timedelta(days=i % 10, hours=i % 24)).isoformat(),
-                        'level': 'error',
-                        'message': f'Verification failed for user {profile.user.username}',
-                        'source': 'notification-service',
-                        'details': {
-                            'userId': profile.user.id,
-                            'email': profile.user.email,
-                            'reason': 'Invalid or expired OTP'
-                        }
-                    })
-                    log_id += 1
-        
-        # Add some system monitoring logs
-        if 'warning' in log_levels:
-            for i in range(5):  # Add a few system warnings
-                all_logs.append({
-                    'id': str(log_id),
-                    'timestamp': (timezone.now() - timedelta(days=i, hours=i*3)).isoformat(),
-                    'level': 'warning',
-                    'message': f'High CPU usage detected ({80 + i}%)',
-                    'source': 'monitoring-service',
-                    'details': {
-                        'server': f'server-{(i % 3) + 1}',
-                        'duration': f'{2 + i}m',
-                        'threshold': '80%'
-                    }
-                })
-                log_id += 1
-        
-        # Sort logs by timestamp (most recent first)
-        all_logs.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        # Filter by search query
-        if search_query:
-            search_query = search_query.lower()
-            filtered_logs = [
-                log for log in all_logs 
-                if search_query in log['message'].lower() or search_query in log['source'].lower()
-            ]
-        else:
-            filtered_logs = all_logs
-        
-        # Pagination
-        total_logs = len(filtered_logs)
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated_logs = filtered_logs[start_idx:end_idx]
+        try:
+            events, next_cursor = audit.page_events(
+                levels=log_levels,
+                start=start_date,
+                end=end_date,
+                query=search_query,
+                cursor=cursor,
+                page_size=page_size,
+            )
+        except audit.InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
-            'logs': paginated_logs,
-            'total': total_logs,
-            'page': page,
+            'logs': [audit.serialize_event(event) for event in events],
             'pageSize': page_size,
-            'totalPages': (total_logs + page_size - 1) // page_size
+            'nextCursor': next_cursor,
         })
 
 class AdminSettingsView(APIView):
@@ -954,9 +814,12 @@ class GoogleLoginView(APIView):
                     user=user,
                     is_email_verified=True
                 )
+                audit.record('info', 'user-service', f'New user registered with Google: {user.username}', user,
+                             email=user.email)
 
             # Generate or get token
             token, _ = Token.objects.get_or_create(user=user)
+            audit.record('info', 'auth-service', f'User logged in with Google: {user.username}', user)
 
             return Response({
                 'token': token.key,
@@ -968,6 +831,7 @@ class GoogleLoginView(APIView):
 
         except ValueError as e:
             # Invalid token
+            audit.record('warning', 'auth-service', 'Google login rejected: invalid token')
             return Response({'error': 'Invalid token'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DocumentProcessorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'document_processor'
+
+    def ready(self):
+        # Connects the signal handlers that invalidate cached dashboards
+        from . import dashboard  # noqa: F401
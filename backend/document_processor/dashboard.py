@@ -0,0 +1,103 @@
+"""
+Per-user dashboard statistics.
+
+The counts and the average score come from one conditional-aggregate query
+and are cached per user together with the recent documents. Saving or
+deleting one of the user's documents drops the cached entry, so the next
+page load recomputes it; DASHBOARD_CACHE_TTL bounds how stale the rolling
+30-day counts can get in between.
+
+Invalidation only reaches other processes through a shared cache backend.
+With a process-local cache, entries live for DASHBOARD_LOCAL_CACHE_TTL
+instead, so a change made through another process shows up within seconds.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Avg, Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Document
+
+RECENT_DOCUMENTS = 4
+
+# Fields shown on the dashboard; saves touching only other fields keep the cache
+DASHBOARD_FIELDS = {'title', 'uploaded_at', 'originality_score', 'uploaded_by'}
+
+
+def cache_key(user_id):
+    return f'dashboard:{user_id}'
+
+
+def compute_dashboard(user):
+    """Compute the dashboard payload of a user with two queries: recent documents and one aggregate."""
+    user_documents = Document.objects.filter(uploaded_by=user)
+
+    recent_documents = user_documents.only('id', 'title', 'uploaded_at', 'originality_score').order_by('-uploaded_at')[:RECENT_DOCUMENTS]
+    recent_docs_data = [{
+        'id': doc.id,
+        'name': doc.title,
+        'date': doc.uploaded_at.strftime('%Y-%m-%d'),
+        'score': doc.originality_score  # Use the actual originality score
+    } for doc in recent_documents]
+
+    last_month = timezone.now() - timedelta(days=30)
+    previous_month = last_month - timedelta(days=30)
+    stats = user_documents.aggregate(
+        total_documents=Count('id'),
+        recent_scans=Count('id', filter=Q(uploaded_at__gte=last_month)),
+        previous_month_scans=Count('id', filter=Q(uploaded_at__gte=previous_month, uploaded_at__lt=last_month)),
+        avg_score=Avg('originality_score'),
+    )
+
+    recent_scans = stats['recent_scans']
+    previous_month_scans = stats['previous_month_scans']
+    scan_change = ((recent_scans - previous_month_scans) / max(previous_month_scans, 1)) * 100 if previous_month_scans else 0
+    avg_originality = stats['avg_score'] or 100.0  # Default to 100 if no documents exist
+
+    return {
+        'recentDocuments': recent_docs_data,
+        'stats': {
+            'totalDocuments': stats['total_documents'],
+            'recentScans': recent_scans,
+            'scanChange': scan_change,
+            'avgOriginality': round(avg_originality, 1)  # Round to 1 decimal place
+        }
+    }
+
+
+def cache_timeout():
+    """Return how long a dashboard entry is cached, short when the cache is not shared between processes."""
+    if isinstance(caches['default'], LocMemCache):
+        return settings.DASHBOARD_LOCAL_CACHE_TTL
+    return settings.DASHBOARD_CACHE_TTL
+
+
+def get_dashboard(user):
+    """Return the cached dashboard payload of a user, computing it on a miss."""
+    key = cache_key(user.id)
+    data = cache.get(key)
+    if data is None:
+        data = compute_dashboard(user)
+        cache.set(key, data, cache_timeout())
+    return data
+
+
+def invalidate_dashboard(user_id):
+    if user_id is not None:
+        cache.delete(cache_key(user_id))
+
+
+@receiver(post_save, sender=Document)
+def document_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or DASHBOARD_FIELDS.intersection(update_fields):
+        invalidate_dashboard(instance.uploaded_by_id)
+
+
+@receiver(post_delete, sender=Document)
+def document_deleted(sender, instance, **kwargs):
+    invalidate_dashboard(instance.uploaded_by_id)
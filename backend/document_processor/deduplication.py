@@ -0,0 +1,93 @@
+"""
+Reuse of already processed uploads.
+
+Two hashes are stored on every Document. `content_sha256` is the hash of the
+uploaded bytes, so an identical resubmission is answered before any
+extraction happens. `text_sha256` is the hash of the normalized word stream
+of the extracted text; it catches files that differ byte-wise (re-exported
+PDFs, DOCX metadata) but contain the same text, and skips indexing and
+similarity analysis for them.
+"""
+import hashlib
+import logging
+
+from django.db import transaction
+
+from .indexing import copy_index
+from .models import Document, DocumentChunk, SimilarityResult
+from .text_pipeline import iter_words
+
+logger = logging.getLogger(__name__)
+
+
+def text_sha256(text):
+    """
+    Hash the lowercased words of a text, ignoring whitespace and punctuation.
+
+    Returns:
+        str: Hex digest, or an empty string for a text without words
+    """
+    digest = hashlib.sha256()
+    empty = True
+    for word, _, _ in iter_words(text):
+        digest.update(word.lower().encode('utf-8'))
+        digest.update(b' ')
+        empty = False
+    return '' if empty else digest.hexdigest()
+
+
+def find_processed(exclude=None, **hashes):
+    """
+    Find the oldest indexed document matching the given hash, e.g. content_sha256=...
+
+    Args:
+        exclude: Document to leave out of the lookup
+        **hashes: One of content_sha256 or text_sha256
+
+    Returns:
+        Document or None
+    """
+    if not all(hashes.values()):
+        return None
+    queryset = Document.objects.filter(status=Document.STATUS_INDEXED, **hashes)
+    if exclude is not None:
+        queryset = queryset.exclude(id=exclude.id)
+    return queryset.order_by('id').first()
+
+
+def reuse_processed(source, document):
+    """
+    Complete a document from an indexed duplicate instead of processing it.
+
+    The source's extracted text is adopted as is, so the copied chunks,
+    index rows and similarity spans stay valid for the new document.
+
+    Args:
+        source: Indexed Document with the same content
+        document: Document to complete
+    """
+    with transaction.atomic():
+        document.extracted_text = source.extracted_text
+        document.text_sha256 = source.text_sha256
+        document.originality_score = source.originality_score
+        document.status = Document.STATUS_INDEXED
+        document.save(update_fields=['extracted_text', 'text_sha256', 'originality_score', 'status'])
+
+        DocumentChunk.objects.bulk_create([
+            DocumentChunk(document=document, index=chunk.index, text=chunk.text, sentence_count=chunk.sentence_count)
+            for chunk in source.chunks.all()
+        ])
+        copy_index(source, document)
+
+        result = SimilarityResult.objects.filter(document=source).first()
+        if result is not None:
+            SimilarityResult.objects.create(
+                document=document,
+                originality_score=result.originality_score,
+                matched_word_count=result.matched_word_count,
+                total_word_count=result.total_word_count,
+                shingle_size=result.shingle_size,
+                spans=result.spans,
+                sources=result.sources,
+            )
+    logger.info(f"Document {document.id} reused the processing of document {source.id}")
@@ -0,0 +1,136 @@
+from collections import deque
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Document, Fingerprint
+from .similarity import SHINGLE_SIZE, shingle_hashes
+from .text_pipeline import iter_words
+
+# Winnowing window, in shingles. Any shared run of at least
+# WINNOW_WINDOW + SHINGLE_SIZE - 1 words is guaranteed to share a fingerprint.
+WINNOW_WINDOW = 5
+
+
+def winnow(hashes, window=WINNOW_WINDOW):
+    """
+    Select fingerprints from a sequence of k-gram hashes using winnowing.
+
+    The minimum hash of every window is kept (the rightmost one on ties), and
+    each selected position is only emitted once. A monotonic deque keeps the
+    whole pass linear in the number of hashes.
+
+    Args:
+        hashes: List of k-gram hashes in document order
+        window: Number of consecutive hashes per window
+
+    Returns:
+        list: (hash, position) tuples in document order
+    """
+    if not hashes:
+        return []
+    if len(hashes) <= window:
+        position = min(range(len(hashes)), key=lambda i: (hashes[i], -i))
+        return [(hashes[position], position)]
+
+    selected = []
+    candidates = deque()
+    last_position = -1
+    for position, value in enumerate(hashes):
+        while candidates and hashes[candidates[-1]] >= value:
+            candidates.pop()
+        candidates.append(position)
+        if candidates[0] <= position - window:
+            candidates.popleft()
+        if position >= window - 1 and candidates[0] != last_position:
+            last_position = candidates[0]
+            selected.append((hashes[last_position], last_position))
+    return selected
+
+
+def text_fingerprints(text):
+    """
+    Compute the winnowed fingerprints of a text.
+
+    Args:
+        text: The text to fingerprint
+
+    Returns:
+        list: (hash, character offset) tuples in document order
+    """
+    tokens = list(iter_words(text))
+    hashes = shingle_hashes([word for word, _, _ in tokens], SHINGLE_SIZE)
+    return [(value, tokens[position][1]) for value, position in winnow(hashes)]
+
+
+def build_fingerprint_rows(document):
+    """Build unsaved Fingerprint rows for a document's extracted text."""
+    return [
+        Fingerprint(document=document, hash=value, offset=offset)
+        for value, offset in text_fingerprints(document.extracted_text)
+    ]
+
+
+def index_document(document):
+    """Replace the stored fingerprints of a document."""
+    rows = build_fingerprint_rows(document)
+    with transaction.atomic():
+        Fingerprint.objects.filter(document=document).delete()
+        Fingerprint.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def copy_document(source, target):
+    """Give target the fingerprints of source, whose extracted text it shares."""
+    rows = [
+        Fingerprint(document=target, hash=value, offset=offset)
+        for value, offset in source.fingerprints.values_list('hash', 'offset')
+    ]
+    with transaction.atomic():
+        Fingerprint.objects.filter(document=target).delete()
+        Fingerprint.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def find_corpus_matches(document, limit=10):
+    """
+    Find stored documents that share fingerprints with the given document.
+
+    The lookup joins the document's fingerprints against the hash index in a
+    single query, so its cost depends on the number of shared fingerprints
+    rather than on the size of the corpus.
+
+    Args:
+        document: The Document to check
+        limit: Maximum number of matching documents to return
+
+    Returns:
+        list: Dicts with the matching document, shared fingerprint count and
+        the share of this document's fingerprints found in it. Titles are only
+        given for documents of the same owner; other users' are None.
+    """
+    own_hashes = Fingerprint.objects.filter(document=document).values('hash')
+    total = own_hashes.values('hash').distinct().count()
+    if not total:
+        return []
+
+    shared = list(
+        Fingerprint.objects
+        .filter(hash__in=own_hashes)
+        .exclude(document=document)
+        .values('document_id')
+        .annotate(shared=Count('hash', distinct=True))
+        .order_by('-shared')[:limit]
+    )
+    titles = dict(
+        Document.objects
+        .filter(id__in=[row['document_id'] for row in shared], uploaded_by_id=document.uploaded_by_id)
+        .values_list('id', 'title')
+    )
+
+    return [{
+        'document_id': row['document_id'],
+        'title': titles.get(row['document_id']),
+        'shared_fingerprints': row['shared'],
+        'overlap': round(row['shared'] / total * 100, 1),
+    } for row in shared]
@@ -0,0 +1,22 @@
+from . import fingerprints, minhash
+
+
+def index_document(document):
+    """
+    Add a document to every corpus index: the winnowing fingerprint table
+    and the MinHash/LSH near-duplicate index.
+
+    Rows in both indexes cascade with the Document, so deleting a document
+    removes it from the indexes without a separate step.
+    """
+    fingerprints.index_document(document)
+    minhash.index_document(document)
+
+
+def copy_index(source, target):
+    """
+    Index a document whose extracted text is identical to an already indexed
+    one by copying the source's index rows instead of recomputing them.
+    """
+    fingerprints.copy_document(source, target)
+    minhash.copy_document(source, target)
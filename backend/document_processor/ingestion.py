@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.db import transaction
+from django.utils import timezone
+
+from authentication import audit
+
+from .deduplication import find_processed, reuse_processed, text_sha256
+from .indexing import index_document
+from .jobs import WorkerPool, claim_next, heartbeat, requeue_stale
+from .models import Document, IngestionJob
+from .utils import ExtractionError, read_text
+
+logger = logging.getLogger(__name__)
+
+
+def spool_upload(uploaded_file):
+    """
+    Move an uploaded file into the ingestion spool directory, hashing it on the way.
+
+    Uploads Django already streamed to a temporary file are moved (a rename
+    when both directories share a filesystem); in-memory uploads are written
+    out chunk by chunk. Either way no second full copy is held in memory.
+
+    Returns:
+        tuple: (path of the spooled file, SHA-256 hex digest of its bytes)
+    """
+    os.makedirs(settings.INGESTION_SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    path = os.path.join(settings.INGESTION_SPOOL_DIR, f"{uuid.uuid4().hex}{extension}")
+    digest = hashlib.sha256()
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+        file_move_safe(uploaded_file.temporary_file_path(), path)
+    else:
+        with open(path, 'wb') as spool:
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+                spool.write(chunk)
+    return path, digest.hexdigest()
+
+
+def enqueue_upload(uploaded_file, user, title, file_type):
+    """
+    Accept an upload: spool it, create a queued Document and its ingestion job.
+
+    Extraction happens later on the worker pool, so the request returns as
+    soon as the file is on disk. A file whose bytes were already processed is
+    completed from the earlier document right away, without a job.
+
+    Returns:
+        tuple: (Document, IngestionJob or None)
+    """
+    path, content_sha256 = spool_upload(uploaded_file)
+    try:
+        with transaction.atomic():
+            document = Document.objects.create(
+                title=title,
+                file_type=file_type,
+                original_filename=uploaded_file.name,
+                uploaded_by=user,
+                status=Document.STATUS_QUEUED,
+                content_sha256=content_sha256,
+            )
+            source = find_processed(content_sha256=content_sha256, exclude=document)
+            if source is not None:
+                reuse_processed(source, document)
+                job = None
+            else:
+                job = IngestionJob.objects.create(document=document, file_path=path)
+                transaction.on_commit(wake_workers)
+    except Exception:
+        os.remove(path)
+        raise
+    if job is None:
+        os.remove(path)
+    return document, job
+
+
+def run_job(job):
+    """Extract, store and index the text of a claimed ingestion job."""
+    document = job.document
+    document.status = Document.STATUS_EXTRACTING
+    document.save(update_fields=['status'])
+
+    try:
+        text = read_text(job.file_path, document.file_type)
+        digest = text_sha256(text)
+        source = find_processed(text_sha256=digest, exclude=document)
+        if source is not None:
+            # Different bytes, same text: skip indexing and similarity analysis
+            reuse_processed(source, document)
+        else:
+            document.extracted_text = text
+            document.text_sha256 = digest
+            document.status = Document.STATUS_INDEXED
+            with transaction.atomic():
+                document.save(update_fields=['extracted_text', 'text_sha256', 'status'])
+                index_document(document)
+        job.status = IngestionJob.STATUS_DONE
+    except Exception as e:
+        if not isinstance(e, ExtractionError):
+            logger.exception(f"Ingestion job {job.id} failed")
+        document.status = Document.STATUS_FAILED
+        document.save(update_fields=['status'])
+        job.status = IngestionJob.STATUS_FAILED
+        job.error = str(e)
+        audit.record('error', 'document-service', f'Text extraction failed for document {document.title}',
+                     document.uploaded_by, documentId=document.id, jobId=job.id, error=str(e))
+    finally:
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def process_next_job():
+    """
+    Claim and run the oldest queued ingestion job.
+
+    Returns:
+        bool: True if a job was processed, False if the queue was empty
+    """
+    requeue_stale(IngestionJob, settings.INGESTION_JOB_TIMEOUT)
+    job = claim_next(IngestionJob.objects.filter(status=IngestionJob.STATUS_QUEUED))
+    if job is None:
+        return False
+
+    if job.attempts > settings.INGESTION_MAX_ATTEMPTS:
+        # The job was requeued after its worker died too many times
+        Document.objects.filter(id=job.document_id).update(status=Document.STATUS_FAILED)
+        job.status = IngestionJob.STATUS_FAILED
+        job.error = 'Extraction did not finish after repeated attempts'
+        audit.record('error', 'document-service', f'Text extraction abandoned for document {job.document_id}',
+                     documentId=job.document_id, jobId=job.id, error=job.error)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        return True
+
+    with heartbeat(job, settings.INGESTION_JOB_TIMEOUT):
+        run_job(job)
+    return True
+
+
+ingestion_pool = WorkerPool(
+    'ingestion',
+    process_next_job,
+    workers=settings.INGESTION_WORKERS,
+    poll_interval=settings.INGESTION_POLL_INTERVAL,
+)
+
+
+def start_workers():
+    """
+    Start the in-process worker pool, unless extraction runs in a separate worker.
+
+    Called once the web process has loaded the app, so queued jobs, and jobs
+    left running by a process that died, are picked up without waiting for
+    the next request to enqueue one.
+    """
+    if settings.INGESTION_WORKERS > 0:
+        ingestion_pool.start()
+
+
+def wake_workers():
+    """Wake the in-process worker pool, unless extraction runs in a separate worker."""
+    if settings.INGESTION_WORKERS > 0:
+        ingestion_pool.wake()
@@ -0,0 +1,179 @@
+"""
+Database-backed job queue helpers.
+
+Jobs are rows with a status column. Workers claim them with a conditional
+UPDATE (status='queued' -> 'running'), which is atomic on every database
+backend, so no external broker or row locking support is needed. The same
+helpers are used for any job model exposing status, attempts, worker,
+started_at, heartbeat_at and finished_at fields.
+
+A running job holds a lease: its worker renews heartbeat_at while the job
+runs (see heartbeat()), and requeue_stale() only takes back jobs whose lease
+has expired, so a slow job is never handed to a second worker while the
+first one is still alive.
+"""
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    """Identify the current worker thread in claimed job rows."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"[:255]
+
+
+def claim_next(queryset, **claim_fields):
+    """
+    Atomically claim the oldest queued job of a queryset.
+
+    Args:
+        queryset: Queryset of claimable (queued) jobs of a job model
+        **claim_fields: Extra fields to set on the claimed row
+
+    Returns:
+        The claimed job, or None if the queue is empty
+    """
+    model = queryset.model
+    while True:
+        job_id = queryset.order_by('id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = model.objects.filter(id=job_id, status=model.STATUS_QUEUED).update(
+            status=model.STATUS_RUNNING,
+            attempts=F('attempts') + 1,
+            worker=worker_name(),
+            started_at=now,
+            heartbeat_at=now,
+            **claim_fields
+        )
+        if claimed:
+            return model.objects.get(id=job_id)
+        # Another worker claimed it first; try the next one
+
+
+def renew_lease(job):
+    """
+    Record that the worker running a job is still alive.
+
+    Returns:
+        bool: False if the job is no longer running on this worker
+    """
+    model = type(job)
+    return bool(model.objects.filter(id=job.id, status=model.STATUS_RUNNING, worker=job.worker).update(
+        heartbeat_at=timezone.now()
+    ))
+
+
+@contextmanager
+def heartbeat(job, timeout_seconds):
+    """
+    Keep renewing the lease of a running job until the block exits.
+
+    The lease is renewed three times per timeout from a daemon thread, so a
+    job is only requeued once its worker has stopped renewing it for a whole
+    timeout: the process died or the thread is wedged.
+
+    Args:
+        job: Claimed job
+        timeout_seconds: Lease length, as passed to requeue_stale
+    """
+    done = threading.Event()
+
+    def renew():
+        try:
+            while not done.wait(timeout_seconds / 3):
+                try:
+                    if not renew_lease(job):
+                        return
+                except Exception:
+                    logger.exception(f"Could not renew the lease of {type(job).__name__} {job.id}")
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=renew, name=f"{threading.current_thread().name}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def requeue_stale(model, timeout_seconds):
+    """Put running jobs whose lease expired, because their worker died, back on the queue."""
+    cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+    expired = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    requeued = model.objects.filter(expired, status=model.STATUS_RUNNING).update(
+        status=model.STATUS_QUEUED, worker=''
+    )
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale {model.__name__} rows")
+    return requeued
+
+
+class WorkerPool:
+    """
+    Pool of daemon threads that drain a database-backed queue.
+
+    Each thread calls `handler()` until it reports an empty queue, then
+    sleeps for `poll_interval` seconds or until `wake()` is called.
+    """
+
+    def __init__(self, name, handler, workers, poll_interval=2.0):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads once per process."""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        """Start the pool if needed and make idle workers poll immediately."""
+        self.start()
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                close_old_connections()
+                try:
+                    processed = self.handler()
+                except Exception:
+                    logger.exception(f"Unhandled error in {self.name} worker")
+                    processed = False
+                if processed:
+                    continue
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            connection.close()
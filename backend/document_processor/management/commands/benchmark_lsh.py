@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from document_processor.minhash import LSHIndex, MinHasher
+
+class Command(BaseCommand):
+    help = 'Measures LSH recall and query latency for bands x rows settings on a synthetic corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=100000,
+                            help='Number of synthetic documents in the corpus')
+        parser.add_argument('--shingles', type=int, default=200,
+                            help='Shingles per synthetic document')
+        parser.add_argument('--queries', type=int, default=1000,
+                            help='Number of planted near-duplicate queries')
+        parser.add_argument('--similarity', type=float, default=0.8,
+                            help='Target Jaccard similarity of each query to its planted original')
+        parser.add_argument('--configs', default='32x4,16x8,8x16',
+                            help='Comma-separated BANDSxROWS configurations with equal bands*rows')
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        configs = []
+        for config in options['configs'].split(','):
+            bands, rows = (int(part) for part in config.lower().split('x'))
+            configs.append((bands, rows))
+        num_perm = configs[0][0] * configs[0][1]
+        if any(bands * rows != num_perm for bands, rows in configs):
+            raise CommandError('All configurations must use the same number of permutations (bands * rows)')
+
+        generator = np.random.default_rng(options['seed'])
+        hasher = MinHasher(num_perm)
+        total, size = options['documents'], options['shingles']
+        query_count = min(options['queries'], total)
+
+        self.stdout.write(f'Signing {total} synthetic documents ({size} shingles, {num_perm} permutations)...')
+        started = time.perf_counter()
+        corpus = generator.integers(np.iinfo(np.int64).min, np.iinfo(np.int64).max, size=(total, size), dtype=np.int64)
+        signatures = [hasher.signature(row) for row in corpus]
+        self.stdout.write(f'  signed in {time.perf_counter() - started:.1f}s')
+
+        # Keep |A ∩ B| shingles so that |A ∩ B| / |A ∪ B| matches the target similarity
+        kept = int(round(2 * size * options['similarity'] / (1 + options['similarity'])))
+        originals = generator.choice(total, size=query_count, replace=False)
+        queries = []
+        for original in originals:
+            replacement = generator.integers(np.iinfo(np.int64).min, np.iinfo(np.int64).max, size=size - kept, dtype=np.int64)
+            queries.append((int(original), hasher.signature(np.concatenate([corpus[original][:kept], replacement]))))
+
+        self.stdout.write(f'{"config":>8} {"threshold":>9} {"recall":>7} {"avg cand.":>9} {"p50 ms":>7} {"p99 ms":>7}')
+        for bands, rows in configs:
+            index = LSHIndex(bands, rows)
+            for key, signature in enumerate(signatures):
+                index.add(key, signature)
+
+            hits, candidates, latencies = 0, 0, []
+            for original, signature in queries:
+                started = time.perf_counter()
+                found = index.query(signature)
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += original in found
+                candidates += len(found)
+
+            self.stdout.write(
+                f'{bands:>3}x{rows:<4} {(1 / bands) ** (1 / rows):>9.2f} {hits / query_count:>7.3f} '
+                f'{candidates / query_count:>9.1f} {np.percentile(latencies, 50):>7.3f} {np.percentile(latencies, 99):>7.3f}'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from document_processor.fingerprints import build_fingerprint_rows
+from document_processor.models import Document, Fingerprint
+
+class Command(BaseCommand):
+    help = 'Backfills winnowed fingerprints for stored documents in bulk batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Number of documents fingerprinted per transaction')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute fingerprints for documents that already have them')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        documents = Document.objects.order_by('id').only('id')
+        if not options['rebuild']:
+            documents = documents.filter(fingerprints__isnull=True)
+
+        document_ids = list(documents.values_list('id', flat=True).distinct())
+        self.stdout.write(f'Fingerprinting {len(document_ids)} documents')
+
+        indexed = 0
+        for start in range(0, len(document_ids), batch_size):
+            batch_ids = document_ids[start:start + batch_size]
+            rows = []
+            for document in Document.objects.filter(id__in=batch_ids).only('id', 'text_content__data').select_related('text_content'):
+                rows.extend(build_fingerprint_rows(document))
+
+            with transaction.atomic():
+                Fingerprint.objects.filter(document_id__in=batch_ids).delete()
+                Fingerprint.objects.bulk_create(rows, batch_size=1000)
+
+            indexed += len(batch_ids)
+            self.stdout.write(f'  {indexed}/{len(document_ids)} documents, {len(rows)} fingerprints in batch')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully fingerprinted {indexed} documents'))
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from document_processor.minhash import index_document
+from document_processor.models import Document
+
+class Command(BaseCommand):
+    help = 'Builds MinHash signatures and LSH buckets for stored documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Number of documents loaded per query')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Re-sign every document, e.g. after changing LSH_BANDS/LSH_ROWS')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        documents = Document.objects.order_by('id')
+        if not options['rebuild']:
+            documents = documents.exclude(
+                minhash_signatures__bands=settings.LSH_BANDS,
+                minhash_signatures__rows=settings.LSH_ROWS,
+            )
+
+        document_ids = list(documents.values_list('id', flat=True).distinct())
+        self.stdout.write(
+            f'Signing {len(document_ids)} documents with {settings.LSH_BANDS} bands x {settings.LSH_ROWS} rows'
+        )
+
+        for start in range(0, len(document_ids), batch_size):
+            batch_ids = document_ids[start:start + batch_size]
+            for document in Document.objects.filter(id__in=batch_ids).only('id', 'text_content__data').select_related('text_content'):
+                index_document(document)
+            self.stdout.write(f'  {min(start + batch_size, len(document_ids))}/{len(document_ids)} documents')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully signed {len(document_ids)} documents'))
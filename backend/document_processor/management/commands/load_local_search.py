@@ -0,0 +1,32 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from document_processor.models import Document
+from document_processor.search import LocalSearchBackend
+
+class Command(BaseCommand):
+    help = 'Loads pages into the offline search index used when SEARCH_BACKEND=local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*',
+                            help='Text files to index; each file becomes one page')
+        parser.add_argument('--documents', action='store_true',
+                            help='Also index the extracted text of every stored document')
+
+    def handle(self, *args, **options):
+        backend = LocalSearchBackend(settings.LOCAL_SEARCH_DB)
+        pages = []
+
+        for path in options['files']:
+            if not os.path.isfile(path):
+                raise CommandError(f'File not found: {path}')
+            with open(path, encoding='utf-8', errors='replace') as file:
+                pages.append((os.path.basename(path), f'file://{os.path.abspath(path)}', file.read()))
+
+        if options['documents']:
+            for document in Document.objects.select_related('text_content').iterator(chunk_size=200):
+                pages.append((document.title, f'document://{document.id}', document.extracted_text))
+
+        backend.add_pages(pages)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {len(pages)} pages into {settings.LOCAL_SEARCH_DB}'))
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from document_processor.ingestion import process_next_job
+from document_processor.jobs import WorkerPool
+
+class Command(BaseCommand):
+    help = 'Runs a pool of workers that extract and index queued document uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Number of worker threads')
+        parser.add_argument('--once', action='store_true',
+                            help='Process queued jobs in this thread until the queue is empty, then exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = 0
+            while process_next_job():
+                processed += 1
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} ingestion jobs'))
+            return
+
+        pool = WorkerPool('ingestion', process_next_job, workers=options['workers'],
+                          poll_interval=settings.INGESTION_POLL_INTERVAL)
+        pool.start()
+        self.stdout.write(self.style.SUCCESS(f"Started {options['workers']} ingestion workers"))
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping ingestion workers...')
+            pool.stop(timeout=settings.INGESTION_JOB_TIMEOUT)
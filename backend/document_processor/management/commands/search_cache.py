@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from document_processor import search_cache
+from document_processor.models import SearchCacheEntry, SearchCacheStats
+
+class Command(BaseCommand):
+    help = 'Shows search cache statistics, evicts stale entries or clears the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evict', action='store_true',
+                            help='Delete expired entries and enforce the size limit')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete every cached entry and reset the counters')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = SearchCacheEntry.objects.all().delete()
+            SearchCacheStats.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Cleared {deleted} cached searches'))
+            return
+
+        if options['evict']:
+            self.stdout.write(f'Evicted {search_cache.evict()} entries')
+
+        stats = search_cache.stats()
+        self.stdout.write(
+            f"{stats['entries']} entries, {stats['bytes'] / 1024:.1f} KiB; "
+            f"{stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']}% hit rate), "
+            f"{stats['evictions']} evictions"
+        )
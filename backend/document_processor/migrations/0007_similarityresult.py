@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document_processor', '0006_alter_document_originality_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('originality_score', models.FloatField()),
+                ('matched_word_count', models.PositiveIntegerField(default=0)),
+                ('total_word_count', models.PositiveIntegerField(default=0)),
+                ('shingle_size', models.PositiveSmallIntegerField()),
+                ('spans', models.JSONField(default=list)),
+                ('sources', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_result', to='document_processor.document')),
+            ],
+        ),
+    ]
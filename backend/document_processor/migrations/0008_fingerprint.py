@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document_processor', '0007_similarityresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.BigIntegerField()),
+                ('offset', models.PositiveIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='document_processor.document')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hash', 'document'], name='fingerprint_hash_doc_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:32
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def compress_texts(apps, schema_editor):
+    Document = apps.get_model('document_processor', 'Document')
+    DocumentText = apps.get_model('document_processor', 'DocumentText')
+    rows = []
+    for document_id, text in Document.objects.exclude(extracted_text='').values_list('id', 'extracted_text').iterator():
+        rows.append(DocumentText(
+            document_id=document_id, data=zlib.compress(text.encode('utf-8'), 6), length=len(text)
+        ))
+        if len(rows) >= 500:
+            DocumentText.objects.bulk_create(rows)
+            rows = []
+    DocumentText.objects.bulk_create(rows)
+
+
+def decompress_texts(apps, schema_editor):
+    Document = apps.get_model('document_processor', 'Document')
+    DocumentText = apps.get_model('document_processor', 'DocumentText')
+    for row in DocumentText.objects.iterator():
+        Document.objects.filter(id=row.document_id).update(
+            extracted_text=zlib.decompress(bytes(row.data)).decode('utf-8')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('document_processor', '0012_content_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text_content', serialize=False, to='document_processor.document')),
+                ('data', models.BinaryField()),
+                ('length', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(compress_texts, decompress_texts),
+        migrations.RemoveField(
+            model_name='document',
+            name='extracted_text',
+        ),
+    ]
@@ -0,0 +1,259 @@
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import LSHBucket, MinHashSignature
+from .similarity import SHINGLE_SIZE, shingle_hashes
+from .text_pipeline import iter_words
+
+# Permutations work modulo 2^31 - 1: with x, a and b below p, a * x + b < 2^62,
+# so the uint64 arithmetic can never wrap before the modulo
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+HASH_VERSION = 2  # Part of the bucket keys; bump when signatures change
+
+# Shingles permuted at once; bounds the (shingles x permutations) working matrix
+_BLOCK_SIZE = 2048
+
+
+class MinHasher:
+    """
+    Vectorized MinHash over 64-bit shingle hashes.
+
+    Each permutation is a universal hash (a * x + b) mod p, with p the
+    Mersenne prime 2^31 - 1 and x the shingle hash reduced mod p. All
+    permutations of a block of shingles are evaluated as one NumPy matrix
+    operation.
+    """
+
+    def __init__(self, num_perm, seed=1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = generator.randint(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes):
+        """
+        Compute the MinHash signature of a collection of shingle hashes.
+
+        Args:
+            hashes: Iterable of signed 64-bit shingle hashes
+
+        Returns:
+            numpy.ndarray: uint32 array of length num_perm
+        """
+        values = np.unique(np.fromiter(hashes, dtype=np.int64).view(np.uint64) % MERSENNE_PRIME)
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(values), _BLOCK_SIZE):
+            block = values[start:start + _BLOCK_SIZE, np.newaxis]
+            permuted = (block * self.a + self.b) % MERSENNE_PRIME
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+
+def estimate_jaccard(signature, other):
+    """Estimate the Jaccard similarity of two sets from their signatures."""
+    return float(np.count_nonzero(signature == other)) / len(signature)
+
+
+def band_keys(signature, bands, rows):
+    """
+    Hash each band of a signature into an LSH bucket key.
+
+    The band index and the bands/rows configuration are part of the key, so
+    buckets of different bands (or of an older configuration) never collide.
+
+    Returns:
+        list: One signed 64-bit bucket key per band
+    """
+    keys = []
+    for band in range(bands):
+        digest = hashlib.blake2b(
+            signature[band * rows:(band + 1) * rows].tobytes(),
+            digest_size=8,
+            person=f'v{HASH_VERSION}:{bands}x{rows}:{band}'.encode('ascii')[:16],
+        ).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+class LSHIndex:
+    """In-memory LSH banding index, mainly used for benchmarking configurations."""
+
+    def __init__(self, bands, rows):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = {}
+
+    def add(self, key, signature):
+        for bucket in band_keys(signature, self.bands, self.rows):
+            self.buckets.setdefault(bucket, []).append(key)
+
+    def query(self, signature):
+        candidates = set()
+        for bucket in band_keys(signature, self.bands, self.rows):
+            candidates.update(self.buckets.get(bucket, ()))
+        return candidates
+
+
+_hashers = {}
+
+
+def get_hasher():
+    """Return the process-wide MinHasher for the configured bands x rows."""
+    num_perm = settings.LSH_BANDS * settings.LSH_ROWS
+    if num_perm not in _hashers:
+        _hashers[num_perm] = MinHasher(num_perm)
+    return _hashers[num_perm]
+
+
+def document_shingle_sets(document):
+    """
+    Build shingle hash lists for a whole document and for each of its cached chunks.
+
+    Returns:
+        tuple: (hashes of the whole text, list of (chunk index, hashes) pairs)
+    """
+    words = [word for word, _, _ in iter_words(document.extracted_text)]
+    chunks = [
+        (chunk.index, shingle_hashes([word for word, _, _ in iter_words(chunk.text)], SHINGLE_SIZE))
+        for chunk in document.get_chunks()
+    ]
+    return shingle_hashes(words, SHINGLE_SIZE), chunks
+
+
+def index_document(document):
+    """Replace the stored MinHash signatures and LSH buckets of a document."""
+    bands, rows = settings.LSH_BANDS, settings.LSH_ROWS
+    hasher = get_hasher()
+    document_hashes, chunk_hashes = document_shingle_sets(document)
+    if not document_hashes:
+        MinHashSignature.objects.filter(document=document).delete()
+        return 0
+
+    entries = [(None, hasher.signature(document_hashes))]
+    entries.extend((index, hasher.signature(hashes)) for index, hashes in chunk_hashes if hashes)
+
+    with transaction.atomic():
+        MinHashSignature.objects.filter(document=document).delete()
+        signatures = MinHashSignature.objects.bulk_create([
+            MinHashSignature(
+                document=document,
+                chunk_index=chunk_index,
+                bands=bands,
+                rows=rows,
+                signature=signature.tobytes(),
+            )
+            for chunk_index, signature in entries
+        ])
+        LSHBucket.objects.bulk_create([
+            LSHBucket(signature=row, key=key)
+            for row, (_, signature) in zip(signatures, entries)
+            for key in band_keys(signature, bands, rows)
+        ], batch_size=1000)
+    return len(signatures)
+
+
+def copy_document(source, target):
+    """Give target the MinHash signatures and LSH buckets of source, whose extracted text it shares."""
+    originals = list(source.minhash_signatures.all())
+    keys = {}
+    for signature_id, key in LSHBucket.objects.filter(signature__document=source).values_list('signature_id', 'key'):
+        keys.setdefault(signature_id, []).append(key)
+
+    with transaction.atomic():
+        MinHashSignature.objects.filter(document=target).delete()
+        copies = MinHashSignature.objects.bulk_create([
+            MinHashSignature(
+                document=target,
+                chunk_index=original.chunk_index,
+                bands=original.bands,
+                rows=original.rows,
+                signature=original.signature,
+            )
+            for original in originals
+        ])
+        LSHBucket.objects.bulk_create([
+            LSHBucket(signature=copy, key=key)
+            for original, copy in zip(originals, copies)
+            for key in keys.get(original.id, ())
+        ], batch_size=1000)
+    return len(copies)
+
+
+def find_near_duplicates(document, threshold=0.5):
+    """
+    Find near-duplicate documents and chunks through the LSH index.
+
+    The bucket keys of the document and all its chunks are looked up in one
+    query; only the candidates found are compared signature to signature to
+    estimate their Jaccard similarity.
+
+    Args:
+        document: The Document to check
+        threshold: Minimum estimated Jaccard similarity to report
+
+    Returns:
+        dict: Near-duplicate documents, and matching chunks per chunk of this
+        document. Titles are only given for documents of the same owner;
+        other users' are None.
+    """
+    bands, rows = settings.LSH_BANDS, settings.LSH_ROWS
+    own = [
+        (row.chunk_index, np.frombuffer(bytes(row.signature), dtype=np.uint32))
+        for row in MinHashSignature.objects.filter(document=document, bands=bands, rows=rows)
+    ]
+    result = {'documents': [], 'chunks': []}
+    if not own:
+        return result
+
+    # Own signatures by bucket key, then every stored signature sharing a bucket
+    owners = {}
+    for position, (_, signature) in enumerate(own):
+        for key in band_keys(signature, bands, rows):
+            owners.setdefault(key, set()).add(position)
+    pairs = {}
+    for key, signature_id in (
+        LSHBucket.objects
+        .filter(key__in=list(owners), signature__bands=bands, signature__rows=rows)
+        .exclude(signature__document=document)
+        .values_list('key', 'signature_id')
+    ):
+        pairs.setdefault(signature_id, set()).update(owners[key])
+    candidates = (
+        MinHashSignature.objects
+        .filter(id__in=list(pairs))
+        .select_related('document')
+        .only('id', 'chunk_index', 'signature', 'document__id', 'document__title', 'document__uploaded_by')
+    )
+
+    matches = {}
+    for candidate in candidates:
+        candidate_signature = np.frombuffer(bytes(candidate.signature), dtype=np.uint32)
+        for position in pairs[candidate.id]:
+            chunk_index, signature = own[position]
+            if (chunk_index is None) != (candidate.chunk_index is None):
+                continue  # Documents are compared with documents, chunks with chunks
+            similarity = estimate_jaccard(signature, candidate_signature)
+            if similarity < threshold:
+                continue
+            owned = candidate.document.uploaded_by_id == document.uploaded_by_id
+            match = {
+                'document_id': candidate.document.id,
+                'title': candidate.document.title if owned else None,
+                'similarity': round(similarity, 3),
+            }
+            if chunk_index is not None:
+                match['chunk_index'] = candidate.chunk_index
+            matches.setdefault(chunk_index, []).append(match)
+
+    for chunk_index, found in matches.items():
+        found.sort(key=lambda match: match['similarity'], reverse=True)
+        if chunk_index is None:
+            result['documents'] = found
+        else:
+            result['chunks'].append({'chunk_index': chunk_index, 'matches': found})
+    result['chunks'].sort(key=lambda chunk: chunk['chunk_index'])
+    return result
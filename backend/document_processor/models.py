@@ -1,5 +1,11 @@
-from django.db import models
+import codecs
+import zlib
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from .text_pipeline import iter_chunks
+
+TEXT_CHUNK_SIZE = 64 * 1024  # Characters per chunk when streaming extracted text
 
 class Document(models.Model):
     """Model to store uploaded documents and their extracted text."""
@@ -8,20 +14,256 @@ class Document(models.Model):
         ('doc', 'DOC'),
         ('docx', 'DOCX'),
     )
+    STATUS_QUEUED = 'queued'
+    STATUS_EXTRACTING = 'extracting'
+    STATUS_INDEXED = 'indexed'
+    STATUS_FAILED = 'failed'
+    STATUSES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_EXTRACTING, 'Extracting'),
+        (STATUS_INDEXED, 'Indexed'),
+        (STATUS_FAILED, 'Failed'),
+    )
     
     title = models.CharField(max_length=255)
     original_filename = models.CharField(max_length=255, blank=True)
     file_type = models.CharField(max_length=10, choices=DOCUMENT_TYPES)
-    extracted_text = models.TextField(blank=True)
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='documents', null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     originality_score = models.FloatField(null=True, blank=True)  # Allow null until real score is calculated
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_INDEXED)
+    content_sha256 = models.CharField(max_length=64, blank=True, db_index=True)  # Hash of the uploaded bytes
+    text_sha256 = models.CharField(max_length=64, blank=True, db_index=True)  # Hash of the normalized extracted words
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['uploaded_at'], name='document_uploaded_at_idx'),
+            # Covers the score-band aggregate of the admin analytics
+            models.Index(fields=['originality_score', 'uploaded_at'], name='document_score_idx'),
+        ]
+    
+    # Extracted text lives compressed in DocumentText and is only loaded when accessed
+    _extracted_text = None
+    _text_changed = False
     
     def __str__(self):
         return self.title
 
-    def delete(self, *args, **kwargs):
-        # Delete the file when the model instance is deleted
-        if self.file:
-            self.file.delete()
-        super().delete(*args, **kwargs)
+    @property
+    def extracted_text(self):
+        """The extracted text, decompressed from DocumentText on first access."""
+        if self._extracted_text is None:
+            try:
+                self._extracted_text = self.text_content.text if self.pk else ''
+            except DocumentText.DoesNotExist:
+                self._extracted_text = ''
+        return self._extracted_text
+
+    @extracted_text.setter
+    def extracted_text(self, value):
+        self._extracted_text = value or ''
+        self._text_changed = True
+
+    def iter_extracted_text(self, chunk_size=TEXT_CHUNK_SIZE):
+        """Return an iterator over the extracted text in chunks, decompressing it incrementally."""
+        if self._extracted_text is not None:
+            text = self._extracted_text
+            return (text[start:start + chunk_size] for start in range(0, len(text), chunk_size))
+        try:
+            return self.text_content.iter_text(chunk_size)
+        except DocumentText.DoesNotExist:
+            return iter(())
+
+    def save(self, *args, **kwargs):
+        """
+        Save the document and, if the extracted text was assigned, its compressed text row.
+        Chunks cached for the previous text are dropped along with it.
+
+        'extracted_text' may be passed in update_fields like a regular field.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = [field for field in update_fields if field != 'extracted_text']
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self._text_changed:
+                DocumentText.objects.update_or_create(document=self, defaults=DocumentText.pack(self._extracted_text))
+                if not adding:
+                    self.chunks.all().delete()
+                self._text_changed = False
+
+    def get_chunks(self):
+        """
+        Return the cached sentence chunks of the extracted text, building them on first use.
+
+        Concurrent first calls may both build the chunks; conflicting rows are
+        skipped and the stored ones are read back, so every caller gets the same rows.
+        """
+        chunks = list(self.chunks.all())
+        if not chunks and self.extracted_text.strip():
+            with transaction.atomic():
+                DocumentChunk.objects.bulk_create([
+                    DocumentChunk(document=self, index=chunk.index, text=chunk.text, sentence_count=chunk.sentence_count)
+                    for chunk in iter_chunks(self.extracted_text)
+                ], ignore_conflicts=True)
+            chunks = list(self.chunks.all())
+        return chunks
+
+class DocumentText(models.Model):
+    """zlib-compressed extracted text of a Document, kept out of the documents table."""
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, primary_key=True, related_name='text_content')
+    data = models.BinaryField()  # zlib-compressed UTF-8
+    length = models.PositiveIntegerField(default=0)  # Uncompressed length in characters
+
+    @staticmethod
+    def pack(text):
+        """Return the field values storing the given text."""
+        return {'data': zlib.compress(text.encode('utf-8'), 6), 'length': len(text)}
+
+    @property
+    def text(self):
+        return zlib.decompress(bytes(self.data)).decode('utf-8')
+
+    def iter_text(self, chunk_size=TEXT_CHUNK_SIZE):
+        """
+        Decompress and decode the text piece by piece, holding at most about
+        chunk_size bytes of uncompressed data at a time.
+        """
+        data = memoryview(self.data)
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for start in range(0, len(data), chunk_size):
+            pending = data[start:start + chunk_size]
+            while pending:
+                text = decoder.decode(decompressor.decompress(pending, chunk_size))
+                pending = decompressor.unconsumed_tail
+                if text:
+                    yield text
+        text = decoder.decode(decompressor.flush(), final=True)
+        if text:
+            yield text
+
+    def __str__(self):
+        return f"Text of {self.document_id} ({self.length} characters)"
+
+class DocumentChunk(models.Model):
+    """Cached 3-5 sentence chunk of a document, as produced by the text pipeline."""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    text = models.TextField()
+    sentence_count = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['index']
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'index'], name='unique_document_chunk_index'),
+        ]
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.document_id}"
+
+class SimilarityResult(models.Model):
+    """Server-side similarity analysis of a document against matched sources."""
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name='similarity_result')
+    originality_score = models.FloatField()
+    matched_word_count = models.PositiveIntegerField(default=0)
+    total_word_count = models.PositiveIntegerField(default=0)
+    shingle_size = models.PositiveSmallIntegerField()
+    spans = models.JSONField(default=list)  # [start, end] character offsets into extracted_text
+    sources = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Similarity result for {self.document.title}"
+
+class Fingerprint(models.Model):
+    """Winnowed k-gram hash of a document; the hash index serves as the corpus inverted index."""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='fingerprints')
+    hash = models.BigIntegerField()
+    offset = models.PositiveIntegerField()  # Character offset of the k-gram in extracted_text
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['hash', 'document'], name='fingerprint_hash_doc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.hash} @ {self.document_id}:{self.offset}"
+
+class MinHashSignature(models.Model):
+    """MinHash signature of a whole document (chunk_index is null) or of one of its DocumentChunks."""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='minhash_signatures')
+    chunk_index = models.PositiveIntegerField(null=True, blank=True)
+    bands = models.PositiveSmallIntegerField()
+    rows = models.PositiveSmallIntegerField()
+    signature = models.BinaryField()  # bands * rows little-endian uint32 values
+
+    def __str__(self):
+        target = 'document' if self.chunk_index is None else f'chunk {self.chunk_index}'
+        return f"MinHash of {target} in {self.document_id}"
+
+class LSHBucket(models.Model):
+    """One LSH band of a MinHash signature; the key index answers candidate lookups."""
+    signature = models.ForeignKey(MinHashSignature, on_delete=models.CASCADE, related_name='buckets')
+    key = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} -> {self.signature_id}"
+
+class IngestionJob(models.Model):
+    """Database-backed queue entry for extracting and indexing an uploaded file."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUSES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='ingestion_jobs')
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_QUEUED)
+    file_path = models.CharField(max_length=1024)  # Spooled upload, removed once the job finishes
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Lease renewed by the running worker
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='ingestionjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Ingestion of {self.document_id} ({self.status})"
+
+class SearchCacheEntry(models.Model):
+    """Cached web-search results of one normalized chunk query."""
+    key = models.CharField(max_length=64, unique=True)  # SHA-256 of backend, result count and normalized query
+    backend = models.CharField(max_length=20)
+    query = models.TextField()  # Normalized query
+    max_results = models.PositiveSmallIntegerField()
+    results = models.JSONField(default=list)
+    size = models.PositiveIntegerField()  # Bytes of serialized results, for size-bounded eviction
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    last_used_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.backend}: {self.query[:50]}"
+
+class SearchCacheStats(models.Model):
+    """Single-row hit, miss and eviction counters of the search cache."""
+    hits = models.PositiveBigIntegerField(default=0)
+    misses = models.PositiveBigIntegerField(default=0)
+    evictions = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.hits} hits / {self.misses} misses"
@@ -0,0 +1,275 @@
+"""
+Parallel PDF text extraction.
+
+Large PDFs are split into page ranges that are extracted on a pool of worker
+processes, so extraction scales with the number of cores instead of being
+bound to one interpreter.
+
+Whenever a page timeout is set, every PDF goes through the pool, including
+small files and uploaded streams: pool tasks run on the main thread of their
+process, the only place where the SIGALRM page timer works. Each call also
+gets an overall deadline that its tasks honour, so a task that only starts
+late because the pool is busy with other uploads skips its remaining pages
+instead of overrunning. A worker that is still busy well past the deadline
+(its alarm could not interrupt it) is treated as hung: its pool stops taking
+new work and is shut down once the other callers' tasks on it have finished.
+
+The worker side of this module only depends on PyPDF2 so it can be imported
+by freshly spawned processes without setting up Django.
+"""
+import logging
+import mmap
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+PAGE_SEPARATOR = "\n\n"
+HUNG_WORKER_GRACE = 30  # Seconds past its deadline before a busy worker is considered hung
+
+
+class PageTimeout(Exception):
+    """Raised inside a worker when a single page exceeds its time budget."""
+
+
+def _on_timeout(signum, frame):
+    raise PageTimeout()
+
+
+def _can_use_alarm():
+    # Signal handlers can only be installed from the main thread
+    return hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread()
+
+
+def _page_texts(reader, start, stop, page_timeout, deadline=None):
+    """
+    Extract the text of pages [start, stop) of an open PdfReader.
+
+    Args:
+        deadline: time.time() after which the remaining pages are skipped
+
+    Returns:
+        list: One string per page; empty for pages without text, that timed
+            out or that were skipped at the deadline
+    """
+    use_alarm = bool(page_timeout or deadline) and _can_use_alarm()
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_timeout)
+
+    texts = []
+    try:
+        for page_num in range(start, stop):
+            budget = page_timeout
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.warning(f"Skipped PDF pages {page_num + 1}-{stop}: extraction deadline passed")
+                    texts.extend([""] * (stop - page_num))
+                    break
+                budget = min(budget, remaining) if budget else remaining
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, budget)
+            try:
+                texts.append(reader.pages[page_num].extract_text() or "")
+            except PageTimeout:
+                logger.warning(f"Skipped PDF page {page_num + 1}: extraction exceeded {budget:.0f}s")
+                texts.append("")
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous)
+    return texts
+
+
+@contextmanager
+def open_pdf(path, mmap_threshold=None):
+    """
+    Open a PDF on disk as a binary stream for PdfReader.
+
+    Files of at least `mmap_threshold` bytes are memory-mapped read-only, so
+    their pages live in the shared page cache rather than in process memory.
+    """
+    with open(path, 'rb') as file:
+        if mmap_threshold and os.fstat(file.fileno()).st_size >= mmap_threshold:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+        else:
+            yield file
+
+
+@contextmanager
+def spooled_path(stream):
+    """Copy a file-like object to a temporary file that pool workers can open by path."""
+    handle, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            stream.seek(0)
+            shutil.copyfileobj(stream, file)
+        yield path
+    finally:
+        os.remove(path)
+
+
+def _extract_range(path, start, stop, page_timeout, mmap_threshold, deadline=None):
+    """Worker task: open the PDF at `path` and extract pages [start, stop)."""
+    with open_pdf(path, mmap_threshold) as stream:
+        return _page_texts(PyPDF2.PdfReader(stream), start, stop, page_timeout, deadline)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_flight = {}  # Unfinished future -> (pool, deadline), so a retired pool can finish other callers' work
+
+
+def _get_pool(workers):
+    """Return the process-wide extraction pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers do not inherit the web process's threads, locks or connections
+            _pool = ProcessPoolExecutor(max_workers=max(workers, 1), mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _submit(pool, deadline, *args):
+    future = pool.submit(_extract_range, *args, deadline)
+    with _pool_lock:
+        _in_flight[future] = (pool, deadline)
+    future.add_done_callback(_forget)
+    return future
+
+
+def _forget(future):
+    with _pool_lock:
+        _in_flight.pop(future, None)
+
+
+def _shutdown(pool):
+    for process in list((getattr(pool, '_processes', None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _discard_pool(pool):
+    """Drop a broken pool at once; its futures have all failed already."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    _shutdown(pool)
+
+
+def _retire_pool(pool, hung):
+    """
+    Stop sending work to a pool with hung workers.
+
+    The pool keeps running the tasks other calls already submitted to it and
+    is shut down, killing the hung workers, once those are done or past
+    their own deadlines.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+        others = {future: deadline for future, (owner, deadline) in _in_flight.items()
+                  if owner is pool and future not in hung}
+
+    def reap():
+        if others:
+            deadlines = [deadline for deadline in others.values() if deadline is not None]
+            timeout = max(deadlines) - time.time() + HUNG_WORKER_GRACE if len(deadlines) == len(others) else None
+            wait(others, timeout=max(timeout, 0) if timeout is not None else None)
+        _shutdown(pool)
+
+    threading.Thread(target=reap, name='pdf-pool-reaper', daemon=True).start()
+
+
+def page_ranges(page_count, pages_per_task):
+    """Split page numbers [0, page_count) into consecutive (start, stop) ranges."""
+    return [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+
+def extract_pdf_text(file_path_or_stream, workers=1, pages_per_task=8, parallel_min_pages=16, page_timeout=None,
+                     mmap_threshold=None, timeout=None):
+    """
+    Extract the text of a PDF, on the worker pool whenever a timeout applies.
+
+    Args:
+        file_path_or_stream: Path to the PDF file or a file-like object
+        workers: Size of the extraction process pool
+        pages_per_task: Number of pages extracted per pool task
+        parallel_min_pages: Smallest page count that is worth distributing
+        page_timeout: Seconds allowed per page, or None for no limit
+        mmap_threshold: Size in bytes from which files on disk are memory-mapped
+        timeout: Seconds allowed for the whole file; pages still unread by
+            then are skipped. Defaults to page_timeout for every page.
+
+    Returns:
+        str: Page texts joined by blank lines
+
+    Raises:
+        TimeoutError: If the pool did not return within the timeout and grace period
+    """
+    if not isinstance(file_path_or_stream, str):
+        if not page_timeout and not timeout:
+            reader = PyPDF2.PdfReader(file_path_or_stream)
+            return PAGE_SEPARATOR.join(_page_texts(reader, 0, len(reader.pages), None))
+        with spooled_path(file_path_or_stream) as path:
+            return extract_pdf_text(path, workers, pages_per_task, parallel_min_pages, page_timeout, mmap_threshold, timeout)
+
+    with open_pdf(file_path_or_stream, mmap_threshold) as stream:
+        reader = PyPDF2.PdfReader(stream)
+        page_count = len(reader.pages)
+        distribute = workers > 1 and page_count >= parallel_min_pages
+        if not distribute and not page_timeout and not timeout:
+            # Nothing to bound or spread out: extract in the calling thread
+            return PAGE_SEPARATOR.join(_page_texts(reader, 0, page_count, None))
+
+    ranges = page_ranges(page_count, pages_per_task) if distribute else [(0, page_count)]
+    if timeout is None and page_timeout:
+        timeout = page_timeout * page_count
+    return PAGE_SEPARATOR.join(
+        _extract_pooled(file_path_or_stream, ranges, workers, page_timeout, mmap_threshold, timeout)
+    )
+
+
+def _extract_pooled(path, ranges, workers, page_timeout, mmap_threshold, timeout):
+    deadline = time.time() + timeout if timeout else None
+    pool = _get_pool(workers)
+    try:
+        futures = [_submit(pool, deadline, path, start, stop, page_timeout, mmap_threshold) for start, stop in ranges]
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    _, pending = wait(futures, timeout=timeout + HUNG_WORKER_GRACE if timeout else None)
+    if pending:
+        # Tasks that never started are dropped; ones still running ignored their alarm
+        hung = {future for future in pending if not future.cancel()}
+        if hung:
+            logger.error(f"{len(hung)} PDF extraction worker(s) hung past the deadline of {path}; recycling the pool")
+            _retire_pool(pool, hung)
+        raise TimeoutError(f"PDF extraction did not finish within {timeout}s")
+
+    texts = []
+    try:
+        for future in futures:
+            texts.extend(future.result())
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    return texts
@@ -0,0 +1,108 @@
+"""
+Streamed similarity reports.
+
+Reports are generated from the document's extracted text as it is
+decompressed, chunk by chunk, so the first bytes go out immediately and
+neither the full text nor the full report is ever held in memory.
+"""
+import html
+
+from .similarity import is_web_url
+
+
+def iter_marked_segments(chunks, spans):
+    """
+    Split a stream of text chunks at matched span boundaries.
+
+    Args:
+        chunks: Iterable of consecutive text pieces
+        spans: [start, end] character offsets of matched passages
+
+    Yields:
+        tuple: (text, matched) pieces in document order
+    """
+    spans = iter(sorted(spans))
+    current = next(spans, None)
+    position = 0
+    for chunk in chunks:
+        offset = 0
+        while offset < len(chunk):
+            absolute = position + offset
+            while current is not None and current[1] <= absolute:
+                current = next(spans, None)
+            if current is None:
+                yield chunk[offset:], False
+                break
+            start, end = current
+            if absolute < start:
+                cut = min(len(chunk), start - position)
+                yield chunk[offset:cut], False
+            else:
+                cut = min(len(chunk), end - position)
+                yield chunk[offset:cut], True
+            offset = cut
+        position += len(chunk)
+
+
+def iter_text_report(document, result):
+    """Yield a plain-text report, with matched passages wrapped in [[ ]]."""
+    yield f"Originality report: {document.title}\n"
+    yield f"Originality score: {result.originality_score}%\n"
+    yield f"Matched words: {result.matched_word_count} of {result.total_word_count}\n"
+    if result.sources:
+        yield "\nSources:\n"
+        for number, source in enumerate(result.sources, start=1):
+            url = f" ({source['url']})" if source.get('url') else ''
+            yield f"  {number}. {source.get('title') or 'Untitled source'}{url} - {source.get('matchPercentage', 0)}%\n"
+    yield "\n" + "=" * 72 + "\n\n"
+
+    previous = False
+    for text, matched in iter_marked_segments(document.iter_extracted_text(), result.spans):
+        # Adjacent pieces of one passage are split at chunk boundaries; mark the passage once
+        if matched and not previous:
+            yield "[["
+        elif previous and not matched:
+            yield "]]"
+        yield text
+        previous = matched
+    if previous:
+        yield "]]"
+    yield "\n"
+
+
+def iter_html_report(document, result):
+    """Yield a standalone HTML report, with matched passages highlighted."""
+    title = html.escape(document.title)
+    yield (
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        f"<title>Originality report: {title}</title>"
+        "<style>body{font-family:sans-serif;max-width:50em;margin:2em auto;line-height:1.5}"
+        ".text{white-space:pre-wrap}mark{background:#fde68a}</style></head><body>\n"
+        f"<h1>Originality report: {title}</h1>\n"
+        f"<p>Originality score: <strong>{result.originality_score}%</strong><br>"
+        f"Matched words: {result.matched_word_count} of {result.total_word_count}</p>\n"
+    )
+    if result.sources:
+        yield "<h2>Sources</h2>\n<ol>\n"
+        for source in result.sources:
+            label = html.escape(source.get('title') or 'Untitled source')
+            url = source.get('url')
+            if is_web_url(url):
+                label = f"<a href=\"{html.escape(url.strip())}\">{label}</a>"
+            elif url:
+                label = f"{label} ({html.escape(str(url))})"
+            yield f"<li>{label} - {source.get('matchPercentage', 0)}%</li>\n"
+        yield "</ol>\n"
+    yield "<h2>Document</h2>\n<div class=\"text\">"
+
+    for text, matched in iter_marked_segments(document.iter_extracted_text(), result.spans):
+        text = html.escape(text)
+        yield f"<mark>{text}</mark>" if matched else text
+    yield "</div>\n</body></html>\n"
+
+
+# Report type -> (content type, file extension, generator)
+REPORT_TYPES = {
+    'txt': ('text/plain; charset=utf-8', 'txt', iter_text_report),
+    'html': ('text/html; charset=utf-8', 'html', iter_html_report),
+}
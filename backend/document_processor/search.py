@@ -0,0 +1,267 @@
+"""
+Server-side web search for document chunks.
+
+Chunk queries are fanned out concurrently on an asyncio event loop. Every
+query first takes a token from a process-wide token bucket, so the search
+API's rate limit is respected across all users instead of per browser tab.
+Results are yielded per chunk as soon as each query completes. Cached
+results (see search_cache) are answered before any external call is made.
+
+Backends are pluggable through SEARCH_BACKEND:
+
+    google  Google Custom Search JSON API (GOOGLE_SEARCH_API_KEY / GOOGLE_SEARCH_ENGINE_ID)
+    local   SQLite full-text index of local pages, for offline development and tests
+"""
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+from . import search_cache
+
+logger = logging.getLogger(__name__)
+
+QUERY_LENGTH = 150  # Leading characters of a chunk sent as its search query
+
+
+def chunk_query(chunk):
+    """Build the search query for a chunk: its first QUERY_LENGTH characters."""
+    return ' '.join(chunk[:QUERY_LENGTH].split())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every request of a process.
+
+    Callers reserve a token and sleep until it becomes available, so waiting
+    queries are served in arrival order without polling.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token, possibly from the future.
+
+        Returns:
+            float: Seconds to wait before the token may be used
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class SearchBackend:
+    """Base class for search backends."""
+    name = None  # Part of the search cache key
+
+    async def search(self, query, num):
+        """
+        Search for a query.
+
+        Returns:
+            list: Result dicts with title, link, snippet and source keys
+        """
+        raise NotImplementedError
+
+
+class GoogleSearchBackend(SearchBackend):
+    """Google Custom Search JSON API, called through a pooled requests session."""
+    name = 'google'
+    url = 'https://www.googleapis.com/customsearch/v1'
+
+    def __init__(self, api_key, engine_id, timeout=10):
+        if not api_key or not engine_id:
+            raise ValueError('GOOGLE_SEARCH_API_KEY and GOOGLE_SEARCH_ENGINE_ID must be configured')
+        self.api_key = api_key
+        self.engine_id = engine_id
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _search(self, query, num):
+        response = self.session.get(self.url, params={
+            'key': self.api_key,
+            'cx': self.engine_id,
+            'q': query,
+            'num': min(num, 10),
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        return [{
+            'title': item.get('title', ''),
+            'link': item.get('link', ''),
+            'snippet': item.get('snippet', ''),
+            'source': item.get('displayLink', ''),
+        } for item in response.json().get('items', [])]
+
+    async def search(self, query, num):
+        return await asyncio.to_thread(self._search, query, num)
+
+
+class LocalSearchBackend(SearchBackend):
+    """
+    Offline stand-in backed by an SQLite FTS5 table of pages.
+
+    Fill it with `python manage.py load_local_search <files>`.
+    """
+    name = 'local'
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute('CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(title, url UNINDEXED, body)')
+        return connection
+
+    def add_pages(self, pages):
+        """Index (title, url, body) tuples."""
+        with self.connect() as connection:
+            connection.executemany('INSERT INTO pages (title, url, body) VALUES (?, ?, ?)', pages)
+
+    def _search(self, query, num):
+        words = re.findall(r'\w+', query)
+        if not words:
+            return []
+        match = ' OR '.join(f'"{word}"' for word in words)
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT title, url, snippet(pages, 2, '', '', '...', 64) FROM pages "
+                "WHERE pages MATCH ? ORDER BY rank LIMIT ?",
+                (match, num),
+            ).fetchall()
+        return [{'title': title, 'link': url, 'snippet': snippet, 'source': 'local'} for title, url, snippet in rows]
+
+    async def search(self, query, num):
+        return await asyncio.to_thread(self._search, query, num)
+
+
+def get_backend():
+    """Build the search backend selected by the SEARCH_BACKEND setting."""
+    if settings.SEARCH_BACKEND == 'google':
+        return GoogleSearchBackend(
+            settings.GOOGLE_SEARCH_API_KEY, settings.GOOGLE_SEARCH_ENGINE_ID, timeout=settings.SEARCH_TIMEOUT
+        )
+    if settings.SEARCH_BACKEND == 'local':
+        return LocalSearchBackend(settings.LOCAL_SEARCH_DB)
+    raise ValueError(f"Unknown SEARCH_BACKEND '{settings.SEARCH_BACKEND}'")
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide token bucket for search queries."""
+    global _bucket
+    with _bucket_lock:
+        if _bucket is None:
+            _bucket = TokenBucket(settings.SEARCH_RATE_LIMIT, settings.SEARCH_BURST)
+        return _bucket
+
+
+async def search_chunks(chunks, backend, max_results=5, concurrency=8, limiter=None):
+    """
+    Search all chunks concurrently and yield each chunk's results as it completes.
+
+    Args:
+        chunks: Iterable of (chunk id, chunk text) pairs
+        backend: SearchBackend to query
+        max_results: Results requested per chunk
+        concurrency: Maximum number of queries in flight
+        limiter: TokenBucket to take a token from before each query
+
+    Yields:
+        dict: chunkId, chunkText, query, results and, on failure, error
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(chunk_id, chunk):
+        query = chunk_query(chunk)
+        result = {'chunkId': chunk_id, 'chunkText': chunk, 'query': query, 'results': []}
+        async with semaphore:
+            try:
+                if limiter is not None:
+                    await limiter.acquire()
+                result['results'] = await backend.search(query, max_results)
+            except Exception as e:
+                logger.warning(f"Search for chunk {chunk_id} failed: {e}")
+                result['error'] = str(e)
+        return result
+
+    tasks = [asyncio.ensure_future(run(chunk_id, chunk)) for chunk_id, chunk in chunks]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            yield await completed
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def iter_search_ndjson(chunks, backend, max_results=5):
+    """
+    Search chunks and yield their results as NDJSON lines.
+
+    Cached chunks are answered first from one cache lookup; the rest run
+    through search_chunks on a private event loop, and successful results
+    are cached as they arrive. Chunks whose normalized queries are the same
+    are searched once and share the result. Suitable as the body of a
+    StreamingHttpResponse from a synchronous view.
+    """
+    queries = [chunk_query(chunk) for chunk in chunks]
+    keys = [search_cache.cache_key(backend.name, query, max_results) for query in queries]
+    cached = search_cache.lookup(keys)
+
+    pending = {}  # cache key -> uncached (chunk id, chunk) pairs sharing that query
+    for chunk_id, (chunk, query, key) in enumerate(zip(chunks, queries, keys)):
+        if key in cached:
+            yield json.dumps({
+                'chunkId': chunk_id, 'chunkText': chunk, 'query': query, 'results': cached[key], 'cached': True,
+            }) + '\n'
+        else:
+            pending.setdefault(key, []).append((chunk_id, chunk))
+    if not pending:
+        return
+
+    loop = asyncio.new_event_loop()
+    results = search_chunks(
+        [same_query[0] for same_query in pending.values()], backend, max_results,
+        concurrency=settings.SEARCH_CONCURRENCY, limiter=get_rate_limiter(),
+    )
+    stored = False
+    try:
+        while True:
+            try:
+                result = loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                break
+            key = keys[result['chunkId']]
+            if 'error' not in result:
+                search_cache.store(key, backend.name, result['query'], max_results, result['results'])
+                stored = True
+            for chunk_id, chunk in pending[key]:
+                yield json.dumps({**result, 'chunkId': chunk_id, 'chunkText': chunk}) + '\n'
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
+        if stored:
+            search_cache.evict()
@@ -0,0 +1,120 @@
+"""
+Database cache of web-search results, keyed by normalized chunk query.
+
+Queries are normalized (lowercased words, punctuation and spacing dropped)
+before hashing, so boilerplate and resubmitted passages hit the same entry.
+Entries expire after SEARCH_CACHE_TTL seconds. When the cached results grow
+past SEARCH_CACHE_MAX_BYTES, the least recently used entries are evicted.
+"""
+import hashlib
+import json
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import SearchCacheEntry, SearchCacheStats
+
+_WORD_RE = re.compile(r'\w+')
+
+# Eviction frees space down to this share of the size limit, so it does not run on every store
+EVICTION_TARGET = 0.9
+
+
+def normalize_query(query):
+    """Lowercase a query and reduce it to its words separated by single spaces."""
+    return ' '.join(_WORD_RE.findall(query.lower()))
+
+
+def cache_key(backend, query, max_results):
+    """Hash a backend name, result count and query into a cache key."""
+    return hashlib.sha256(f'{backend}:{max_results}:{normalize_query(query)}'.encode('utf-8')).hexdigest()
+
+
+def _count(**increments):
+    stats, _ = SearchCacheStats.objects.get_or_create(id=1)
+    SearchCacheStats.objects.filter(id=stats.id).update(
+        **{name: F(name) + value for name, value in increments.items()}
+    )
+
+
+def lookup(keys):
+    """
+    Fetch the fresh cached results of several keys in one query.
+
+    Hits are marked as recently used; hits and misses are counted.
+
+    Returns:
+        dict: key -> cached result list, for the keys found
+    """
+    keys = set(keys)
+    if not keys:
+        return {}
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.SEARCH_CACHE_TTL)
+    found = dict(
+        SearchCacheEntry.objects
+        .filter(key__in=keys, created_at__gte=cutoff)
+        .values_list('key', 'results')
+    )
+    if found:
+        SearchCacheEntry.objects.filter(key__in=found).update(hits=F('hits') + 1, last_used_at=now)
+    _count(hits=len(found), misses=len(keys) - len(found))
+    return found
+
+
+def store(key, backend, query, max_results, results):
+    """Cache the results of a query, replacing an expired entry with the same key."""
+    now = timezone.now()
+    SearchCacheEntry.objects.update_or_create(key=key, defaults={
+        'backend': backend,
+        'query': normalize_query(query),
+        'max_results': max_results,
+        'results': results,
+        'size': len(json.dumps(results).encode('utf-8')),
+        'created_at': now,
+        'last_used_at': now,
+    })
+
+
+def evict():
+    """
+    Delete expired entries, then least recently used ones while the cache is over its size limit.
+
+    Returns:
+        int: Number of entries deleted
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.SEARCH_CACHE_TTL)
+    deleted, _ = SearchCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+
+    total = SearchCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+    if total > settings.SEARCH_CACHE_MAX_BYTES:
+        excess = total - settings.SEARCH_CACHE_MAX_BYTES * EVICTION_TARGET
+        victims = []
+        for entry_id, size in SearchCacheEntry.objects.order_by('last_used_at').values_list('id', 'size').iterator():
+            victims.append(entry_id)
+            excess -= size
+            if excess <= 0:
+                break
+        for start in range(0, len(victims), 500):
+            deleted += SearchCacheEntry.objects.filter(id__in=victims[start:start + 500]).delete()[0]
+
+    if deleted:
+        _count(evictions=deleted)
+    return deleted
+
+
+def stats():
+    """Return the cache counters together with its current size."""
+    counters = SearchCacheStats.objects.filter(id=1).values('hits', 'misses', 'evictions').first() or {
+        'hits': 0, 'misses': 0, 'evictions': 0,
+    }
+    lookups = counters['hits'] + counters['misses']
+    return {
+        **counters,
+        'hit_rate': round(counters['hits'] / lookups * 100, 1) if lookups else 0.0,
+        'entries': SearchCacheEntry.objects.count(),
+        'bytes': SearchCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0,
+    }
@@ -1,19 +1,48 @@
 from rest_framework import serializers
-from .models import Document
+from .models import Document, DocumentChunk, SimilarityResult
+
+class DocumentListSerializer(serializers.ModelSerializer):
+    """Serializer for Document rows in list responses; the extracted text is left out."""
+    uploaded_by = serializers.ReadOnlyField(source='uploaded_by.username', required=False)
+    
+    class Meta:
+        model = Document
+        fields = ['id', 'title', 'original_filename', 'file_type', 'uploaded_by', 'uploaded_at', 'originality_score', 'status']
+        read_only_fields = ['uploaded_at', 'file_type', 'original_filename', 'status']
 
 class DocumentSerializer(serializers.ModelSerializer):
     """Serializer for Document model."""
     uploaded_by = serializers.ReadOnlyField(source='uploaded_by.username', required=False)
+    extracted_text = serializers.CharField(read_only=True)
     
     class Meta:
         model = Document
-        fields = ['id', 'title', 'original_filename', 'file_type', 'extracted_text', 'uploaded_by', 'uploaded_at', 'originality_score']
-        read_only_fields = ['extracted_text', 'uploaded_at', 'file_type', 'original_filename']
+        fields = ['id', 'title', 'original_filename', 'file_type', 'extracted_text', 'uploaded_by', 'uploaded_at', 'originality_score', 'status']
+        read_only_fields = ['extracted_text', 'uploaded_at', 'file_type', 'original_filename', 'status']
 
 class DocumentTextSerializer(serializers.ModelSerializer):
     """Serializer for returning just the extracted text."""
+    extracted_text = serializers.CharField(read_only=True)
     
     class Meta:
         model = Document
         fields = ['id', 'title', 'extracted_text']
-        read_only_fields = ['id', 'title', 'extracted_text'] 
\ No newline at end of file
+        read_only_fields = ['id', 'title', 'extracted_text']
+
+class DocumentChunkSerializer(serializers.ModelSerializer):
+    """Serializer for a cached sentence chunk of a document."""
+
+    class Meta:
+        model = DocumentChunk
+        fields = ['index', 'text', 'sentence_count']
+        read_only_fields = fields
+
+class SimilarityResultSerializer(serializers.ModelSerializer):
+    """Serializer for a document's server-side similarity result."""
+    document_id = serializers.ReadOnlyField(source='document.id')
+
+    class Meta:
+        model = SimilarityResult
+        fields = ['document_id', 'originality_score', 'matched_word_count', 'total_word_count',
+                  'shingle_size', 'spans', 'sources', 'updated_at']
+        read_only_fields = fields
@@ -0,0 +1,188 @@
+import hashlib
+from urllib.parse import urlsplit
+
+from .text_pipeline import iter_words
+
+# Number of consecutive words hashed into a single shingle
+SHINGLE_SIZE = 4
+
+# URL schemes a source may link to
+WEB_URL_SCHEMES = {'http', 'https'}
+
+
+def is_web_url(url):
+    """Return whether a source URL is an absolute http(s) URL, safe to render as a link."""
+    if not isinstance(url, str):
+        return False
+    parts = urlsplit(url.strip())
+    return parts.scheme.lower() in WEB_URL_SCHEMES and bool(parts.netloc)
+
+
+def tokenize_with_offsets(text):
+    """
+    Split text into lowercase words, keeping their character offsets.
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        list: (word, start, end) tuples in document order
+    """
+    return list(iter_words(text))
+
+
+def hash_shingle(words):
+    """
+    Hash a sequence of words into a stable signed 64-bit integer.
+
+    Python's built-in hash() is salted per process, so a keyed digest is used
+    instead to keep fingerprints comparable across workers and restarts.
+    """
+    digest = hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def shingle_hashes(words, k=SHINGLE_SIZE):
+    """
+    Return the hash of every k-word shingle in a list of words.
+
+    Args:
+        words: List of normalized words
+        k: Number of words per shingle
+
+    Returns:
+        list: One hash per shingle; a text shorter than k words yields a single shingle
+    """
+    if not words:
+        return []
+    if len(words) < k:
+        return [hash_shingle(words)]
+    return [hash_shingle(words[i:i + k]) for i in range(len(words) - k + 1)]
+
+
+class DocumentFingerprint:
+    """
+    Hashed word-shingle fingerprint of a document.
+
+    The fingerprint is built once in linear time and can then be matched
+    against any number of source texts, each in time linear to its length.
+    """
+
+    def __init__(self, text, k=SHINGLE_SIZE):
+        self.text = text or ""
+        self.k = k
+        self.tokens = tokenize_with_offsets(self.text)
+        self.hashes = shingle_hashes([word for word, _, _ in self.tokens], k)
+        self.positions = {}
+        for position, value in enumerate(self.hashes):
+            self.positions.setdefault(value, []).append(position)
+
+    @property
+    def word_count(self):
+        return len(self.tokens)
+
+    def match(self, source_text):
+        """
+        Find the shingles of a source text that also occur in this document.
+
+        Args:
+            source_text: Text of the source (e.g. a search result snippet)
+
+        Returns:
+            tuple: (sorted document word positions where a matching shingle
+            starts, fraction of the source's shingles found in the document)
+        """
+        source_words = [word for word, _, _ in tokenize_with_offsets(source_text)]
+        source_hashes = set(shingle_hashes(source_words, self.k))
+        if not source_hashes or not self.tokens:
+            return [], 0.0
+
+        hits = []
+        matched_shingles = 0
+        for value in source_hashes:
+            positions = self.positions.get(value)
+            if positions:
+                matched_shingles += 1
+                hits.extend(positions)
+        hits.sort()
+
+        return hits, matched_shingles / len(source_hashes)
+
+    def spans(self, hits):
+        """
+        Merge shingle start positions into character spans of the document.
+
+        Args:
+            hits: Sorted word positions where a matching shingle starts
+
+        Returns:
+            list: [start, end] character offsets of each maximal matched run
+        """
+        width = min(self.k, self.word_count)
+        spans = []
+        run_start = run_end = None
+        for position in hits:
+            if run_end is not None and position <= run_end:
+                run_end = max(run_end, position + width)
+                continue
+            if run_end is not None:
+                spans.append([self.tokens[run_start][1], self.tokens[run_end - 1][2]])
+            run_start, run_end = position, position + width
+        if run_end is not None:
+            spans.append([self.tokens[run_start][1], self.tokens[run_end - 1][2]])
+        return spans
+
+
+def compare_document(text, sources, k=SHINGLE_SIZE):
+    """
+    Compare a document against a list of sources and score its originality.
+
+    Args:
+        text: The document's extracted text
+        sources: List of dicts with 'title', 'url' and 'snippet' (or 'text')
+        k: Number of words per shingle
+
+    Returns:
+        dict: Overall originality score, matched spans and per-source matches
+    """
+    fingerprint = DocumentFingerprint(text, k)
+    all_hits = []
+    matched_sources = []
+
+    for source in sources:
+        source_text = source.get('snippet') or source.get('text') or ''
+        hits, source_ratio = fingerprint.match(source_text)
+        if not hits:
+            continue
+
+        all_hits.extend(hits)
+        source_spans = fingerprint.spans(hits)
+        matched_sources.append({
+            'title': source.get('title', ''),
+            'url': source.get('url', ''),
+            'matchPercentage': round(source_ratio * 100),
+            'matchedText': [fingerprint.text[start:end] for start, end in source_spans],
+            'spans': source_spans,
+        })
+
+    all_hits.sort()
+    width = min(k, fingerprint.word_count)
+    covered = bytearray(fingerprint.word_count)
+    for position in all_hits:
+        covered[position:position + width] = b"\x01" * width
+
+    matched_words = sum(covered)
+    total_words = fingerprint.word_count
+    if total_words:
+        originality_score = round(100 - (matched_words / total_words) * 100, 1)
+    else:
+        originality_score = 100.0
+
+    return {
+        'originality_score': originality_score,
+        'matched_word_count': matched_words,
+        'total_word_count': total_words,
+        'shingle_size': k,
+        'spans': fingerprint.spans(all_hits),
+        'sources': matched_sources,
+    }
@@ -1,3 +1,871 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+import docx
+import PyPDF2
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from . import dashboard, ingestion, search_cache
+from .deduplication import text_sha256
+from .fingerprints import WINNOW_WINDOW, find_corpus_matches, index_document, text_fingerprints, winnow
+from .indexing import index_document as index_corpus
+from .ingestion import process_next_job, spool_upload
+from .minhash import MinHasher, estimate_jaccard, find_near_duplicates
+from .models import (
+    Document, DocumentChunk, DocumentText, Fingerprint, IngestionJob, LSHBucket, MinHashSignature, SearchCacheEntry,
+    SimilarityResult,
+)
+from .pdf_extraction import _page_texts, extract_pdf_text, page_ranges
+from .reports import iter_marked_segments
+from .search import LocalSearchBackend, SearchBackend, TokenBucket, iter_search_ndjson, search_chunks
+from .similarity import SHINGLE_SIZE, compare_document
+from .text_pipeline import MAX_SENTENCE_CHARS, iter_blocks, iter_chunks, iter_sentences
+
+
+SAMPLE_TEXT = (
+    "Photosynthesis is the process by which green plants convert light energy into chemical energy. "
+    "This essay argues that the process is central to life on earth. "
+    "Chlorophyll absorbs light most strongly in the blue and red portions of the spectrum."
+)
+
+ESSAY_TEXT = (
+    "The industrial revolution transformed the economic structure of Britain during the eighteenth century. "
+    "Factories replaced cottage industries and drew workers from the countryside into rapidly growing towns. "
+    "Steam power allowed production to scale in ways that water wheels never could."
+)
+
+
+def make_docx(text):
+    """Build an in-memory DOCX upload containing the given paragraphs."""
+    document = docx.Document()
+    for paragraph in text.split('\n'):
+        document.add_paragraph(paragraph)
+    buffer = BytesIO()
+    document.save(buffer)
+    return SimpleUploadedFile(
+        'essay.docx', buffer.getvalue(),
+        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    )
+
+
+def make_pdf(pages):
+    """Build the bytes of a minimal PDF with one line of text per page."""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for text in pages:
+        content = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content))
+        objects.append((
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects)
+        ))
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+class SimilarityEngineTestCase(TestCase):
+    def test_matching_source_produces_spans_and_score(self):
+        sources = [{
+            'title': 'Biology 101',
+            'url': 'https://example.com/bio',
+            'snippet': 'Photosynthesis is the process by which green plants convert light energy into chemical energy.',
+        }]
+        result = compare_document(SAMPLE_TEXT, sources)
+
+        self.assertEqual(len(result['sources']), 1)
+        start, end = result['spans'][0]
+        self.assertEqual(
+            SAMPLE_TEXT[start:end],
+            'Photosynthesis is the process by which green plants convert light energy into chemical energy'
+        )
+        self.assertEqual(result['sources'][0]['matchPercentage'], 100)
+        self.assertLess(result['originality_score'], 100)
+        self.assertGreater(result['originality_score'], 0)
+
+    def test_unrelated_source_is_ignored(self):
+        sources = [{'title': 'Cooking', 'url': 'https://example.com/food', 'snippet': 'Whisk the eggs with sugar until pale.'}]
+        result = compare_document(SAMPLE_TEXT, sources)
+
+        self.assertEqual(result['sources'], [])
+        self.assertEqual(result['spans'], [])
+        self.assertEqual(result['originality_score'], 100.0)
+
+    def test_result_is_deterministic(self):
+        sources = [{'snippet': 'Chlorophyll absorbs light most strongly in the blue and red portions'}]
+        self.assertEqual(compare_document(SAMPLE_TEXT, sources), compare_document(SAMPLE_TEXT, sources))
+
+
+class SimilarityEndpointTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.client.force_authenticate(self.user)
+        self.document = Document.objects.create(
+            title='Essay', file_type='pdf', extracted_text=SAMPLE_TEXT, uploaded_by=self.user
+        )
+        self.url = f'/api/documents/{self.document.id}/similarity/'
+
+    def test_post_persists_result_and_score(self):
+        response = self.client.post(self.url, {
+            'sources': [{'title': 'Bio', 'url': 'https://example.com', 'snippet': 'the process is central to life on earth'}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.originality_score, response.data['originality_score'])
+        self.assertEqual(SimilarityResult.objects.filter(document=self.document).count(), 1)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['sources']), 1)
+
+    def test_get_without_result_returns_404(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_post_rejects_invalid_sources(self):
+        response = self.client.post(self.url, {'sources': 'not a list'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FingerprintIndexTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.other = User.objects.create_user(username='classmate', password='StrongPass123')
+
+    def test_winnow_selects_window_minimum_once(self):
+        hashes = [77, 72, 42, 17, 98, 50, 17, 98, 8, 88, 67, 39, 62, 54]
+        fingerprints = winnow(hashes, window=4)
+
+        self.assertEqual(fingerprints, [(17, 3), (17, 6), (8, 8), (39, 11)])
+
+    def test_shared_passage_always_shares_a_fingerprint(self):
+        passage = ESSAY_TEXT.split('. ')[1]
+        self.assertGreaterEqual(len(passage.split()), WINNOW_WINDOW + SHINGLE_SIZE - 1)
+
+        copied = {value for value, _ in text_fingerprints(f"Completely different opening words here. {passage}.")}
+        original = {value for value, _ in text_fingerprints(ESSAY_TEXT)}
+        self.assertTrue(copied & original)
+
+    def test_corpus_matches_find_earlier_submission(self):
+        earlier = Document.objects.create(title='Earlier', file_type='pdf', extracted_text=ESSAY_TEXT, uploaded_by=self.other)
+        unrelated = Document.objects.create(title='Unrelated', file_type='pdf', extracted_text=SAMPLE_TEXT, uploaded_by=self.other)
+        new = Document.objects.create(title='New', file_type='pdf', extracted_text=ESSAY_TEXT, uploaded_by=self.user)
+        for document in (earlier, unrelated, new):
+            index_document(document)
+
+        matches = find_corpus_matches(new)
+
+        self.assertEqual([match['document_id'] for match in matches], [earlier.id])
+        self.assertEqual(matches[0]['overlap'], 100.0)
+        self.assertIsNone(matches[0]['title'])  # Another user's submission
+
+    def test_corpus_matches_limit_is_validated(self):
+        document = Document.objects.create(title='New', file_type='pdf', extracted_text=ESSAY_TEXT, uploaded_by=self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        self.assertEqual(client.get(f'/api/documents/{document.id}/corpus_matches/?limit=-1').status_code, status.HTTP_200_OK)
+        self.assertEqual(client.get(f'/api/documents/{document.id}/corpus_matches/?limit=x').status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(INGESTION_SPOOL_DIR=tempfile.mkdtemp())
+    def test_processed_upload_is_indexed(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/documents/', {'file': make_docx(ESSAY_TEXT)}, format='multipart')
+
+        process_next_job()
+
+        self.assertTrue(Fingerprint.objects.filter(document_id=response.data['id']).exists())
+
+    def test_backfill_command_indexes_existing_documents(self):
+        Document.objects.create(title='Old', file_type='pdf', extracted_text=ESSAY_TEXT, uploaded_by=self.user)
+        Document.objects.create(title='Older', file_type='pdf', extracted_text=SAMPLE_TEXT, uploaded_by=self.user)
+
+        call_command('index_fingerprints', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(Fingerprint.objects.values('document').distinct().count(), 2)
+
+
+class MinHashLSHTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+
+    def test_signature_estimates_jaccard(self):
+        hasher = MinHasher(256)
+        first = list(range(0, 1000))
+        second = list(range(250, 1250))  # Jaccard = 750 / 1250 = 0.6
+
+        estimate = estimate_jaccard(hasher.signature(first), hasher.signature(second))
+
+        self.assertAlmostEqual(estimate, 0.6, delta=0.08)
+
+    def test_signature_matches_exact_universal_hash(self):
+        hasher = MinHasher(8)
+        hashes = [-1, 0, 17, (1 << 63) - 1, 123456789123]
+        p = (1 << 31) - 1
+
+        expected = [
+            min((int(a) * ((x % (1 << 64)) % p) + int(b)) % p for x in hashes)
+            for a, b in zip(hasher.a, hasher.b)
+        ]
+
+        self.assertEqual(hasher.signature(hashes).tolist(), expected)
+
+    def test_near_duplicates_use_constant_queries_and_hide_other_titles(self):
+        other = User.objects.create_user(username='classmate', password='StrongPass123')
+        original = Document.objects.create(title='Original', file_type='pdf', extracted_text=' '.join([ESSAY_TEXT] * 10), uploaded_by=other)
+        copy = Document.objects.create(title='Copy', file_type='pdf', extracted_text=' '.join([ESSAY_TEXT] * 10), uploaded_by=self.user)
+        for document in (original, copy):
+            index_corpus(document)
+        self.assertGreater(MinHashSignature.objects.filter(document=copy).count(), 2)
+
+        with self.assertNumQueries(3):
+            result = find_near_duplicates(copy)
+
+        self.assertEqual(result['documents'][0]['document_id'], original.id)
+        self.assertIsNone(result['documents'][0]['title'])
+        self.assertTrue(result['chunks'])
+
+    def test_near_duplicates_found_and_removed_on_delete(self):
+        original = Document.objects.create(title='Original', file_type='pdf', extracted_text=ESSAY_TEXT, uploaded_by=self.user)
+        copy = Document.objects.create(title='Copy', file_type='pdf', extracted_text=ESSAY_TEXT + ' The end.', uploaded_by=self.user)
+        unrelated = Document.objects.create(title='Unrelated', file_type='pdf', extracted_text=SAMPLE_TEXT, uploaded_by=self.user)
+        for document in (original, copy, unrelated):
+            index_corpus(document)
+
+        result = find_near_duplicates(copy)
+        self.assertEqual([match['document_id'] for match in result['documents']], [original.id])
+        self.assertEqual(result['chunks'][0]['matches'][0]['chunk_index'], 0)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.delete(f'/api/documents/{original.id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(MinHashSignature.objects.filter(document_id=original.id).exists())
+        self.assertFalse(LSHBucket.objects.filter(signature__document_id=original.id).exists())
+        self.assertEqual(find_near_duplicates(copy)['documents'], [])
+
+    def test_near_duplicates_threshold_is_validated_and_clamped(self):
+        document = Document.objects.create(title='Essay', file_type='pdf', extracted_text=ESSAY_TEXT, uploaded_by=self.user)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/documents/{document.id}/near_duplicates/'
+
+        for threshold in ['nan', 'inf', '-inf', 'high']:
+            self.assertEqual(client.get(url, {'threshold': threshold}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch('document_processor.views.find_near_duplicates', return_value={}) as find:
+            for requested, used in [('-2', 0.0), ('0.3', 0.3), ('7', 1.0)]:
+                self.assertEqual(client.get(url, {'threshold': requested}).status_code, status.HTTP_200_OK)
+                self.assertEqual(find.call_args.kwargs['threshold'], used)
+
+    def test_benchmark_command_reports_each_config(self):
+        out = StringIO()
+        call_command('benchmark_lsh', documents=200, queries=20, shingles=50, configs='16x4,8x8', stdout=out)
+
+        self.assertIn('16x4', out.getvalue())
+        self.assertIn('8x8', out.getvalue())
+
+
+class TextPipelineTestCase(TestCase):
+    PARAGRAPHS = (
+        "First point here. Second point here. Third point here.\n\n"
+        "A new paragraph starts. It keeps going. And going further. Then it ends. Really ends. One more."
+    )
+
+    def test_streamed_blocks_match_whole_text(self):
+        self.assertEqual(
+            list(iter_chunks(iter_blocks(self.PARAGRAPHS, block_size=5))),
+            list(iter_chunks(self.PARAGRAPHS))
+        )
+
+    def test_chunks_break_at_paragraphs_and_merge_short_tail(self):
+        chunks = list(iter_chunks(self.PARAGRAPHS))
+
+        self.assertEqual([chunk.sentence_count for chunk in chunks], [3, 6])
+        self.assertTrue(chunks[1].text.startswith('A new paragraph starts.'))
+
+    def test_line_wraps_do_not_split_sentences(self):
+        sentences = [sentence.text for sentence in iter_sentences("A sentence wrapped\nacross lines. Next one")]
+        self.assertEqual(sentences, ['A sentence wrapped across lines.', 'Next one.'])
+
+    def test_unpunctuated_text_is_split_with_bounded_sentences(self):
+        sentences = list(iter_sentences('word ' * 2000))
+        self.assertTrue(all(len(sentence.text) <= MAX_SENTENCE_CHARS + 1 for sentence in sentences))
+
+    def test_chunks_endpoint_caches_chunks(self):
+        user = User.objects.create_user(username='student', password='StrongPass123')
+        document = Document.objects.create(title='Essay', file_type='docx', extracted_text=self.PARAGRAPHS, uploaded_by=user)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get(f'/api/documents/{document.id}/chunks/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['chunks']), 2)
+        self.assertEqual(DocumentChunk.objects.filter(document=document).count(), 2)
+
+    def test_new_text_drops_cached_chunks(self):
+        document = Document.objects.create(title='Essay', file_type='docx', extracted_text=self.PARAGRAPHS)
+        document.get_chunks()
+
+        document.extracted_text = 'Only one short sentence.'
+        document.save(update_fields=['extracted_text'])
+
+        self.assertEqual([chunk.text for chunk in Document.objects.get(id=document.id).get_chunks()],
+                         ['Only one short sentence.'])
+
+    def test_chunks_built_concurrently_are_not_duplicated(self):
+        document = Document.objects.create(title='Essay', file_type='docx', extracted_text=self.PARAGRAPHS)
+        competitor = Document.objects.get(id=document.id)
+
+        raced = []
+
+        def racing_chunks(text):
+            # Another request stores the chunks after this one found none
+            if not raced:
+                raced.append(True)
+                competitor.get_chunks()
+            return iter_chunks(text)
+
+        with patch('document_processor.models.iter_chunks', side_effect=racing_chunks):
+            chunks = document.get_chunks()
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(DocumentChunk.objects.filter(document=document).count(), 2)
+
+
+@override_settings(INGESTION_SPOOL_DIR=tempfile.mkdtemp())
+class IngestionQueueTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.client.force_authenticate(self.user)
+
+    def test_workers_start_with_the_process_unless_run_separately(self):
+        with patch.object(ingestion.ingestion_pool, 'start') as start:
+            with override_settings(INGESTION_WORKERS=0):
+                ingestion.start_workers()
+            start.assert_not_called()
+            with override_settings(INGESTION_WORKERS=2):
+                ingestion.start_workers()
+            start.assert_called_once()
+
+    def test_upload_is_queued_then_extracted_by_worker(self):
+        response = self.client.post('/api/documents/', {'file': make_docx(ESSAY_TEXT)}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Document.STATUS_QUEUED)
+        job = IngestionJob.objects.get(id=response.data['job_id'])
+        self.assertTrue(os.path.exists(job.file_path))
+
+        self.assertTrue(process_next_job())
+        self.assertFalse(process_next_job())
+
+        document = Document.objects.get(id=response.data['id'])
+        self.assertEqual(document.status, Document.STATUS_INDEXED)
+        self.assertIn('industrial revolution', document.extracted_text)
+        self.assertFalse(os.path.exists(job.file_path))
+
+        status_response = self.client.get(f"/api/documents/{document.id}/status/")
+        self.assertEqual(status_response.data['status'], Document.STATUS_INDEXED)
+        self.assertEqual(status_response.data['job']['status'], IngestionJob.STATUS_DONE)
+
+    def test_unreadable_file_marks_document_failed(self):
+        upload = SimpleUploadedFile('broken.pdf', b'not really a pdf', content_type='application/pdf')
+        response = self.client.post('/api/documents/', {'file': upload}, format='multipart')
+
+        process_next_job()
+
+        document = Document.objects.get(id=response.data['id'])
+        self.assertEqual(document.status, Document.STATUS_FAILED)
+        self.assertTrue(document.ingestion_jobs.get().error)
+
+    def test_temporary_upload_is_moved_into_spool(self):
+        content = make_docx(ESSAY_TEXT).read()
+        upload = TemporaryUploadedFile('essay.docx', 'application/octet-stream', len(content), None)
+        upload.write(content)
+        upload.seek(0)
+        temporary_path = upload.temporary_file_path()
+
+        path, digest = spool_upload(upload)
+        upload.close()
+
+        self.assertFalse(os.path.exists(temporary_path))
+        with open(path, 'rb') as spooled:
+            self.assertEqual(spooled.read(), content)
+        self.assertEqual(digest, hashlib.sha256(content).hexdigest())
+        os.remove(path)
+
+    @override_settings(MAX_UPLOAD_SIZE=1024)
+    def test_oversized_upload_is_rejected(self):
+        response = self.client.post('/api/documents/', {'file': make_docx(ESSAY_TEXT)}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(Document.objects.exists())
+
+    def test_worker_command_drains_queue(self):
+        for _ in range(2):
+            self.client.post('/api/documents/', {'file': make_docx(ESSAY_TEXT)}, format='multipart')
+
+        out = StringIO()
+        call_command('run_ingestion_worker', once=True, stdout=out)
+
+        self.assertIn('Processed 2 ingestion jobs', out.getvalue())
+        self.assertFalse(Document.objects.exclude(status=Document.STATUS_INDEXED).exists())
+
+
+class DocumentTextStorageTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.client.force_authenticate(self.user)
+        self.text = ' '.join([ESSAY_TEXT] * 50)
+        self.document = Document.objects.create(title='Essay', file_type='docx', extracted_text=self.text, uploaded_by=self.user)
+
+    def test_text_is_stored_compressed_in_companion_row(self):
+        row = DocumentText.objects.get(document=self.document)
+        self.assertEqual(row.length, len(self.text))
+        self.assertLess(len(bytes(row.data)), len(self.text) // 10)
+        self.assertEqual(Document.objects.get(id=self.document.id).extracted_text, self.text)
+
+    def test_update_fields_saves_assigned_text(self):
+        self.document.extracted_text = 'Replaced text.'
+        self.document.status = Document.STATUS_INDEXED
+        self.document.save(update_fields=['extracted_text', 'status'])
+
+        self.assertEqual(Document.objects.get(id=self.document.id).extracted_text, 'Replaced text.')
+
+    def test_list_leaves_text_out_and_detail_includes_it(self):
+        with self.assertNumQueries(2):
+            listed = self.client.get('/api/documents/')
+        self.assertNotIn('extracted_text', listed.data[0])
+
+        detail = self.client.get(f'/api/documents/{self.document.id}/')
+        self.assertEqual(detail.data['extracted_text'], self.text)
+
+
+class StreamedReportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.client.force_authenticate(self.user)
+        self.document = Document.objects.create(
+            title='Essay', file_type='docx', extracted_text=ESSAY_TEXT, uploaded_by=self.user
+        )
+
+    def test_compressed_text_is_streamed_in_chunks(self):
+        text = 'Grüße aus der Fabrik. ' * 5000
+        row = DocumentText(**DocumentText.pack(text))
+        pieces = list(row.iter_text(chunk_size=1000))
+
+        self.assertGreater(len(pieces), 10)
+        self.assertEqual(''.join(pieces), text)
+
+    def test_marked_segments_split_across_chunks(self):
+        chunks = ['abcde', 'fghij', 'klmno']
+        segments = list(iter_marked_segments(chunks, [[3, 7], [12, 20]]))
+
+        self.assertEqual(''.join(text for text, _ in segments), 'abcdefghijklmno')
+        self.assertEqual(''.join(text for text, matched in segments if matched), 'defgmno')
+
+    def test_download_text_streams_extracted_text(self):
+        response = self.client.get(f'/api/documents/{self.document.id}/download_text/')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content).decode('utf-8'), ESSAY_TEXT)
+
+    def test_report_highlights_matched_passages(self):
+        source = {'title': 'Encyclopedia', 'url': 'https://example.com/industry', 'snippet': ESSAY_TEXT.split('. ')[1]}
+        self.client.post(f'/api/documents/{self.document.id}/similarity/', {'sources': [source]}, format='json')
+
+        text_report = self.client.get(f'/api/documents/{self.document.id}/report/')
+        body = b''.join(text_report.streaming_content).decode('utf-8')
+        self.assertIn('Encyclopedia (https://example.com/industry)', body)
+        self.assertIn('[[' + source['snippet'], body)
+
+        html_report = self.client.get(f'/api/documents/{self.document.id}/report/', {'type': 'html'})
+        self.assertEqual(html_report['Content-Type'], 'text/html; charset=utf-8')
+        self.assertIn('<mark>', b''.join(html_report.streaming_content).decode('utf-8'))
+
+    def test_report_links_only_web_urls(self):
+        response = self.client.post(f'/api/documents/{self.document.id}/similarity/', {
+            'sources': [{'title': 'Trap', 'url': 'javascript:alert(1)', 'snippet': ESSAY_TEXT}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        SimilarityResult.objects.create(document=self.document, originality_score=50.0, shingle_size=SHINGLE_SIZE, sources=[
+            {'title': 'Trap', 'url': ' javascript:alert(1)', 'matchPercentage': 10},
+            {'title': 'Page', 'url': 'https://example.com/page', 'matchPercentage': 5},
+        ])
+        html_report = self.client.get(f'/api/documents/{self.document.id}/report/', {'type': 'html'})
+        body = b''.join(html_report.streaming_content).decode('utf-8')
+        self.assertIn('<li>Trap ( javascript:alert(1)) - 10%</li>', body)
+        self.assertIn('<a href="https://example.com/page">Page</a>', body)
+
+    def test_report_requires_similarity_result(self):
+        response = self.client.get(f'/api/documents/{self.document.id}/report/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(INGESTION_SPOOL_DIR=tempfile.mkdtemp())
+class DeduplicationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.client.force_authenticate(self.user)
+
+    def upload(self, text):
+        return self.client.post('/api/documents/', {'file': make_docx(text)}, format='multipart')
+
+    def test_text_hash_ignores_case_spacing_and_punctuation(self):
+        self.assertEqual(text_sha256('Steam power, at scale.'), text_sha256('steam   POWER at\n\nscale'))
+        self.assertNotEqual(text_sha256('steam power'), text_sha256('water power'))
+        self.assertEqual(text_sha256('  ...  '), '')
+
+    def test_identical_upload_reuses_processed_document(self):
+        content = make_docx(ESSAY_TEXT).read()
+        first = self.client.post('/api/documents/', {'file': SimpleUploadedFile('essay.docx', content)}, format='multipart')
+        process_next_job()
+        original = Document.objects.get(id=first.data['id'])
+        self.client.post(f'/api/documents/{original.id}/similarity/', {'sources': []}, format='json')
+
+        second = self.client.post('/api/documents/', {'file': SimpleUploadedFile('essay.docx', content)}, format='multipart')
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(second.data['job_id'])
+        self.assertEqual(second.data['status'], Document.STATUS_INDEXED)
+        self.assertEqual(IngestionJob.objects.count(), 1)
+        duplicate = Document.objects.get(id=second.data['id'])
+        self.assertEqual(duplicate.content_sha256, original.content_sha256)
+        self.assertEqual(duplicate.extracted_text, original.extracted_text)
+        self.assertEqual(duplicate.fingerprints.count(), original.fingerprints.count())
+        self.assertEqual(duplicate.minhash_signatures.count(), original.minhash_signatures.count())
+        self.assertEqual(duplicate.chunks.count(), original.chunks.count())
+        self.assertEqual(duplicate.similarity_result.originality_score, original.similarity_result.originality_score)
+        self.assertEqual(find_corpus_matches(duplicate)[0]['document_id'], original.id)
+
+    def test_same_text_in_different_file_skips_indexing(self):
+        self.upload(ESSAY_TEXT)
+        process_next_job()
+        original = Document.objects.get()
+
+        response = self.upload(ESSAY_TEXT.replace('. ', '.\n'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        process_next_job()
+
+        duplicate = Document.objects.get(id=response.data['id'])
+        self.assertNotEqual(duplicate.content_sha256, original.content_sha256)
+        self.assertEqual(duplicate.text_sha256, original.text_sha256)
+        self.assertEqual(duplicate.status, Document.STATUS_INDEXED)
+        self.assertEqual(duplicate.extracted_text, original.extracted_text)
+        self.assertEqual(duplicate.fingerprints.count(), original.fingerprints.count())
+
+
+class SlowBackend(SearchBackend):
+    """Search backend that answers longer queries later and records its concurrency."""
+
+    name = 'slow'
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def search(self, query, num):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(len(query) / 1000)
+        self.active -= 1
+        if 'fail' in query:
+            raise RuntimeError('quota exceeded')
+        return [{'title': query, 'link': 'https://example.com', 'snippet': query, 'source': 'example.com'}]
+
+
+class WebSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.client.force_authenticate(self.user)
+
+    def collect(self, results):
+        async def drain():
+            return [result async for result in results]
+        return asyncio.run(drain())
+
+    def test_token_bucket_spaces_out_queries_beyond_burst(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        delays = [bucket.reserve() for _ in range(4)]
+
+        self.assertEqual(delays[:2], [0.0, 0.0])
+        self.assertAlmostEqual(delays[2], 0.1, places=2)
+        self.assertAlmostEqual(delays[3], 0.2, places=2)
+
+    def test_chunks_are_searched_concurrently_and_yielded_as_completed(self):
+        backend = SlowBackend()
+        chunks = ['x' * 60, 'x' * 10, 'fail ' + 'x' * 20, 'x' * 30]
+
+        with self.assertLogs('document_processor.search', level='WARNING'):
+            results = self.collect(search_chunks(enumerate(chunks), backend, concurrency=3))
+
+        self.assertEqual([result['chunkId'] for result in results], [1, 2, 3, 0])
+        self.assertEqual(backend.peak, 3)
+        self.assertEqual(results[1]['error'], 'quota exceeded')
+        self.assertEqual(len(results[0]['results']), 1)
+
+    def test_search_endpoint_streams_local_backend_results(self):
+        database = os.path.join(tempfile.mkdtemp(), 'search.sqlite3')
+        LocalSearchBackend(database).add_pages([
+            ('Industrial history', 'https://example.com/industry', ESSAY_TEXT),
+            ('Cooking', 'https://example.com/cooking', 'Whisk the eggs and fold in the flour.'),
+        ])
+        document = Document.objects.create(title='Essay', file_type='docx', extracted_text=ESSAY_TEXT, uploaded_by=self.user)
+
+        with override_settings(SEARCH_BACKEND='local', LOCAL_SEARCH_DB=database):
+            response = self.client.post(f'/api/documents/{document.id}/search/', {'max_results': 1}, format='json')
+            lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        results = [json.loads(line) for line in lines]
+        self.assertEqual(len(results), len(document.get_chunks()))
+        self.assertEqual(results[0]['results'][0]['title'], 'Industrial history')
+
+    def test_search_endpoint_clamps_max_results(self):
+        document = Document.objects.create(title='Essay', file_type='docx', extracted_text=ESSAY_TEXT, uploaded_by=self.user)
+        url = f'/api/documents/{document.id}/search/'
+
+        with patch('document_processor.views.get_search_backend', return_value=SlowBackend()), \
+                patch('document_processor.views.iter_search_ndjson', return_value=iter([])) as search:
+            for requested, used in [(-3, 1), (0, 1), (4, 4), (50, 10)]:
+                self.client.post(url, {'chunks': ['text'], 'max_results': requested}, format='json')
+                self.assertEqual(search.call_args.args[2], used)
+            response = self.client.post(url, {'chunks': ['text'], 'max_results': 'many'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(SEARCH_MAX_CHUNKS=2, SEARCH_MAX_CHUNK_CHARS=10)
+    def test_search_endpoint_caps_client_chunks(self):
+        document = Document.objects.create(title='Essay', file_type='docx', extracted_text=ESSAY_TEXT, uploaded_by=self.user)
+        url = f'/api/documents/{document.id}/search/'
+
+        with patch('document_processor.views.get_search_backend', return_value=SlowBackend()), \
+                patch('document_processor.views.iter_search_ndjson', return_value=iter([])) as search:
+            for chunks in [['a', 'b', 'c'], ['a', 'x' * 11]]:
+                response = self.client.post(url, {'chunks': chunks}, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertFalse(search.called)
+
+            response = self.client.post(url, {'chunks': ['a', 'x' * 10]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(SEARCH_BACKEND='google', GOOGLE_SEARCH_API_KEY='')
+    def test_search_endpoint_requires_configured_backend(self):
+        document = Document.objects.create(title='Essay', file_type='docx', extracted_text=ESSAY_TEXT, uploaded_by=self.user)
+        response = self.client.post(f'/api/documents/{document.id}/search/', {'chunks': ['text']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class SearchCacheTestCase(TestCase):
+    def search(self, backend, chunks):
+        return [json.loads(line) for line in iter_search_ndjson(chunks, backend, max_results=3)]
+
+    def test_query_normalization_shares_cache_key(self):
+        self.assertEqual(
+            search_cache.cache_key('google', 'The  Industrial Revolution, began...', 5),
+            search_cache.cache_key('google', 'the industrial revolution began', 5),
+        )
+        self.assertNotEqual(
+            search_cache.cache_key('google', 'the industrial revolution', 5),
+            search_cache.cache_key('local', 'the industrial revolution', 5),
+        )
+
+    def test_repeated_chunks_are_served_from_cache(self):
+        backend = SlowBackend()
+        chunks = ['Steam power changed production.', 'Factories drew workers to towns.']
+
+        first = self.search(backend, chunks)
+        second = self.search(backend, ['STEAM power changed production!', 'A new passage about canals.'])
+
+        self.assertEqual(backend.calls, 3)
+        self.assertFalse(any(result.get('cached') for result in first))
+        self.assertTrue(second[0]['cached'])
+        self.assertEqual(second[0]['results'], next(r for r in first if r['chunkId'] == 0)['results'])
+        stats = search_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 3, 3))
+
+    def test_chunks_with_the_same_query_are_searched_once(self):
+        backend = SlowBackend()
+        chunks = ['Steam power changed production.', 'Canals came first.', 'steam power, changed production']
+
+        results = sorted(self.search(backend, chunks), key=lambda result: result['chunkId'])
+
+        self.assertEqual(backend.calls, 2)
+        self.assertEqual([result['chunkText'] for result in results], chunks)
+        self.assertEqual(results[0]['results'], results[2]['results'])
+
+    def test_failed_searches_are_not_cached(self):
+        backend = SlowBackend()
+        with self.assertLogs('document_processor.search', level='WARNING'):
+            self.search(backend, ['this search will fail'])
+            self.search(backend, ['this search will fail'])
+
+        self.assertEqual(backend.calls, 2)
+        self.assertFalse(SearchCacheEntry.objects.exists())
+
+    def test_expired_entries_are_refreshed(self):
+        backend = SlowBackend()
+        self.search(backend, ['Steam power changed production.'])
+        SearchCacheEntry.objects.update(created_at=timezone.now() - timedelta(days=30))
+
+        self.search(backend, ['Steam power changed production.'])
+
+        self.assertEqual(backend.calls, 2)
+        self.assertEqual(SearchCacheEntry.objects.count(), 1)
+
+    def test_least_recently_used_entries_are_evicted_over_size_limit(self):
+        now = timezone.now()
+        for age, query in enumerate(['oldest query', 'older query', 'newest query']):
+            search_cache.store(search_cache.cache_key('slow', query, 3), 'slow', query, 3, [{'snippet': 'x' * 100}])
+            SearchCacheEntry.objects.filter(query=query).update(last_used_at=now - timedelta(hours=3 - age))
+        size = SearchCacheEntry.objects.first().size
+
+        with override_settings(SEARCH_CACHE_MAX_BYTES=size * 2):
+            self.assertEqual(search_cache.evict(), 2)
+
+        self.assertEqual(list(SearchCacheEntry.objects.values_list('query', flat=True)), ['newest query'])
+        self.assertEqual(search_cache.stats()['evictions'], 2)
+
+
+class PdfExtractionTestCase(TestCase):
+    def setUp(self):
+        self.pages = [f'Page {number} of the thesis' for number in range(1, 21)]
+        handle, self.path = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(handle, 'wb') as file:
+            file.write(make_pdf(self.pages))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_page_ranges_cover_every_page_once(self):
+        self.assertEqual(page_ranges(20, 8), [(0, 8), (8, 16), (16, 20)])
+        self.assertEqual(page_ranges(0, 8), [])
+
+    def test_serial_extraction_joins_pages(self):
+        text = extract_pdf_text(self.path, workers=1, page_timeout=5)
+        self.assertEqual(text.split('\n\n'), self.pages)
+
+    def test_parallel_extraction_matches_serial(self):
+        serial = extract_pdf_text(self.path, workers=1)
+        parallel = extract_pdf_text(self.path, workers=2, pages_per_task=3, parallel_min_pages=4, page_timeout=5)
+        self.assertEqual(parallel, serial)
+
+    def test_memory_mapped_extraction_matches_buffered(self):
+        self.assertEqual(
+            extract_pdf_text(self.path, mmap_threshold=1),
+            extract_pdf_text(self.path, mmap_threshold=None),
+        )
+
+    def test_stream_input_without_timeout_is_extracted_in_process(self):
+        with open(self.path, 'rb') as file, patch('document_processor.pdf_extraction._get_pool') as get_pool:
+            self.assertEqual(extract_pdf_text(file, workers=4, parallel_min_pages=1), '\n\n'.join(self.pages))
+        get_pool.assert_not_called()
+
+    def test_timed_stream_and_small_inputs_run_on_the_pool(self):
+        # Pool workers run tasks on their main thread, where the page alarm works
+        with patch('document_processor.pdf_extraction._extract_pooled', return_value=self.pages) as pooled:
+            with open(self.path, 'rb') as file:
+                self.assertEqual(extract_pdf_text(file, workers=1, page_timeout=5), '\n\n'.join(self.pages))
+            extract_pdf_text(self.path, workers=1, page_timeout=5)
+
+        self.assertEqual(pooled.call_count, 2)
+        self.assertEqual(pooled.call_args.args[1], [(0, 20)])
+
+    def test_pages_past_the_deadline_are_skipped(self):
+        with open(self.path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            texts = _page_texts(reader, 0, 3, page_timeout=5, deadline=time.time() - 1)
+
+        self.assertEqual(texts, ['', '', ''])
+
+
+class DashboardTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.documents = [
+            Document.objects.create(title=f'Essay {n}', file_type='pdf', extracted_text=SAMPLE_TEXT,
+                                    uploaded_by=self.user, originality_score=score)
+            for n, score in enumerate([80.0, 90.0, None])
+        ]
+        old = timezone.now() - timedelta(days=45)
+        Document.objects.filter(id=self.documents[0].id).update(uploaded_at=old)
+
+    def test_stats_come_from_one_aggregate_and_are_cached(self):
+        with self.assertNumQueries(2):  # Recent documents, then one aggregate
+            response = self.client.get('/api/documents/dashboard/')
+        self.assertEqual(response.data['stats'], {
+            'totalDocuments': 3, 'recentScans': 2, 'scanChange': 100.0, 'avgOriginality': 85.0,
+        })
+        self.assertEqual([doc['name'] for doc in response.data['recentDocuments']][-1], 'Essay 0')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/documents/dashboard/').data, response.data)
+
+    def test_cache_is_dropped_when_a_score_changes(self):
+        self.client.get('/api/documents/dashboard/')
+        self.client.post(f'/api/documents/{self.documents[2].id}/similarity/',
+                         {'sources': [{'title': 'Copy', 'snippet': SAMPLE_TEXT}]}, format='json')
+
+        response = self.client.get('/api/documents/dashboard/')
+        self.assertEqual(response.data['stats']['avgOriginality'], 56.7)
+
+    @override_settings(DASHBOARD_CACHE_TTL=300, DASHBOARD_LOCAL_CACHE_TTL=10)
+    def test_process_local_cache_keeps_entries_briefly(self):
+        with patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.client.get('/api/documents/dashboard/')
+        self.assertEqual(cache_set.call_args.args[2], 10)
+
+        with patch('document_processor.dashboard.caches', {'default': object()}):
+            self.assertEqual(dashboard.cache_timeout(), 300)
+
+    def test_cache_is_dropped_on_delete_but_kept_for_unrelated_saves(self):
+        self.client.get('/api/documents/dashboard/')
+        document = self.documents[1]
+        document.status = Document.STATUS_FAILED
+        document.save(update_fields=['status'])
+        with self.assertNumQueries(0):
+            self.client.get('/api/documents/dashboard/')
+
+        document.delete()
+        self.assertEqual(self.client.get('/api/documents/dashboard/').data['stats']['totalDocuments'], 2)
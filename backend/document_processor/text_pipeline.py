@@ -0,0 +1,196 @@
+"""
+Streaming text pipeline shared by every server-side text consumer.
+
+Each stage is a generator over the output of the previous one:
+
+    iter_blocks -> normalize -> split_sentences -> chunk_sentences
+
+iter_words yields the words of a text with their offsets, for fingerprinting.
+
+Blocks are read lazily and each stage only holds the sentence (or chunk) it
+is currently building, so multi-megabyte texts are processed in a single
+pass with bounded memory.
+"""
+import re
+from collections import namedtuple
+
+Sentence = namedtuple('Sentence', ['text', 'paragraph_start'])
+Chunk = namedtuple('Chunk', ['index', 'text', 'sentence_count'])
+
+BLOCK_SIZE = 64 * 1024
+
+# Sentences longer than this are split at a word boundary to bound buffering
+MAX_SENTENCE_CHARS = 2000
+
+WORD_RE = re.compile(r"\w+(?:'\w+)*")
+
+_DISALLOWED_RE = re.compile(r"[^\w\s.,?!;:'\"()-]")
+_HORIZONTAL_SPACE_RE = re.compile(r"[^\S\n]+")
+_LINE_BREAKS_RE = re.compile(r" ?\n[\s]*")
+_TRAILING_SPACE_RE = re.compile(r"\s*\Z")
+_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+|\n\n")
+
+def iter_blocks(source, block_size=BLOCK_SIZE):
+    """
+    Yield a text source in blocks.
+
+    Args:
+        source: A string, a text file-like object, or an iterable of strings
+            (e.g. page texts)
+        block_size: Maximum characters per block for strings and files
+    """
+    if isinstance(source, str):
+        for start in range(0, len(source), block_size):
+            yield source[start:start + block_size]
+    elif hasattr(source, 'read'):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                break
+            yield block
+    else:
+        yield from source
+
+
+def normalize(blocks):
+    """
+    Clean a stream of text blocks.
+
+    Line endings are unified, characters other than word characters, whitespace
+    and basic punctuation are dropped, runs of spaces collapse to one space and
+    blank lines collapse to a single paragraph break ("\\n\\n"). Whitespace at
+    the end of a block is carried into the next one so runs spanning blocks
+    are collapsed correctly.
+    """
+    carry = ''
+    started = False
+    for block in blocks:
+        pending = carry + block
+        tail = _TRAILING_SPACE_RE.search(pending).start()
+        carry = pending[tail:]
+        text = pending[:tail].replace('\r\n', '\n').replace('\r', '\n')
+        if not started:
+            text = text.lstrip()
+        if not text:
+            continue
+
+        text = _DISALLOWED_RE.sub('', text)
+        text = _HORIZONTAL_SPACE_RE.sub(' ', text)
+        text = _LINE_BREAKS_RE.sub(lambda m: '\n\n' if m.group().count('\n') > 1 else '\n', text)
+        started = True
+        yield text
+
+
+def _clean_sentence(text):
+    text = text.replace('\n', ' ').strip()
+    if text and text[-1] not in '.!?':
+        text += '.'
+    return text
+
+
+def split_sentences(pieces):
+    """
+    Split normalized text into sentences.
+
+    A sentence ends at terminal punctuation followed by whitespace, or at a
+    paragraph break. A sentence starts a paragraph when it follows a blank
+    line, or a line break directly after terminal punctuation. Single line
+    breaks elsewhere (PDF line wrapping) are treated as spaces.
+
+    Yields:
+        Sentence: (text, paragraph_start) tuples
+    """
+    buffer = ''
+    paragraph_start = True
+    for piece in pieces:
+        buffer += piece
+        position = 0
+        for match in _BOUNDARY_RE.finditer(buffer):
+            text = _clean_sentence(buffer[position:match.start()])
+            if text:
+                yield Sentence(text, paragraph_start)
+                paragraph_start = '\n' in match.group()
+            else:
+                paragraph_start = paragraph_start or '\n' in match.group()
+            position = match.end()
+        buffer = buffer[position:]
+
+        while len(buffer) > MAX_SENTENCE_CHARS:
+            cut = buffer.rfind(' ', 0, MAX_SENTENCE_CHARS)
+            cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+            text = _clean_sentence(buffer[:cut])
+            if text:
+                yield Sentence(text, paragraph_start)
+                paragraph_start = False
+            buffer = buffer[cut:].lstrip()
+
+    text = _clean_sentence(buffer)
+    if text:
+        yield Sentence(text, paragraph_start)
+
+
+def iter_words(text):
+    """
+    Yield the lowercase words of a text with their character offsets.
+
+    Yields:
+        tuple: (word, start, end)
+    """
+    for match in WORD_RE.finditer(text or ''):
+        yield match.group().lower(), match.start(), match.end()
+
+
+def chunk_sentences(sentences, min_size=3, max_size=5):
+    """
+    Group sentences into chunks for similarity search.
+
+    A chunk is closed when it reaches max_size sentences, or when it has at
+    least min_size sentences and the next sentence starts a paragraph. A
+    final remainder shorter than min_size is merged into the previous chunk,
+    so only one finished chunk is ever held back.
+
+    Yields:
+        Chunk: (index, text, sentence_count) tuples
+    """
+    current = []
+    held = None
+    index = 0
+
+    def release(texts):
+        nonlocal held, index
+        previous = held
+        held = Chunk(index, ' '.join(texts), len(texts))
+        index += 1
+        return previous
+
+    for sentence in sentences:
+        if len(current) >= min_size and sentence.paragraph_start:
+            previous = release(current)
+            if previous:
+                yield previous
+            current = []
+
+        current.append(sentence.text)
+        if len(current) >= max_size:
+            previous = release(current)
+            if previous:
+                yield previous
+            current = []
+
+    if current and held and len(current) < min_size:
+        held = Chunk(held.index, held.text + ' ' + ' '.join(current), held.sentence_count + len(current))
+        current = []
+    if held:
+        yield held
+    if current:
+        yield Chunk(index, ' '.join(current), len(current))
+
+
+def iter_sentences(source):
+    """Run a text source through normalization and sentence splitting."""
+    return split_sentences(normalize(iter_blocks(source)))
+
+
+def iter_chunks(source, min_size=3, max_size=5):
+    """Run a text source through the pipeline up to sentence chunks."""
+    return chunk_sentences(iter_sentences(source), min_size=min_size, max_size=max_size)
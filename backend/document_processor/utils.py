@@ -1,7 +1,36 @@
 import os
-import PyPDF2
 import docx
-from io import BytesIO
+from django.conf import settings
+
+from .pdf_extraction import extract_pdf_text
+
+class ExtractionError(Exception):
+    """Raised when text cannot be extracted from a document."""
+
+
+def read_pdf_text(file_path_or_stream):
+    """
+    Extract text from a PDF file, raising on failure.
+    
+    Args:
+        file_path_or_stream: Path to the PDF file or a file-like object
+        
+    Returns:
+        str: Extracted text from the PDF
+    """
+    # Check if input is a file path or a file-like object
+    if not (isinstance(file_path_or_stream, str) and os.path.exists(file_path_or_stream)) \
+            and not hasattr(file_path_or_stream, 'read'):
+        raise ExtractionError("Invalid PDF input")
+    
+    return extract_pdf_text(
+        file_path_or_stream,
+        workers=settings.PDF_EXTRACTION_WORKERS,
+        pages_per_task=settings.PDF_PAGES_PER_TASK,
+        parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES,
+        page_timeout=settings.PDF_PAGE_TIMEOUT,
+        mmap_threshold=settings.PDF_MMAP_THRESHOLD,
+    )
 
 def extract_text_from_pdf(file_path_or_stream):
     """
@@ -13,33 +42,30 @@ def extract_text_from_pdf(file_path_or_stream):
     Returns:
         str: Extracted text from the PDF
     """
-    text = ""
     try:
-        # Check if input is a file path or a file-like object
-        if isinstance(file_path_or_stream, str) and os.path.exists(file_path_or_stream):
-            with open(file_path_or_stream, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text()
-                    # Add a newline between pages for better readability
-                    if page_num < len(pdf_reader.pages) - 1:
-                        text += "\n\n"
-        elif hasattr(file_path_or_stream, 'read'):
-            # It's a file-like object
-            pdf_reader = PyPDF2.PdfReader(file_path_or_stream)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text()
-                # Add a newline between pages for better readability
-                if page_num < len(pdf_reader.pages) - 1:
-                    text += "\n\n"
-        else:
-            return "Invalid PDF input"
+        return read_pdf_text(file_path_or_stream)
+    except ExtractionError as e:
+        return str(e)
     except Exception as e:
-        text = f"Error extracting text from PDF: {str(e)}"
+        return f"Error extracting text from PDF: {str(e)}"
+
+def read_docx_text(file_path_or_stream):
+    """
+    Extract text from a DOCX file, raising on failure.
+    
+    Args:
+        file_path_or_stream: Path to the DOCX file or a file-like object
+        
+    Returns:
+        str: Extracted text from the DOCX
+    """
+    # Check if input is a file path or a file-like object
+    if not (isinstance(file_path_or_stream, str) and os.path.exists(file_path_or_stream)) \
+            and not hasattr(file_path_or_stream, 'read'):
+        raise ExtractionError("Invalid DOCX input")
     
-    return text
+    doc = docx.Document(file_path_or_stream)
+    return "".join(para.text + "\n" for para in doc.paragraphs if para.text)
 
 def extract_text_from_docx(file_path_or_stream):
     """
@@ -51,26 +77,12 @@ def extract_text_from_docx(file_path_or_stream):
     Returns:
         str: Extracted text from the DOCX
     """
-    text = ""
     try:
-        # Check if input is a file path or a file-like object
-        if isinstance(file_path_or_stream, str) and os.path.exists(file_path_or_stream):
-            doc = docx.Document(file_path_or_stream)
-            for para in doc.paragraphs:
-                if para.text:
-                    text += para.text + "\n"
-        elif hasattr(file_path_or_stream, 'read'):
-            # It's a file-like object
-            doc = docx.Document(file_path_or_stream)
-            for para in doc.paragraphs:
-                if para.text:
-                    text += para.text + "\n"
-        else:
-            return "Invalid DOCX input"
+        return read_docx_text(file_path_or_stream)
+    except ExtractionError as e:
+        return str(e)
     except Exception as e:
-        text = f"Error extracting text from DOCX: {str(e)}"
-    
-    return text
+        return f"Error extracting text from DOCX: {str(e)}"
 
 def extract_text_from_doc(file_path_or_stream):
     """
@@ -104,4 +116,31 @@ def extract_text(file_path_or_stream, file_type):
     elif file_type == 'doc':
         return extract_text_from_doc(file_path_or_stream)
     else:
-        return "Unsupported file type. Please upload a PDF or DOCX file." 
\ No newline at end of file
+        return "Unsupported file type. Please upload a PDF or DOCX file."
+
+def read_text(file_path_or_stream, file_type):
+    """
+    Extract text from a document based on its file type, raising on failure.
+    
+    Args:
+        file_path_or_stream: Path to the document file or a file-like object
+        file_type: Type of the document (pdf, docx, doc)
+        
+    Returns:
+        str: Extracted text from the document
+        
+    Raises:
+        ExtractionError: If the file type is unsupported or the file cannot be read
+    """
+    try:
+        if file_type == 'pdf':
+            return read_pdf_text(file_path_or_stream)
+        elif file_type == 'docx':
+            return read_docx_text(file_path_or_stream)
+        elif file_type == 'doc':
+            return extract_text_from_doc(file_path_or_stream)
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"Error extracting text from {file_type.upper()}: {str(e)}") from e
+    raise ExtractionError("Unsupported file type. Please upload a PDF or DOCX file.")
@@ -1,20 +1,22 @@
-from django.shortcuts import render
-import os
-from io import BytesIO
+import math
+
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, parser_classes, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from django.http import HttpResponse
-from .models import Document
-from .serializers import DocumentSerializer, DocumentTextSerializer
-from .utils import extract_text_from_pdf, extract_text_from_docx, extract_text_from_doc
-from django.db.models import Count
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models.functions import TruncMonth
-from django.db import models
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from authentication import audit
+from .models import Document, SimilarityResult
+from .serializers import DocumentSerializer, DocumentListSerializer, DocumentTextSerializer, DocumentChunkSerializer, SimilarityResultSerializer
+from .similarity import compare_document, is_web_url
+from .fingerprints import find_corpus_matches
+from .dashboard import get_dashboard
+from .ingestion import enqueue_upload
+from .minhash import find_near_duplicates
+from .reports import REPORT_TYPES
+from .search import get_backend as get_search_backend, iter_search_ndjson
 
 # Create your views here.
 
@@ -29,11 +31,30 @@ class DocumentViewSet(viewsets.ModelViewSet):
         """Filter documents to only show those uploaded by the current user."""
         return Document.objects.filter(uploaded_by=self.request.user)
     
+    def get_serializer_class(self):
+        """List responses leave out the extracted text; it is only loaded for a single document."""
+        if self.action == 'list':
+            return DocumentListSerializer
+        return DocumentSerializer
+    
     def create(self, request, *args, **kwargs):
         """
-        Override create method to handle file upload without saving to disk.
-        Process the file in memory and only store the extracted text.
+        Override create method to accept an upload without extracting it in the request.
+        The file is spooled and queued; a worker extracts and indexes the text,
+        and clients poll the status endpoint until it is indexed.
         """
+        too_large = Response(
+            {"error": f"File is too large. Maximum size is {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB."},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        # Reject oversized bodies before the multipart parser streams them to disk
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > settings.MAX_UPLOAD_SIZE:
+            return too_large
+        
         # Get the uploaded file
         uploaded_file = request.FILES.get('file')
         title = request.data.get('title', '')
@@ -41,6 +62,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if not uploaded_file:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
         
+        if uploaded_file.size > settings.MAX_UPLOAD_SIZE:
+            return too_large
+        
         if not title:
             title = uploaded_file.name
         
@@ -48,78 +72,56 @@ class DocumentViewSet(viewsets.ModelViewSet):
         file_name = uploaded_file.name.lower()
         if file_name.endswith('.pdf'):
             file_type = 'pdf'
-            extracted_text = self.process_pdf_in_memory(uploaded_file)
         elif file_name.endswith('.docx'):
             file_type = 'docx'
-            extracted_text = self.process_docx_in_memory(uploaded_file)
         elif file_name.endswith('.doc'):
             file_type = 'doc'
-            extracted_text = "Direct extraction from DOC files is not supported. Please convert to DOCX format for better results."
         else:
             return Response(
                 {"error": "Unsupported file type. Please upload a PDF or DOCX file."},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create document object without saving the file
-        document_data = {
-            'title': title,
-            'file_type': file_type,
-            'extracted_text': extracted_text,
-            'original_filename': uploaded_file.name,
-            'uploaded_by': request.user,
-        }
+        document, job = enqueue_upload(uploaded_file, request.user, title, file_type)
+        audit.record('info', 'document-service', f'Document uploaded: {document.title}', request.user,
+                     documentId=document.id, fileType=file_type, jobId=job.id if job else None)
         
-        # Create document in database
-        document = Document.objects.create(**document_data)
+        if job is None:
+            # Identical file already processed; its results were reused
+            return Response({
+                'id': document.id,
+                'title': document.title,
+                'status': document.status,
+                'job_id': None,
+                'message': 'Document uploaded; an identical file was already processed'
+            }, status=status.HTTP_201_CREATED)
         
         return Response({
             'id': document.id,
             'title': document.title,
-            'extracted_text': document.extracted_text,
-            'message': 'Document uploaded and processed successfully'
-        }, status=status.HTTP_201_CREATED)
+            'status': document.status,
+            'job_id': job.id,
+            'message': 'Document uploaded and queued for processing'
+        }, status=status.HTTP_202_ACCEPTED)
     
-    def process_pdf_in_memory(self, file):
-        """Process PDF file in memory without saving to disk."""
-        try:
-            # Create a BytesIO object from the content
-            file_stream = BytesIO(file.read())
-            
-            # Extract text from the BytesIO object
-            import PyPDF2
-            pdf_reader = PyPDF2.PdfReader(file_stream)
-            
-            text = ""
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() or ""  # Handle None return value
-                # Add a newline between pages for better readability
-                if page_num < len(pdf_reader.pages) - 1:
-                    text += "\n\n"
-            
-            return text
-        except Exception as e:
-            return f"Error extracting text from PDF: {str(e)}"
-    
-    def process_docx_in_memory(self, file):
-        """Process DOCX file in memory without saving to disk."""
-        try:
-            # Create a BytesIO object from the content
-            file_stream = BytesIO(file.read())
-            
-            # Extract text from the BytesIO object
-            import docx
-            doc = docx.Document(file_stream)
-            
-            text = ""
-            for para in doc.paragraphs:
-                if para.text:
-                    text += para.text + "\n"
-            
-            return text
-        except Exception as e:
-            return f"Error extracting text from DOCX: {str(e)}"
+    @action(detail=True, methods=['get'], url_path='status')
+    def ingestion_status(self, request, pk=None):
+        """Return the processing status of an uploaded document."""
+        document = self.get_object()
+        job = document.ingestion_jobs.order_by('-id').first()
+        return Response({
+            'id': document.id,
+            'status': document.status,
+            'job': {
+                'id': job.id,
+                'status': job.status,
+                'attempts': job.attempts,
+                'error': job.error,
+                'created_at': job.created_at,
+                'started_at': job.started_at,
+                'finished_at': job.finished_at,
+            } if job else None
+        })
     
     @action(detail=True, methods=['get'])
     def extracted_text(self, request, pk=None):
@@ -130,84 +132,170 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
     @action(detail=True, methods=['get'])
     def download_text(self, request, pk=None):
-        """Download the extracted text as a plain text file."""
+        """Download the extracted text as a plain text file, streamed as it is decompressed."""
         document = self.get_object()
-        response = HttpResponse(document.extracted_text, content_type='text/plain')
+        response = StreamingHttpResponse(document.iter_extracted_text(), content_type='text/plain; charset=utf-8')
         response['Content-Disposition'] = f'attachment; filename="{document.title}_extracted.txt"'
         return response
 
+    @action(detail=True, methods=['get'])
+    def report(self, request, pk=None):
+        """
+        Download a similarity report highlighting the matched passages.
+        ?type=txt (default) or ?type=html; the report is streamed as it is generated.
+        """
+        document = self.get_object()
+        try:
+            result = document.similarity_result
+        except SimilarityResult.DoesNotExist:
+            return Response(
+                {"error": "No similarity result has been computed for this document"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        report_type = request.query_params.get('type', 'txt')
+        if report_type not in REPORT_TYPES:
+            return Response(
+                {"error": f"Unsupported report type. Use one of: {', '.join(REPORT_TYPES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        content_type, extension, generate = REPORT_TYPES[report_type]
+        response = StreamingHttpResponse(generate(document, result), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{document.title}_report.{extension}"'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def chunks(self, request, pk=None):
+        """Return the 3-5 sentence chunks used for similarity search."""
+        document = self.get_object()
+        serializer = DocumentChunkSerializer(document.get_chunks(), many=True)
+        return Response({'document_id': document.id, 'chunks': serializer.data})
+
     @action(detail=True, methods=['post'])
-    def update_originality_score(self, request, pk=None):
-        """Update the originality score for a document after frontend analysis."""
+    def search(self, request, pk=None):
+        """
+        Search the web for each chunk of a document and stream the per-chunk
+        results as newline-delimited JSON, in completion order.
+
+        The body may carry the client's own `chunks`, up to SEARCH_MAX_CHUNKS
+        of at most SEARCH_MAX_CHUNK_CHARS each; otherwise the document's cached
+        chunks are searched.
+        """
         document = self.get_object()
-        score = request.data.get('score')
-        
-        if score is None:
+        chunks = request.data.get('chunks')
+        if chunks is None:
+            chunks = [chunk.text for chunk in document.get_chunks()]
+        elif not isinstance(chunks, list) or not all(isinstance(chunk, str) for chunk in chunks):
             return Response(
-                {"error": "Score is required"},
+                {"error": "Invalid chunks format. Expected a list of strings."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
+        elif len(chunks) > settings.SEARCH_MAX_CHUNKS:
+            return Response(
+                {"error": f"Too many chunks. At most {settings.SEARCH_MAX_CHUNKS} can be searched at once."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        elif any(len(chunk) > settings.SEARCH_MAX_CHUNK_CHARS for chunk in chunks):
+            return Response(
+                {"error": f"Chunks must be at most {settings.SEARCH_MAX_CHUNK_CHARS} characters long."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            max_results = max(1, min(int(request.data.get('max_results', 5)), 10))
+        except (TypeError, ValueError):
+            return Response({"error": "max_results must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            score = float(score)
-            if not (0 <= score <= 100):
-                raise ValueError("Score must be between 0 and 100")
+            backend = get_search_backend()
         except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        return StreamingHttpResponse(
+            iter_search_ndjson(chunks, backend, max_results),
+            content_type='application/x-ndjson'
+        )
+
+    @action(detail=True, methods=['get', 'post'])
+    def similarity(self, request, pk=None):
+        """
+        Return the stored similarity result for a document, or (on POST)
+        compute it server-side against the given sources and persist it.
+        """
+        document = self.get_object()
+
+        if request.method == 'GET':
+            try:
+                result = document.similarity_result
+            except SimilarityResult.DoesNotExist:
+                return Response(
+                    {"error": "No similarity result has been computed for this document"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(SimilarityResultSerializer(result).data)
+
+        sources = request.data.get('sources')
+        if not isinstance(sources, list):
             return Response(
-                {"error": str(e)},
+                {"error": "Invalid sources format. Expected a list."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        document.originality_score = score
-        document.save()
-        
+        if not all(isinstance(source, dict) for source in sources):
+            return Response(
+                {"error": "Each source must be an object with a snippet or text."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if any(source.get('url') and not is_web_url(source['url']) for source in sources):
+            return Response(
+                {"error": "Source URLs must be absolute http or https URLs."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        analysis = compare_document(document.extracted_text, sources)
+        result, _ = SimilarityResult.objects.update_or_create(
+            document=document,
+            defaults=analysis
+        )
+
+        document.originality_score = analysis['originality_score']
+        document.save(update_fields=['originality_score'])
+
+        return Response(SimilarityResultSerializer(result).data)
+
+    @action(detail=True, methods=['get'])
+    def corpus_matches(self, request, pk=None):
+        """Return previously stored documents sharing fingerprints with this one."""
+        document = self.get_object()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 100))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'document_id': document.id,
+            'matches': find_corpus_matches(document, limit=limit)
+        })
+
+    @action(detail=True, methods=['get'])
+    def near_duplicates(self, request, pk=None):
+        """Return near-duplicate documents and chunks found through the LSH index."""
+        document = self.get_object()
+        try:
+            threshold = float(request.query_params.get('threshold', 0.5))
+        except ValueError:
+            threshold = math.nan
+        if not math.isfinite(threshold):
+            return Response({"error": "threshold must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        threshold = max(0.0, min(threshold, 1.0))
+
         return Response({
-            "message": "Score updated successfully",
-            "score": score
+            'document_id': document.id,
+            **find_near_duplicates(document, threshold=threshold)
         })
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_dashboard_data(request):
-    # Get user's documents
-    user_documents = Document.objects.filter(uploaded_by=request.user)
-    
-    # Get recent documents
-    recent_documents = user_documents.order_by('-uploaded_at')[:4]
-    recent_docs_data = [{
-        'id': doc.id,
-        'name': doc.title,
-        'date': doc.uploaded_at.strftime('%Y-%m-%d'),
-        'score': doc.originality_score  # Use the actual originality score
-    } for doc in recent_documents]
-    
-    # Calculate total documents
-    total_documents = user_documents.count()
-    
-    # Calculate monthly trend
-    last_month = timezone.now() - timedelta(days=30)
-    recent_scans = user_documents.filter(uploaded_at__gte=last_month).count()
-    
-    # Calculate month-over-month change
-    previous_month = last_month - timedelta(days=30)
-    previous_month_scans = user_documents.filter(
-        uploaded_at__gte=previous_month,
-        uploaded_at__lt=last_month
-    ).count()
-    
-    scan_change = ((recent_scans - previous_month_scans) / max(previous_month_scans, 1)) * 100 if previous_month_scans else 0
-    
-    # Calculate real average originality score
-    avg_originality = user_documents.aggregate(
-        avg_score=models.Avg('originality_score')
-    )['avg_score'] or 100.0  # Default to 100 if no documents exist
-    
-    return Response({
-        'recentDocuments': recent_docs_data,
-        'stats': {
-            'totalDocuments': total_documents,
-            'recentScans': recent_scans,
-            'scanChange': scan_change,
-            'avgOriginality': round(avg_originality, 1)  # Round to 1 decimal place
-        }
-    })
+    # Served from a per-user cache, dropped whenever one of the user's documents changes
+    return Response(get_dashboard(request.user))
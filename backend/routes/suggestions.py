@@ -1,8 +1,14 @@
 from flask import Blueprint, jsonify, request, current_app
-from models.suggestion import Suggestion
-from models.database import db
+import os
+
+import django
+
+# Suggestions live in the Django database; both apps go through suggestions.repository
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'turnitin_backend.settings')
+django.setup()
+
+from suggestions import repository
 from services.llm_service import LLMService
-from datetime import datetime
 
 suggestions_bp = Blueprint('suggestions', __name__)
 
@@ -12,8 +18,9 @@ def generate_suggestions():
         data = request.get_json()
         text = data.get('text')
         matched_sources = data.get('matched_sources', [])
+        document_id = data.get('document_id')
         
-        if not text or not matched_sources:
+        if not text or not matched_sources or not document_id:
             return jsonify({'error': 'Missing required fields'}), 400
             
         llm_service = LLMService(
@@ -22,10 +29,10 @@ def generate_suggestions():
             site_name=current_app.config['SITE_NAME']
         )
         
-        suggestions = llm_service.generate_suggestions(text, matched_sources)
+        suggestions = llm_service.generate_suggestions(text, matched_sources, document_id)
         
         return jsonify({
-            'suggestions': [suggestion.to_dict() for suggestion in suggestions]
+            'suggestions': repository.serialize_suggestions(suggestions)
         }), 200
         
     except Exception as e:
@@ -35,11 +42,11 @@ def generate_suggestions():
 @suggestions_bp.route('/api/suggestions/<int:document_id>', methods=['GET'])
 def get_suggestions(document_id):
     try:
-        suggestions = Suggestion.query.filter_by(document_id=document_id).all()
+        suggestions = repository.suggestions_for_document(document_id)
         return jsonify({
-            'suggestions': [suggestion.to_dict() for suggestion in suggestions]
+            'suggestions': repository.serialize_suggestions(suggestions)
         }), 200
         
     except Exception as e:
         current_app.logger.error(f"Error fetching suggestions: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500 
\ No newline at end of file
+        return jsonify({'error': 'Internal server error'}), 500
@@ -0,0 +1,94 @@
+"""
+Process-wide registry of pooled LLM API clients.
+
+Clients are created lazily, once per (base URL, API key) and process, and then
+shared by every request thread. Their httpx connection pool keeps connections
+to the API alive between calls, so a suggestion request only pays the model
+latency instead of a new TLS handshake. The OpenAI client is thread-safe; the
+registry itself is guarded by a lock and is rebuilt after a fork so gunicorn
+workers never share sockets inherited from the master process.
+"""
+import os
+import threading
+
+import httpx
+from django.conf import settings
+from openai import OpenAI
+
+DEFAULTS = {
+    'LLM_BASE_URL': 'https://openrouter.ai/api/v1',
+    'LLM_MAX_CONNECTIONS': 20,
+    'LLM_MAX_KEEPALIVE_CONNECTIONS': 10,
+    'LLM_KEEPALIVE_EXPIRY': 30.0,
+    'LLM_CONNECT_TIMEOUT': 5.0,
+    'LLM_READ_TIMEOUT': 120.0,
+    'LLM_MAX_RETRIES': 2,
+}
+
+_clients = {}
+_clients_pid = os.getpid()
+_lock = threading.Lock()
+
+
+def _setting(name):
+    # The Flask app shares this module without configuring Django settings
+    if settings.configured:
+        return getattr(settings, name, DEFAULTS[name])
+    return DEFAULTS[name]
+
+
+def build_client(api_key, base_url):
+    """Create an OpenAI client with a keep-alive connection pool and explicit timeouts."""
+    read_timeout = _setting('LLM_READ_TIMEOUT')
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=_setting('LLM_MAX_CONNECTIONS'),
+            max_keepalive_connections=_setting('LLM_MAX_KEEPALIVE_CONNECTIONS'),
+            keepalive_expiry=_setting('LLM_KEEPALIVE_EXPIRY'),
+        ),
+        timeout=httpx.Timeout(read_timeout, connect=_setting('LLM_CONNECT_TIMEOUT')),
+    )
+    return OpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        http_client=http_client,
+        max_retries=_setting('LLM_MAX_RETRIES'),
+    )
+
+
+def get_client(api_key, base_url=None):
+    """
+    Return the shared client for an API key, creating it on first use.
+
+    Args:
+        api_key: API key of the LLM provider
+        base_url: API base URL; defaults to the LLM_BASE_URL setting
+
+    Returns:
+        OpenAI: Client safe to use from any thread of this process
+    """
+    global _clients_pid
+    key = (base_url or _setting('LLM_BASE_URL'), api_key)
+    if _clients_pid == os.getpid():
+        client = _clients.get(key)
+        if client is not None:
+            return client
+
+    with _lock:
+        if _clients_pid != os.getpid():
+            # Forked: pooled sockets belong to the parent process
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = build_client(api_key, key[0])
+        return client
+
+
+def close_clients():
+    """Close every pooled client of this process, e.g. on worker shutdown."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
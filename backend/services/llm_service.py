@@ -1,358 +1,641 @@
-from typing import List, Dict, Any, Tuple
-from openai import OpenAI
+from typing import List, Dict, Any, Tuple, Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from suggestions import llm_cache, llm_metrics, repository
+from suggestions.llm_cache import paraphrase_key
 from suggestions.models import Suggestion
+from services.llm_client import get_client
+from openai import RateLimitError
 from datetime import datetime
+import itertools
 import json
 import logging
+import queue
+import re
 
 logger = logging.getLogger(__name__)
 
+# Bump when the paraphrase prompt changes so cached paraphrases are not reused
+PROMPT_VERSION = 2
+
+# Rough token estimate: about four characters per token, plus the separator line
+CHARS_PER_TOKEN = 4
+SEGMENT_OVERHEAD_TOKENS = 4
+
+
+class StructuredOutputError(Exception):
+    """The model's response is not the JSON document that was asked for."""
+
+
+class SuggestionGenerationError(Exception):
+    """Suggestions could not be generated; the underlying error is its __cause__."""
+
+
+def parse_segment_results(content: str, ids, key: str = 'segments') -> Dict[int, str]:
+    """
+    Validate a {"segments": [{"id": ..., "text": ...}]} response.
+
+    Markdown code fences and text around the JSON object are tolerated.
+    Entries with an unknown id, a duplicate id or an empty text are ignored,
+    so a partly valid response still yields the segments it got right.
+
+    Args:
+        content: Raw completion content
+        ids: Segment ids that were sent
+        key: Name of the list member; citations are answered under "citations"
+
+    Returns:
+        Mapping of segment id to text for the valid entries
+
+    Raises:
+        StructuredOutputError: If no JSON object with such a list can be read
+    """
+    start, end = content.find('{'), content.rfind('}')
+    if start == -1 or end < start:
+        raise StructuredOutputError("Response contains no JSON object")
+    try:
+        document = json.loads(content[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Response is not valid JSON: {e}")
+    entries = document.get(key) if isinstance(document, dict) else None
+    if not isinstance(entries, list):
+        raise StructuredOutputError(f"Response has no {key} list")
+
+    ids = set(ids)
+    results = {}
+    for entry in entries:
+        item = segment_entry(entry, ids)
+        if item is not None and item[0] not in results:
+            results[item[0]] = item[1]
+    return results
+
+
+def segment_entry(entry, ids):
+    """
+    Validate one {"id": ..., "text": ...} entry of a segments response.
+
+    Returns:
+        tuple: (id, stripped text), or None if the entry is malformed or its id was not sent
+    """
+    if not isinstance(entry, dict):
+        return None
+    segment_id, text = entry.get('id'), entry.get('text')
+    if isinstance(segment_id, bool):
+        return None
+    if isinstance(segment_id, str) and segment_id.isdigit():
+        segment_id = int(segment_id)
+    if segment_id in ids and isinstance(text, str) and text.strip():
+        return segment_id, text.strip()
+    return None
+
+
+def iter_json_array_items(chunks: Iterable[str], key: str) -> Iterator[Any]:
+    """
+    Yield the items of a JSON object's `key` array from streamed text, each as soon as it is complete.
+
+    Text before the array (e.g. a code fence) is skipped. The stream is
+    consumed to its end even after the array closes.
+
+    Args:
+        chunks: Consecutive pieces of the response text
+        key: Name of the array member
+    """
+    decoder = json.JSONDecoder()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buffer = ''
+    position = None
+    closed = False
+    for chunk in chunks:
+        if closed:
+            continue
+        buffer += chunk
+        if position is None:
+            match = start.search(buffer)
+            if not match:
+                continue
+            position = match.end()
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position >= len(buffer):
+                break
+            if buffer[position] == ']':
+                closed = True
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # Incomplete item; wait for more text
+            yield item
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text without a tokenizer."""
+    return len(text) // CHARS_PER_TOKEN + SEGMENT_OVERHEAD_TOKENS
+
+
+def pack_segments(indexes: List[int], texts: List[str], input_budget: int, output_budget: int, max_segments: int) -> List[List[int]]:
+    """
+    Pack segments, in order, into batches that fit the token budgets.
+
+    A paraphrase is about as long as its segment, so each segment's estimate
+    counts against both the input and the output budget. A segment larger
+    than a budget gets a batch of its own.
+
+    Args:
+        indexes: Indexes of the segments to pack
+        texts: Segment texts, indexed by `indexes`
+        input_budget: Maximum estimated prompt tokens of segment text per batch
+        output_budget: Maximum estimated completion tokens per batch
+        max_segments: Maximum number of segments per batch
+
+    Returns:
+        List of batches, each a list of segment indexes
+    """
+    budget = min(input_budget, output_budget)
+    batches, batch, used = [], [], 0
+    for index in indexes:
+        tokens = estimate_tokens(texts[index])
+        if batch and (used + tokens > budget or len(batch) >= max_segments):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(index)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
 class LLMService:
-    def __init__(self, api_key: str, site_url: str = "", site_name: str = ""):
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
-        )
+    def __init__(self, api_key: str, site_url: str = "", site_name: str = "", model: str = None):
+        # Shared per process; constructing the service no longer opens new connections
+        self.client = get_client(api_key)
         self.site_url = site_url
         self.site_name = site_name
-        self.model = "moonshotai/kimi-dev-72b:free"
+        self.model = model or getattr(settings, 'LLM_MODEL', "moonshotai/kimi-dev-72b:free")
+        self.segments_per_request = getattr(settings, 'LLM_SEGMENTS_PER_REQUEST', 8)
+        self.input_token_budget = getattr(settings, 'LLM_INPUT_TOKEN_BUDGET', 3000)
+        self.output_token_budget = getattr(settings, 'LLM_OUTPUT_TOKEN_BUDGET', 4000)
+        self.batch_retries = getattr(settings, 'LLM_BATCH_RETRIES', 1)
+        self.max_concurrency = getattr(settings, 'LLM_CONCURRENCY', 4)
 
-    def generate_suggestions(self, text: str, matched_sources: List[Dict[str, Any]], document_id: int = None) -> List[Suggestion]:
+    def generate_suggestions(self, text: str, matched_sources: List[Dict[str, Any]], document_id: int = None, failures: List[Exception] = None) -> List[Suggestion]:
         """
-        Generate AI-powered suggestions for plagiarism removal using DeepSeek model.
-        Processes all matched content in a single request.
+        Generate AI-powered suggestions for plagiarism removal.
+        Paraphrases and citations are looked up in the shared cache first; the
+        missing segments are packed into batches that fit the token budgets, and
+        those requests run concurrently with the citation request on a bounded
+        thread pool, so latency approaches that of the slowest single call.
+        Failed batches are split and retried without repeating the others.
+        Citations that arrive after a suggestion was built are attached to it
+        before it is saved.
         
         Args:
             text: The original text to process
             matched_sources: List of matched sources with their text segments
             document_id: The ID of the document these suggestions are for
+            failures: Receives the errors of segments that were given up, which
+                otherwise go unreported once some suggestion was produced
         """
+        failures = [] if failures is None else failures
         try:
-            # Log input parameters for debugging
-            logger.info(f"Starting suggestion generation for text of length: {len(text)}")
-            logger.info(f"Number of matched sources: {len(matched_sources)}")
-            logger.debug(f"Using model: {self.model}")
-            
-            # Validate input text
-            if not text or not text.strip():
-                logger.error("Input text is empty or whitespace")
-                return []
-                
-            # Validate matched sources
-            if not matched_sources:
-                logger.error("No matched sources provided")
-                return []
-                
-            # Validate document_id
-            if not document_id:
-                logger.error("No document_id provided")
-                return []
+            # All suggestions are written together, in one INSERT and one transaction
+            suggestions = repository.save_suggestions(
+                suggestion
+                for created, group in self._iter_suggestion_groups(text, matched_sources, document_id, False, failures)
+                if created
+                for suggestion in group
+            )
+        except RateLimitError:
+            # Callers back off and retry rate limits; keep the type they check for
+            raise
+        except Exception as e:
+            logger.error(f"Error in generate_suggestions: {str(e)}", exc_info=True)
+            raise SuggestionGenerationError(f"Failed to generate suggestions: {str(e)}") from e
 
-            # Process each source's matched text
-            combined_text = ""
-            text_markers = []
-            current_position = 0
-            
-            for source in matched_sources:
-                matched_text = source.get('matchedText', [])
-                if not isinstance(matched_text, list):
-                    logger.warning(f"Invalid matchedText format for source {source.get('url')}. Converting to list.")
-                    matched_text = [matched_text] if matched_text else []
-                
-                # Process each text segment
-                for text_segment in matched_text:
-                    if not text_segment or not isinstance(text_segment, str):
-                        logger.warning(f"Skipping invalid text segment: {text_segment}")
-                        continue
-                        
-                    text_segment = text_segment.strip()
-                    if not text_segment:
-                        continue
-                        
-                    if combined_text:
-                        combined_text += "\n---\n"
-                        current_position += 4
-                    
-                    combined_text += text_segment
-                    text_markers.append({
-                        'start': current_position,
-                        'length': len(text_segment),
-                        'source': source,
-                        'original_text': text_segment
-                    })
-                    current_position += len(text_segment)
-
-            if not combined_text:
-                logger.error("No valid text segments found in matched_sources")
-                return []
+        if not suggestions:
+            logger.warning("No suggestions were created")
+            return []
+        logger.info(f"Successfully created {len(suggestions)} suggestions")
+        return suggestions
 
-            logger.info(f"Processing {len(text_markers)} text segments")
-            logger.debug(f"Combined text length: {len(combined_text)}")
+    def iter_suggestions(self, text: str, matched_sources: List[Dict[str, Any]], document_id: int = None, stream: bool = False, failures: List[Exception] = None) -> Iterator[Suggestion]:
+        """
+        Generate suggestions and yield each one as soon as it is saved.
+        Cached paraphrases are yielded first, then the others in the order their
+        batches complete. With `stream`, paraphrase completions are streamed and
+        every segment is yielded as soon as its JSON entry is complete, without
+        waiting for the rest of its batch. Suggestions do not wait for the
+        citation request: those saved before their citation arrived carry a
+        "Retrieved from" placeholder and are yielded a second time once the
+        citation has been saved on them.
+        
+        Args:
+            text: The original text to process
+            matched_sources: List of matched sources with their text segments
+            document_id: The ID of the document these suggestions are for
+            stream: Use the streaming completion API for paraphrases
+            failures: Receives the errors of segments that were given up, which
+                otherwise go unreported once some suggestion was produced
+        
+        Yields:
+            Suggestion: Each suggestion, already persisted
+        """
+        failures = [] if failures is None else failures
+        for created, group in self._iter_suggestion_groups(text, matched_sources, document_id, stream, failures):
+            if created:
+                yield from repository.save_suggestions(group)
+            else:
+                repository.update_citations(group)
+                yield from group
 
-            # Generate paraphrased version
-            prompt = f"""
-            Please rewrite each text segment below in a completely original way while maintaining the same meaning.
-            Make it sound natural and academic. Ensure it is significantly different from the original to avoid plagiarism.
-            
-            IMPORTANT: You must separate each rewritten segment with a line containing only "---".
-            Do not add any additional text, numbering, or labels.
-            Just provide the rewritten segments separated by "---" lines.
-            
-            Original text segments:
-            {combined_text}
-            
-            Rewritten text (remember to separate segments with "---"):
-            """
+    def _iter_suggestion_groups(self, text: str, matched_sources: List[Dict[str, Any]], document_id: int, stream: bool, failures: List[Exception]) -> Iterator[List[Suggestion]]:
+        """
+        Generate suggestions, one group per paraphrased segment text.
+        Segments repeated in the matched sources share a paraphrase and a group.
 
-            try:
-                paraphrase_completion = self.client.chat.completions.create(
-                    extra_headers={
-                        "HTTP-Referer": self.site_url,
-                        "X-Title": self.site_name,
-                    },
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "You are an expert academic writer helping to paraphrase text to avoid plagiarism while maintaining academic quality."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,  # Add some creativity but maintain coherence
-                    max_tokens=4000  # Ensure enough tokens for response
-                )
-                
-                if not paraphrase_completion or not paraphrase_completion.choices:
-                    logger.error("No completion received from OpenAI API")
-                    return []
-                
-                paraphrased_content = paraphrase_completion.choices[0].message.content.strip()
-                if not paraphrased_content:
-                    logger.error("Received empty response from LLM for paraphrasing")
-                    return []
-                    
-                logger.debug(f"Raw LLM response length: {len(paraphrased_content)}")
-                
-            except Exception as e:
-                logger.error(f"OpenAI API call failed: {str(e)}")
-                raise Exception(f"OpenAI API call failed: {str(e)}")
-            
-            # Process the response with multiple separator attempts
-            separators = ["\n---\n", "\n\n---\n\n", "---", "\n\n"]
-            paraphrased_segments = None
+        Yields:
+            tuple: (True, unsaved suggestions) for new groups, and (False,
+                suggestions yielded earlier) once citations that arrived late
+                have been set on them
+        """
+        # Log input parameters for debugging
+        logger.info(f"Starting suggestion generation for text of length: {len(text)}")
+        logger.info(f"Number of matched sources: {len(matched_sources)}")
+        logger.debug(f"Using model: {self.model}")
+        
+        # Validate input text
+        if not text or not text.strip():
+            logger.error("Input text is empty or whitespace")
+            return
             
-            for separator in separators:
-                segments = paraphrased_content.split(separator)
-                segments = [seg.strip() for seg in segments if seg.strip()]  # Clean segments
-                
-                if len(segments) >= len(text_markers):
-                    logger.debug(f"Found valid separator: {separator}")
-                    paraphrased_segments = segments[:len(text_markers)]  # Trim to expected length
-                    break
+        # Validate matched sources
+        if not matched_sources:
+            logger.error("No matched sources provided")
+            return
             
-            if not paraphrased_segments:
-                logger.error(f"Could not find valid separator pattern in LLM response")
-                return []
-            
-            logger.info(f"Successfully processed {len(paraphrased_segments)} segments")
+        # Validate document_id
+        if not document_id:
+            logger.error("No document_id provided")
+            return
 
-            # Generate citations
-            unique_sources = {}
-            for marker in text_markers:
-                source_url = marker['source'].get('url', '')
-                if source_url and source_url not in unique_sources:
-                    unique_sources[source_url] = marker['source']
+        text_markers = self._collect_segments(matched_sources)
+        if not text_markers:
+            logger.error("No valid text segments found in matched_sources")
+            return
 
-            if not unique_sources:
-                logger.warning("No valid sources found for citation generation")
-                return []
+        logger.info(f"Processing {len(text_markers)} text segments")
 
-            citation_prompt = "Generate APA citations for the following sources:\n\n"
-            source_urls = []
-            for source in unique_sources.values():
-                source_urls.append(source.get('url', ''))
-                citation_prompt += f"""
-                Title: {source.get('title', '')}
-                URL: {source.get('url', '')}
-                Date: {datetime.utcnow().strftime('%Y-%m-%d')}
-                ---
-                """
-            
+        # Sources to cite; the citation prompt does not depend on the paraphrases
+        unique_sources = {}
+        for marker in text_markers:
+            source_url = marker['source'].get('url', '')
+            if source_url and source_url not in unique_sources:
+                unique_sources[source_url] = marker['source']
+
+        if not unique_sources:
+            logger.warning("No valid sources found for citation generation")
+            return
+
+        # Only cache misses are sent to the model
+        keys = [paraphrase_key(marker['original_text'], self.model, PROMPT_VERSION) for marker in text_markers]
+        markers_by_key = {}
+        for marker, key in zip(text_markers, keys):
+            markers_by_key.setdefault(key, []).append(marker)
+        cached_paraphrases = llm_cache.lookup_paraphrases(keys)
+        citation_map = llm_cache.lookup_citations(unique_sources)
+        missing_sources = {url: source for url, source in unique_sources.items() if url not in citation_map}
+        # One request per missing segment text; repeated segments share its paraphrase
+        pending_keys = [key for key in markers_by_key if key not in cached_paraphrases]
+        pending = [markers_by_key[key][0]['original_text'] for key in pending_keys]
+        logger.info(f"Cache hits: {len(cached_paraphrases)} of {len(markers_by_key)} segments, "
+                    f"{len(citation_map)} of {len(unique_sources)} citations")
+
+        batches = pack_segments(
+            range(len(pending)), pending, self.input_token_budget, self.output_token_budget, self.segments_per_request
+        )
+        executor = ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches) + 1))
+        citation_future = executor.submit(self._generate_citations, missing_sources) if missing_sources else None
+        fresh_paraphrases = {}
+        uncited = []  # Suggestions built before their source's citation arrived
+        created = 0
+
+        def late_citations(wait):
+            """Attach the citation response, once received, to the suggestions built without it."""
+            nonlocal citation_future
+            if citation_future is None or not (wait or citation_future.done()):
+                return []
             try:
-                citation_completion = self.client.chat.completions.create(
-                    extra_headers={
-                        "HTTP-Referer": self.site_url,
-                        "X-Title": self.site_name,
-                    },
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "You are an expert in academic citations. Generate APA format citations."},
-                        {"role": "user", "content": citation_prompt}
-                    ]
-                )
-                
-                citation_content = citation_completion.choices[0].message.content.strip()
-                if not citation_content:
-                    logger.error("Received empty response from LLM for citations")
-                    return []
-                    
+                new_citations = citation_future.result()
             except Exception as e:
-                logger.error(f"OpenAI API call failed during citation generation: {str(e)}")
-                raise Exception(f"OpenAI API call failed during citation generation: {str(e)}")
-            
-            citations = [cit.strip() for cit in citation_content.split("\n---\n") if cit.strip()]
-            logger.debug(f"Received {len(citations)} citations")
-            
-            # Create citation mapping
-            citation_map = {}
-            for i, url in enumerate(source_urls):
-                if i < len(citations):
-                    citation_map[url] = citations[i]
-                else:
-                    citation_map[url] = f"Retrieved from {url}"  # Fallback citation
+                # Suggestions keep their "Retrieved from" placeholder
+                logger.warning(f"Citation generation failed: {str(e)}")
+                new_citations = {}
+            citation_future = None
+            llm_cache.store_citations(new_citations)
+            citation_map.update(new_citations)
+            cited = [suggestion for suggestion in uncited if suggestion.source_url in new_citations]
+            for suggestion in cited:
+                suggestion.citation_text = new_citations[suggestion.source_url]
+            uncited.clear()
+            return cited
+
+        try:
+            fresh = (
+                (pending_keys[index], paraphrased)
+                for index, paraphrased in self._iter_paraphrases(executor, batches, pending, failures, stream)
+            )
+            for key, paraphrased in itertools.chain(cached_paraphrases.items(), fresh):
+                if key not in cached_paraphrases:
+                    fresh_paraphrases[key] = paraphrased
+                cited = late_citations(wait=False)
+                if cited:
+                    yield False, cited
+                group = [
+                    self._build_suggestion(marker, paraphrased, citation_map, document_id)
+                    for marker in markers_by_key[key]
+                ]
+                if citation_future is not None:
+                    uncited.extend(suggestion for suggestion in group if suggestion.source_url in missing_sources)
+                created += len(group)
+                yield True, group
+
+            if failures and not created:
+                raise failures[0]
+            cited = late_citations(wait=True)
+            if cited:
+                yield False, cited
+            logger.info(f"Successfully processed {len(cached_paraphrases) + len(fresh_paraphrases)} segments")
+        finally:
+            # Kept even if the request fails or the client goes away, so a retry does not pay for them again
+            llm_cache.store_paraphrases(self.model, fresh_paraphrases)
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _build_suggestion(self, marker: Dict[str, Any], paraphrased: str, citation_map: Dict[str, str], document_id: int) -> Suggestion:
+        """Build the unsaved suggestion for one segment."""
+        source_url = marker['source'].get('url', '')
+        return repository.build_suggestion(
+            document_id=document_id,
+            original_text=marker['original_text'],
+            paraphrased_text=paraphrased,
+            citation_text=citation_map.get(source_url, f"Retrieved from {source_url}"),
+            source_url=source_url,
+            source_title=marker['source'].get('title', ''),
+        )
+
+    def _collect_segments(self, matched_sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Flatten the matched text of every source into a list of segment markers.
+        """
+        text_markers = []
+        for source in matched_sources:
+            matched_text = source.get('matchedText', [])
+            if not isinstance(matched_text, list):
+                logger.warning(f"Invalid matchedText format for source {source.get('url')}. Converting to list.")
+                matched_text = [matched_text] if matched_text else []
             
-            # Create suggestions
-            suggestions = []
-            for i, marker in enumerate(text_markers):
-                if i >= len(paraphrased_segments):
-                    break
+            # Process each text segment
+            for text_segment in matched_text:
+                if not text_segment or not isinstance(text_segment, str):
+                    logger.warning(f"Skipping invalid text segment: {text_segment}")
+                    continue
                     
-                try:
-                    source_url = marker['source'].get('url', '')
-                    suggestion = Suggestion.objects.create(
-                        original_text=marker['original_text'],
-                        paraphrased_text=paraphrased_segments[i],
-                        citation_text=citation_map.get(source_url, f"Retrieved from {source_url}"),
-                        source_url=source_url,
-                        source_title=marker['source'].get('title', ''),
-                        document_id=document_id
-                    )
-                    suggestions.append(suggestion)
-                except Exception as e:
-                    logger.error(f"Error creating suggestion {i}: {str(e)}")
+                text_segment = text_segment.strip()
+                if not text_segment:
                     continue
-            
-            if not suggestions:
-                logger.warning("No suggestions were created despite having valid responses")
-                return []
-                
-            logger.info(f"Successfully created {len(suggestions)} suggestions")
-            return suggestions
-            
-        except Exception as e:
-            logger.error(f"Error in generate_suggestions: {str(e)}", exc_info=True)
-            raise Exception(f"Failed to generate suggestions: {str(e)}")
+                    
+                text_markers.append({
+                    'source': source,
+                    'original_text': text_segment
+                })
+        return text_markers
 
-    def _batch_generate(self, batch_data: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+    def _iter_paraphrases(self, executor, batches: List[List[int]], texts: List[str], failures: List[Exception], stream: bool = False) -> Iterator[Tuple[int, str]]:
         """
-        Generate paraphrases and citations for multiple texts in a single request.
+        Paraphrase batches of segments concurrently, retrying only the segments that fail.
+
+        Paraphrases are yielded as soon as they are received. An unparseable
+        batch is split in half and both halves are resubmitted, so one bad
+        response costs only its own segments. Segments whose ids are missing
+        from an otherwise valid response are resubmitted one by one. A single
+        segment is retried up to `batch_retries` times. Any other error (rate
+        limits, transport and API errors) is not a problem with the batch's
+        content: the API client has already retried it with backoff
+        (LLM_MAX_RETRIES), so the batch's segments are given up on at once
+        and the error is reported in `failures`. Parse failures and missing
+        ids are counted in the output metrics.
+
+        Args:
+            executor: Executor to run the completions on
+            batches: Lists of segment indexes, as packed by pack_segments
+            texts: Segment texts, indexed by the batches
+            failures: Receives the errors of segments that were given up
+            stream: Stream completions and yield every segment as its entry completes
+
+        Yields:
+            tuple: (segment index, paraphrase)
         """
-        # Prepare the batch prompt
-        batch_prompt = {
-            "texts": [],
-            "sources": []
-        }
-        
-        for data in batch_data:
-            batch_prompt["texts"].append(data['text'])
-            batch_prompt["sources"].append({
-                "title": data['source'].get('title', ''),
-                "url": data['source'].get('url', ''),
-                "date": datetime.utcnow().strftime('%Y-%m-%d')
-            })
-        
-        prompt = f"""
-        Process the following batch of texts and sources to generate paraphrases and citations.
-        Each paraphrase should be completely original while maintaining the same meaning.
-        Each citation should be in APA format.
+        events = queue.Queue()
+
+        def run(batch, attempt):
+            received = set()
+
+            def emit(position, paraphrased):
+                if position not in received:
+                    received.add(position)
+                    events.put(('segment', batch[position], paraphrased))
+
+            error = None
+            try:
+                result = self._paraphrase_segments([texts[index] for index in batch], on_segment=emit if stream else None)
+                for position, paraphrased in result.items():
+                    emit(position, paraphrased)
+            except Exception as e:
+                error = e
+            events.put(('done', batch, attempt, received, error))
+
+        in_flight = 0
+
+        def submit(batch, attempt):
+            nonlocal in_flight
+            in_flight += 1
+            executor.submit(run, batch, attempt)
+
+        for batch in batches:
+            submit(batch, 0)
+
+        counts = {'responses': 0, 'invalid_responses': 0, 'missing_segments': 0}
+        try:
+            while in_flight:
+                event = events.get()
+                if event[0] == 'segment':
+                    yield event[1], event[2]
+                    continue
+
+                _, batch, attempt, received, error = event
+                in_flight -= 1
+                if error is None or isinstance(error, StructuredOutputError):
+                    counts['responses'] += 1
+                if isinstance(error, StructuredOutputError):
+                    counts['invalid_responses'] += 1
+                remaining = [index for position, index in enumerate(batch) if position not in received]
+                if not remaining:
+                    continue
+                if error is not None and not isinstance(error, StructuredOutputError):
+                    # Splitting would only repeat a call that fails for reasons unrelated to its segments
+                    logger.warning(f"Paraphrase batch of {len(batch)} segments failed, giving up {len(remaining)}: {str(error)}")
+                    failures.append(error)
+                    continue
+                if error is None:
+                    logger.warning(f"Paraphrase response is missing {len(remaining)} of {len(batch)} segments")
+                    counts['missing_segments'] += len(remaining)
+
+                retry_attempt = attempt if len(batch) > 1 else attempt + 1
+                if retry_attempt > self.batch_retries:
+                    # Give up on this segment; it gets no suggestion
+                    failures.append(error or StructuredOutputError("Segment missing from response"))
+                elif error is not None and len(remaining) > 1:
+                    logger.warning(f"Paraphrase batch of {len(batch)} segments was unparseable, retrying {len(remaining)} in halves: {str(error)}")
+                    middle = len(remaining) // 2
+                    submit(remaining[:middle], retry_attempt)
+                    submit(remaining[middle:], retry_attempt)
+                else:
+                    for index in remaining:
+                        submit([index], retry_attempt)
+        finally:
+            llm_metrics.record(**counts)
+
+    def _paraphrase_segments(self, segments: List[str], on_segment: Callable[[int, str], None] = None) -> Dict[int, str]:
+        """
+        Paraphrase a group of segments in one completion with id-keyed JSON output.
         
-        Input batch:
-        {json.dumps(batch_prompt, indent=2)}
+        Args:
+            segments: Segment texts; their positions are the ids sent to the model
+            on_segment: If given, the completion is streamed and this is called
+                with (position, paraphrase) as soon as each entry is complete
         
-        Please respond with a JSON object in this exact format:
-        {{
-            "paraphrases": ["paraphrase1", "paraphrase2", ...],
-            "citations": ["citation1", "citation2", ...]
-        }}
+        Returns:
+            Mapping of segment position to paraphrase; positions the model left out are missing
         
-        Make sure to maintain the same order as the input texts.
+        Raises:
+            StructuredOutputError: If the response is not valid JSON of the expected shape
         """
-        
-        completion = self.client.chat.completions.create(
-            extra_headers={
-                "HTTP-Referer": self.site_url,
-                "X-Title": self.site_name,
-            },
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an expert academic writer helping to paraphrase texts and generate citations. Always respond in the exact JSON format requested."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        try:
-            response = json.loads(completion.choices[0].message.content.strip())
-            return response["paraphrases"], response["citations"]
-        except (json.JSONDecodeError, KeyError) as e:
-            # Fallback to individual processing if batch processing fails
-            paraphrases = []
-            citations = []
+        payload = json.dumps({"segments": [{"id": i, "text": segment} for i, segment in enumerate(segments)]}, ensure_ascii=False)
+        prompt = f"""
+            Please rewrite each text segment below in a completely original way while maintaining the same meaning.
+            Make it sound natural and academic. Ensure it is significantly different from the original to avoid plagiarism.
             
-            for data in batch_data:
-                paraphrases.append(self._generate_paraphrase(data['text']))
-                citations.append(self._generate_citation(data['source']))
+            The segments are given as JSON. Respond with a JSON object only, in this exact format:
+            {{"segments": [{{"id": <id of the original segment>, "text": "<rewritten segment>"}}, ...]}}
+            Rewrite every segment and keep its id. Do not add any other text.
             
-            return paraphrases, citations
+            Original text segments:
+            {payload}
+            """
 
-    def _generate_paraphrase(self, text: str) -> str:
-        """
-        Fallback method for individual paraphrase generation.
-        """
-        prompt = f"""
-        Please rewrite the following text in a completely original way while maintaining the same meaning.
-        Make it sound natural and academic. Ensure it is significantly different from the original to avoid plagiarism.
-        
-        Original text:
-        {text}
+        try:
+            paraphrase_completion = self.client.chat.completions.create(
+                extra_headers={
+                    "HTTP-Referer": self.site_url,
+                    "X-Title": self.site_name,
+                },
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are an expert academic writer helping to paraphrase text to avoid plagiarism while maintaining academic quality. Always respond in the exact JSON format requested."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.7,  # Add some creativity but maintain coherence
+                max_tokens=self.output_token_budget,  # Batches are packed to fit this budget
+                stream=on_segment is not None
+            )
+            if on_segment is not None:
+                paraphrased_content = self._read_streamed_segments(paraphrase_completion, len(segments), on_segment)
+            elif not paraphrase_completion or not paraphrase_completion.choices:
+                raise StructuredOutputError("No completion received from OpenAI API")
+            else:
+                paraphrased_content = paraphrase_completion.choices[0].message.content or ""
+        except StructuredOutputError:
+            raise
+        except Exception as e:
+            # Re-raised as is, so rate limits stay recognizable as RateLimitError
+            logger.error(f"OpenAI API call failed: {str(e)}")
+            raise
         
-        Rewritten text:
+        logger.debug(f"Raw LLM response length: {len(paraphrased_content)}")
+        return parse_segment_results(paraphrased_content, range(len(segments)))
+
+    def _read_streamed_segments(self, completion, count: int, on_segment: Callable[[int, str], None]) -> str:
         """
+        Consume a streamed completion, reporting each segment entry as soon as it is complete.
         
-        completion = self.client.chat.completions.create(
-            extra_headers={
-                "HTTP-Referer": self.site_url,
-                "X-Title": self.site_name,
-            },
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an expert academic writer helping to paraphrase text to avoid plagiarism while maintaining academic quality."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        return completion.choices[0].message.content.strip()
+        Returns:
+            The full completion content, for final validation
+        """
+        pieces = []
+
+        def chunks():
+            for chunk in completion:
+                if chunk.choices:
+                    piece = chunk.choices[0].delta.content or ""
+                    pieces.append(piece)
+                    yield piece
 
-    def _generate_citation(self, source: Dict[str, Any]) -> str:
+        for entry in iter_json_array_items(chunks(), 'segments'):
+            item = segment_entry(entry, range(count))
+            if item is not None:
+                on_segment(*item)
+        return "".join(pieces)
+
+    def _generate_citations(self, unique_sources: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
         """
-        Fallback method for individual citation generation.
+        Generate APA citations for the given sources in one completion with id-keyed JSON output.
+
+        Every citation is matched to its source by the id it was sent with,
+        so a citation left out or reordered by the model can never be cached
+        under another source's URL.
+
+        Returns:
+            Mapping of source URL to citation, for the sources the model cited
         """
-        prompt = f"""
-        Generate a proper academic citation (APA format) for the following source:
-        
-        Title: {source.get('title', '')}
-        URL: {source.get('url', '')}
-        Date: {datetime.utcnow().strftime('%Y-%m-%d')}
+        source_urls = list(unique_sources)
+        payload = json.dumps({"sources": [
+            {"id": i, "title": source.get('title', ''), "url": url}
+            for i, (url, source) in enumerate(unique_sources.items())
+        ]}, ensure_ascii=False)
+        citation_prompt = f"""Generate APA citations for the sources below, accessed on {datetime.utcnow().strftime('%Y-%m-%d')}.
+            
+            The sources are given as JSON. Respond with a JSON object only, in this exact format:
+            {{"citations": [{{"id": <id of the source>, "text": "<APA citation>"}}, ...]}}
+            Cite every source and keep its id. Do not add any other text.
+            
+            Sources:
+            {payload}
+            """
         
-        Citation:
-        """
+        try:
+            citation_completion = self.client.chat.completions.create(
+                extra_headers={
+                    "HTTP-Referer": self.site_url,
+                    "X-Title": self.site_name,
+                },
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are an expert in academic citations. Generate APA format citations. Always respond in the exact JSON format requested."},
+                    {"role": "user", "content": citation_prompt}
+                ],
+                response_format={"type": "json_object"},
+            )
+            citation_content = (citation_completion.choices[0].message.content or "").strip()
+        except Exception as e:
+            logger.error(f"OpenAI API call failed during citation generation: {str(e)}")
+            raise
         
-        completion = self.client.chat.completions.create(
-            extra_headers={
-                "HTTP-Referer": self.site_url,
-                "X-Title": self.site_name,
-            },
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are an expert in academic citations. Generate an APA format citation."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        try:
+            citations = parse_segment_results(citation_content, range(len(source_urls)), key='citations')
+        except StructuredOutputError as e:
+            logger.error(f"Unusable citation response: {str(e)}")
+            citations = {}
+        logger.debug(f"Received {len(citations)} of {len(source_urls)} citations")
         
-        return completion.choices[0].message.content.strip() 
\ No newline at end of file
+        # Uncited sources get a "Retrieved from" fallback when suggestions are created, and are not cached
+        return {source_urls[i]: citation for i, citation in citations.items()}
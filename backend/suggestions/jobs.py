@@ -0,0 +1,226 @@
+"""
+Background suggestion generation.
+
+A generate request can be queued as a SuggestionJob and run on a worker pool
+instead of inside the HTTP request. Runs that hit the provider's rate limit
+are retried after an exponential backoff with jitter, so a burst of 429s
+spreads the retries out instead of failing every request. Jobs that keep
+hitting it, and jobs that fail for any other reason, which a retry would
+not fix, go to the SuggestionDeadLetter table. At most LLM_MODEL_CONCURRENCY
+jobs per model run at once across all workers.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from openai import RateLimitError
+
+from authentication import audit
+from document_processor.jobs import WorkerPool, claim_next, heartbeat, requeue_stale
+from services.llm_service import LLMService
+
+from .models import SuggestionDeadLetter, SuggestionJob
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limited(error):
+    """Tell whether an LLM error was caused by the provider's rate limit."""
+    return isinstance(error, RateLimitError) or getattr(error, 'status_code', None) == 429
+
+
+def backoff_delay(attempts):
+    """
+    Seconds to wait before retrying a job that failed `attempts` times.
+
+    The delay doubles per attempt up to SUGGESTION_BACKOFF_MAX; half of it is
+    random, so jobs that failed together do not retry together.
+    """
+    delay = min(settings.SUGGESTION_BACKOFF_MAX, settings.SUGGESTION_BACKOFF_BASE * 2 ** max(attempts - 1, 0))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def enqueue_suggestions(document, user, text, matched_sources, model=None):
+    """
+    Queue suggestion generation for a document.
+
+    Returns:
+        SuggestionJob: The queued job
+    """
+    with transaction.atomic():
+        job = SuggestionJob.objects.create(
+            document=document,
+            requested_by=user,
+            model=model or settings.LLM_MODEL,
+            payload={'text': text, 'matched_sources': matched_sources},
+        )
+        transaction.on_commit(wake_workers)
+    return job
+
+
+def dead_letter(job, error):
+    """Fail a job permanently and record it in the dead-letter table."""
+    job.status = SuggestionJob.STATUS_FAILED
+    job.error = error
+    job.finished_at = timezone.now()
+    with transaction.atomic():
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        SuggestionDeadLetter.objects.update_or_create(job=job, defaults={'error': error, 'attempts': job.attempts})
+    logger.error(f"Suggestion job {job.id} moved to the dead-letter table after {job.attempts} attempts: {error}")
+    audit.record('error', 'suggestion-service', f'Suggestion job {job.id} failed after {job.attempts} attempts',
+                 job.requested_by, documentId=job.document_id, jobId=job.id, error=error)
+
+
+def undelivered_sources(matched_sources, delivered):
+    """Drop the segments whose suggestions were already delivered, and sources left without segments."""
+    remaining = []
+    for source in matched_sources:
+        segments = source.get('matchedText') or []
+        if not isinstance(segments, list):
+            segments = [segments]
+        segments = [segment for segment in segments if isinstance(segment, str) and segment.strip() not in delivered]
+        if segments:
+            remaining.append({**source, 'matchedText': segments})
+    return remaining
+
+
+def reschedule(job, error):
+    """Retry a rate-limited job after a backoff; dead-letter it on any other error or once out of attempts."""
+    if not is_rate_limited(error) or job.attempts >= settings.SUGGESTION_MAX_ATTEMPTS:
+        dead_letter(job, str(error))
+        return job
+    delay = backoff_delay(job.attempts)
+    logger.info(f"Suggestion job {job.id} attempt {job.attempts} was rate limited, retrying in {delay:.0f}s: {error}")
+    job.status = SuggestionJob.STATUS_QUEUED
+    job.error = str(error)
+    job.worker = ''
+    job.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+    job.save(update_fields=['status', 'error', 'worker', 'next_attempt_at'])
+    return job
+
+
+def run_job(job):
+    """
+    Generate the suggestions of a claimed job, rescheduling it with backoff if it was rate limited.
+
+    When only some segments were rate limited, the suggestions of the others
+    are kept on the job and only the undelivered segments are retried.
+    """
+    llm_service = LLMService(
+        api_key=settings.OPENROUTER_API_KEY,
+        site_url=settings.SITE_URL,
+        site_name=settings.SITE_NAME,
+        model=job.model,
+    )
+    failures = []
+    try:
+        suggestions = llm_service.generate_suggestions(
+            job.payload['text'], job.payload['matched_sources'], job.document_id, failures=failures
+        )
+    except Exception as e:
+        return reschedule(job, e)
+
+    job.suggestion_ids = job.suggestion_ids + [suggestion.id for suggestion in suggestions]
+    rate_limit = next((failure for failure in failures if is_rate_limited(failure)), None)
+    if rate_limit is not None:
+        delivered = {suggestion.original_text for suggestion in suggestions}
+        job.payload = {**job.payload, 'matched_sources': undelivered_sources(job.payload['matched_sources'], delivered)}
+        job.save(update_fields=['suggestion_ids', 'payload'])
+        return reschedule(job, rate_limit)
+
+    job.status = SuggestionJob.STATUS_DONE
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'suggestion_ids', 'error', 'finished_at'])
+    return job
+
+
+def saturated_models():
+    """Models that already run LLM_MODEL_CONCURRENCY jobs."""
+    return [
+        row['model'] for row in
+        SuggestionJob.objects.filter(status=SuggestionJob.STATUS_RUNNING)
+        .values('model').annotate(running=Count('id')).filter(running__gte=settings.LLM_MODEL_CONCURRENCY)
+    ]
+
+
+def process_next_job():
+    """
+    Claim and run the oldest due suggestion job whose model has a free slot.
+
+    Returns:
+        bool: True if a job was processed, False if none was due
+    """
+    requeue_stale(SuggestionJob, settings.SUGGESTION_JOB_TIMEOUT)
+    job = claim_next(
+        SuggestionJob.objects
+        .filter(status=SuggestionJob.STATUS_QUEUED, next_attempt_at__lte=timezone.now())
+        .exclude(model__in=saturated_models())
+    )
+    if job is None:
+        return False
+
+    running = SuggestionJob.objects.filter(status=SuggestionJob.STATUS_RUNNING, model=job.model).count()
+    if running > settings.LLM_MODEL_CONCURRENCY:
+        # Another worker took the model's last slot at the same time; give the job back
+        SuggestionJob.objects.filter(id=job.id).update(
+            status=SuggestionJob.STATUS_QUEUED, attempts=F('attempts') - 1, worker=''
+        )
+        return False
+
+    if job.attempts > settings.SUGGESTION_MAX_ATTEMPTS:
+        # The job was requeued after its worker died too many times
+        dead_letter(job, job.error or 'Generation did not finish after repeated attempts')
+        return True
+
+    with heartbeat(job, settings.SUGGESTION_JOB_TIMEOUT):
+        run_job(job)
+    return True
+
+
+def requeue_dead_letters():
+    """
+    Put every dead-lettered job back on the queue with a fresh attempt budget.
+
+    Returns:
+        int: Number of jobs requeued
+    """
+    job_ids = list(SuggestionDeadLetter.objects.values_list('job_id', flat=True))
+    with transaction.atomic():
+        SuggestionJob.objects.filter(id__in=job_ids).update(
+            status=SuggestionJob.STATUS_QUEUED, attempts=0, worker='', next_attempt_at=timezone.now(), finished_at=None
+        )
+        SuggestionDeadLetter.objects.filter(job_id__in=job_ids).delete()
+    if job_ids:
+        transaction.on_commit(wake_workers)
+    return len(job_ids)
+
+
+suggestion_pool = WorkerPool(
+    'suggestions',
+    process_next_job,
+    workers=settings.SUGGESTION_WORKERS,
+    poll_interval=settings.SUGGESTION_POLL_INTERVAL,
+)
+
+
+def start_workers():
+    """
+    Start the in-process worker pool, unless generation runs in a separate worker.
+
+    Called once the web process has loaded the app, so queued jobs, and jobs
+    left running by a process that died, are picked up without waiting for
+    the next request to enqueue one.
+    """
+    if settings.SUGGESTION_WORKERS > 0:
+        suggestion_pool.start()
+
+
+def wake_workers():
+    """Wake the in-process worker pool, unless generation runs in a separate worker."""
+    if settings.SUGGESTION_WORKERS > 0:
+        suggestion_pool.wake()
@@ -0,0 +1,60 @@
+"""
+Database cache of LLM output shared by every document.
+
+Paraphrases are keyed by a hash of the segment text, the model and the
+prompt version, so changing either invalidates them; citations are keyed by
+source URL. Lookups fetch all keys of a request in one query, so only the
+misses are sent to the model.
+"""
+import hashlib
+
+from django.db.models import F
+
+from .models import CitationCache, ParaphraseCache
+
+
+def paraphrase_key(text, model, prompt_version):
+    """Hash a segment together with the model and prompt version that paraphrase it."""
+    return hashlib.sha256(f'{model}\0{prompt_version}\0{text}'.encode('utf-8')).hexdigest()
+
+
+def lookup_paraphrases(keys):
+    """
+    Fetch the cached paraphrases of several keys and count the hits.
+
+    Returns:
+        dict: key -> paraphrased text, for the keys found
+    """
+    found = dict(ParaphraseCache.objects.filter(key__in=set(keys)).values_list('key', 'paraphrased_text'))
+    if found:
+        ParaphraseCache.objects.filter(key__in=found).update(hits=F('hits') + 1)
+    return found
+
+
+def store_paraphrases(model, paraphrases):
+    """Cache key -> paraphrased text pairs; keys cached concurrently by another request are kept."""
+    ParaphraseCache.objects.bulk_create(
+        [ParaphraseCache(key=key, model=model, paraphrased_text=text) for key, text in paraphrases.items()],
+        ignore_conflicts=True,
+    )
+
+
+def lookup_citations(urls):
+    """
+    Fetch the cached citations of several source URLs and count the hits.
+
+    Returns:
+        dict: source URL -> citation, for the URLs found
+    """
+    found = dict(CitationCache.objects.filter(source_url__in=set(urls)).values_list('source_url', 'citation_text'))
+    if found:
+        CitationCache.objects.filter(source_url__in=found).update(hits=F('hits') + 1)
+    return found
+
+
+def store_citations(citations):
+    """Cache source URL -> citation pairs."""
+    CitationCache.objects.bulk_create(
+        [CitationCache(source_url=url, citation_text=text) for url, text in citations.items()],
+        ignore_conflicts=True,
+    )
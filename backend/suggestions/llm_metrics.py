@@ -0,0 +1,33 @@
+"""
+Counters of structured LLM output quality.
+
+Every paraphrase response is counted, together with the responses that
+were not valid JSON and the segment ids a valid response left out, so the
+parse failure rate of a model or prompt version can be watched over time.
+"""
+from django.db.models import F
+
+from .models import LLMOutputStats
+
+
+def record(**increments):
+    """Add to the output counters, e.g. record(responses=3, invalid_responses=1)."""
+    increments = {name: value for name, value in increments.items() if value}
+    if not increments:
+        return
+    stats, _ = LLMOutputStats.objects.get_or_create(id=1)
+    LLMOutputStats.objects.filter(id=stats.id).update(
+        **{name: F(name) + value for name, value in increments.items()}
+    )
+
+
+def stats():
+    """Return the output counters together with the parse failure rate."""
+    counters = LLMOutputStats.objects.filter(id=1).values('responses', 'invalid_responses', 'missing_segments').first() or {
+        'responses': 0, 'invalid_responses': 0, 'missing_segments': 0,
+    }
+    responses = counters['responses']
+    return {
+        **counters,
+        'failure_rate': round(counters['invalid_responses'] / responses * 100, 1) if responses else 0.0,
+    }
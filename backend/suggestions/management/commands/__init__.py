@@ -0,0 +1,3 @@
+"""
+Management commands for suggestions app.
+""" 
\ No newline at end of file
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from suggestions import llm_metrics
+from suggestions.models import CitationCache, LLMOutputStats, ParaphraseCache
+
+class Command(BaseCommand):
+    help = 'Shows LLM cache sizes and structured output parse failure counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Reset the parse failure counters')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            LLMOutputStats.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS('Reset the output counters'))
+            return
+
+        stats = llm_metrics.stats()
+        self.stdout.write(
+            f"{ParaphraseCache.objects.count()} cached paraphrases, {CitationCache.objects.count()} cached citations; "
+            f"{stats['responses']} responses, {stats['invalid_responses']} invalid ({stats['failure_rate']}%), "
+            f"{stats['missing_segments']} missing segments"
+        )
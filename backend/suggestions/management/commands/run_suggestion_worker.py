@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from document_processor.jobs import WorkerPool
+from suggestions.jobs import process_next_job, requeue_dead_letters
+
+class Command(BaseCommand):
+    help = 'Runs a pool of workers that generate queued suggestion jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Number of worker threads')
+        parser.add_argument('--once', action='store_true',
+                            help='Process due jobs in this thread until none is left, then exit')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Put dead-lettered jobs back on the queue first')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            self.stdout.write(f'Requeued {requeue_dead_letters()} dead-lettered jobs')
+
+        if options['once']:
+            processed = 0
+            while process_next_job():
+                processed += 1
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} suggestion jobs'))
+            return
+
+        pool = WorkerPool('suggestions', process_next_job, workers=options['workers'],
+                          poll_interval=settings.SUGGESTION_POLL_INTERVAL)
+        pool.start()
+        self.stdout.write(self.style.SUCCESS(f"Started {options['workers']} suggestion workers"))
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping suggestion workers...')
+            pool.stop(timeout=settings.SUGGESTION_JOB_TIMEOUT)
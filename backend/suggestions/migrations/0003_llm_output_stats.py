@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suggestions', '0002_llm_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMOutputStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('responses', models.PositiveBigIntegerField(default=0)),
+                ('invalid_responses', models.PositiveBigIntegerField(default=0)),
+                ('missing_segments', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
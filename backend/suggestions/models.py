@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
@@ -16,3 +17,84 @@ class Suggestion(models.Model):
 
     def __str__(self):
         return f"Suggestion for {self.document.title if self.document else 'Unknown Document'}"
+
+
+class ParaphraseCache(models.Model):
+    """Paraphrase of a matched segment, reused across documents with the same segment."""
+    key = models.CharField(max_length=64, unique=True)  # sha256 of model, prompt version and segment text
+    model = models.CharField(max_length=128)
+    paraphrased_text = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Paraphrase {self.key[:12]} ({self.model})"
+
+
+class CitationCache(models.Model):
+    """APA citation generated for a source URL."""
+    source_url = models.URLField(max_length=512, unique=True)
+    citation_text = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Citation for {self.source_url}"
+
+
+class LLMOutputStats(models.Model):
+    """Single-row counters of structured paraphrase responses that could not be fully used."""
+    responses = models.PositiveBigIntegerField(default=0)
+    invalid_responses = models.PositiveBigIntegerField(default=0)  # Not parseable as the requested JSON
+    missing_segments = models.PositiveBigIntegerField(default=0)  # Ids left out of a valid response
+
+    def __str__(self):
+        return f"{self.invalid_responses} invalid of {self.responses} responses"
+
+
+class SuggestionJob(models.Model):
+    """Database-backed queue entry for generating the suggestions of a document."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUSES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    document = models.ForeignKey('document_processor.Document', on_delete=models.CASCADE, related_name='suggestion_jobs')
+    requested_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='suggestion_jobs')
+    model = models.CharField(max_length=128)  # LLM model; running jobs per model are capped
+    payload = models.JSONField()  # text and matched_sources of the generate request
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # Pushed back after rate limits and errors
+    suggestion_ids = models.JSONField(default=list)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Lease renewed by the running worker
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='suggestionjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Suggestions for {self.document_id} ({self.status})"
+
+
+class SuggestionDeadLetter(models.Model):
+    """A suggestion job that failed permanently, kept for inspection and manual requeueing."""
+    job = models.OneToOneField(SuggestionJob, on_delete=models.CASCADE, related_name='dead_letter')
+    error = models.TextField()
+    attempts = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Dead suggestion job {self.job_id}"
@@ -0,0 +1,55 @@
+"""
+Persistence of suggestions, shared by the Django API and the Flask blueprint.
+
+Suggestions are built unsaved and written with one bulk INSERT inside one
+transaction, so a document with hundreds of matched segments costs a single
+round trip and a single commit instead of one per row.
+"""
+from django.db import transaction
+
+from .models import Suggestion
+from .serializers import SuggestionSerializer
+
+
+def build_suggestion(document_id, original_text, paraphrased_text, citation_text, source_url, source_title):
+    """Return an unsaved Suggestion, to be written by save_suggestions."""
+    return Suggestion(
+        document_id=document_id,
+        original_text=original_text,
+        paraphrased_text=paraphrased_text,
+        citation_text=citation_text,
+        source_url=source_url,
+        source_title=source_title,
+    )
+
+
+def save_suggestions(suggestions):
+    """
+    Insert unsaved suggestions with one bulk INSERT in one transaction.
+
+    Django caps an SQLite statement at 999 parameters, so more than 142
+    suggestions are split into several INSERTs, still in the one transaction.
+
+    Returns:
+        list: The suggestions, with their primary keys set
+    """
+    suggestions = list(suggestions)
+    if not suggestions:
+        return []
+    with transaction.atomic():
+        return Suggestion.objects.bulk_create(suggestions)
+
+
+def update_citations(suggestions):
+    """Write the citation_text of saved suggestions back in one bulk UPDATE."""
+    Suggestion.objects.bulk_update(suggestions, ['citation_text'])
+
+
+def suggestions_for_document(document_id):
+    """Return a document's suggestions, newest first."""
+    return Suggestion.objects.filter(document_id=document_id)
+
+
+def serialize_suggestions(suggestions):
+    """Serialize suggestions to plain dicts, for callers outside DRF views."""
+    return SuggestionSerializer(suggestions, many=True).data
@@ -1,7 +1,20 @@
 from rest_framework import serializers
-from .models import Suggestion
+from .models import Suggestion, SuggestionJob
 
 class SuggestionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Suggestion
-        fields = ['id', 'original_text', 'paraphrased_text', 'citation_text', 'source_url', 'source_title', 'created_at'] 
\ No newline at end of file
+        fields = ['id', 'original_text', 'paraphrased_text', 'citation_text', 'source_url', 'source_title', 'created_at'] 
+
+class SuggestionJobSerializer(serializers.ModelSerializer):
+    suggestions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SuggestionJob
+        fields = ['id', 'document', 'model', 'status', 'attempts', 'next_attempt_at', 'error',
+                  'created_at', 'started_at', 'finished_at', 'suggestions']
+
+    def get_suggestions(self, job):
+        if job.status != SuggestionJob.STATUS_DONE:
+            return []
+        return SuggestionSerializer(Suggestion.objects.filter(id__in=job.suggestion_ids), many=True).data
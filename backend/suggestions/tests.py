@@ -1,3 +1,563 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
 
-# Create your tests here.
+import httpx
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openai import RateLimitError
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from document_processor.jobs import renew_lease
+from document_processor.models import Document
+from services import llm_client, llm_service
+from services.llm_service import (
+    LLMService, StructuredOutputError, estimate_tokens, iter_json_array_items, pack_segments, parse_segment_results,
+)
+
+from . import jobs, llm_metrics, repository
+from .models import CitationCache, ParaphraseCache, SuggestionDeadLetter, SuggestionJob
+
+
+RATE_LIMIT_ERROR = RateLimitError(
+    'Rate limit exceeded: free-models-per-min',
+    response=httpx.Response(429, request=httpx.Request('POST', 'https://openrouter.ai/api/v1/chat/completions')),
+    body=None,
+)
+
+
+class StubCompletions:
+    """Stands in for client.chat.completions; answers paraphrase and citation prompts."""
+
+    def __init__(self, delay=0.0, fail_on=None, drop=None, garble=None, citation_delay=0.0):
+        self.delay = delay
+        self.citation_delay = citation_delay
+        self.fail_on = fail_on  # Raise for prompts containing this text
+        self.error = RuntimeError('upstream error')
+        self.drop = drop  # Leave segments with this text out of the response
+        self.garble = garble  # Answer prompts containing this text with invalid JSON
+        self.calls = []
+        self.streamed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def create(self, messages, **kwargs):
+        prompt = messages[-1]['content']
+        with self._lock:
+            self.calls.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if self.fail_on and self.fail_on in prompt:
+                raise self.error
+            if prompt.startswith('Generate APA citations'):
+                time.sleep(self.citation_delay)
+                sources = json.loads(prompt.split('Sources:')[1])['sources']
+                content = json.dumps({'citations': [
+                    {'id': source['id'], 'text': f"Citation {source['title'].split()[-1]}"} for source in sources
+                ]})
+            elif self.garble and self.garble in prompt:
+                content = 'Here are the rewritten segments: segment one ---'
+            else:
+                segments = json.loads(prompt.split('Original text segments:')[1])['segments']
+                content = '```json\n' + json.dumps({'segments': [
+                    {'id': segment['id'], 'text': f"Rewritten {segment['text']}"}
+                    for segment in segments if not (self.drop and self.drop in segment['text'])
+                ]}) + '\n```'
+            if kwargs.get('stream'):
+                with self._lock:
+                    self.streamed += 1
+                return [
+                    SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + 7]))])
+                    for i in range(0, len(content), 7)
+                ]
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class LLMClientRegistryTestCase(TestCase):
+    def tearDown(self):
+        llm_client.close_clients()
+
+    def test_services_share_one_client_per_api_key(self):
+        first = LLMService(api_key='key-a')
+        second = LLMService(api_key='key-a')
+        other = LLMService(api_key='key-b')
+
+        self.assertIs(first.client, second.client)
+        self.assertIsNot(first.client, other.client)
+
+    @override_settings(LLM_MAX_CONNECTIONS=7, LLM_MAX_KEEPALIVE_CONNECTIONS=3, LLM_READ_TIMEOUT=42.0)
+    def test_client_pool_uses_configured_limits(self):
+        client = llm_client.get_client('key-a')
+        pool = client._client._transport._pool
+
+        self.assertEqual(pool._max_connections, 7)
+        self.assertEqual(pool._max_keepalive_connections, 3)
+        self.assertEqual(client._client.timeout.read, 42.0)
+
+    def test_clients_are_rebuilt_after_fork(self):
+        client = llm_client.get_client('key-a')
+        llm_client._clients_pid = -1  # As seen from a forked worker
+
+        self.assertIsNot(llm_client.get_client('key-a'), client)
+
+
+class PackSegmentsTestCase(TestCase):
+    def test_packs_in_order_within_budget(self):
+        texts = ['x' * 40, 'x' * 40, 'x' * 40, 'x' * 400, 'x' * 4]
+        per_segment = estimate_tokens(texts[0])
+
+        batches = pack_segments(range(5), texts, input_budget=per_segment * 2, output_budget=1000, max_segments=10)
+
+        self.assertEqual(batches, [[0, 1], [2], [3], [4]])
+
+    def test_respects_output_budget_and_segment_cap(self):
+        texts = ['x' * 40] * 5
+        per_segment = estimate_tokens(texts[0])
+
+        self.assertEqual(pack_segments(range(5), texts, 1000, per_segment, 10), [[0], [1], [2], [3], [4]])
+        self.assertEqual(pack_segments(range(5), texts, 1000, 1000, 2), [[0, 1], [2, 3], [4]])
+
+
+class RepositoryTestCase(TestCase):
+    def test_saves_many_suggestions_in_one_insert(self):
+        user = User.objects.create_user(username='student', password='StrongPass123')
+        document = Document.objects.create(title='Essay', file_type='txt', extracted_text='Essay text', uploaded_by=user)
+        suggestions = [
+            repository.build_suggestion(document.id, f'segment {n}', f'rewritten {n}', 'Citation', 'https://example.com', 'Source')
+            for n in range(120)
+        ]
+
+        with self.assertNumQueries(3):  # SAVEPOINT, INSERT, RELEASE SAVEPOINT
+            saved = repository.save_suggestions(suggestions)
+
+        self.assertTrue(all(suggestion.pk for suggestion in saved))
+        self.assertEqual(repository.suggestions_for_document(document.id).count(), 120)
+        self.assertEqual(repository.serialize_suggestions(saved[:1])[0]['id'], saved[0].pk)
+
+
+class ParseSegmentResultsTestCase(TestCase):
+    def test_reads_fenced_json_and_skips_invalid_entries(self):
+        content = 'Sure:\n```json\n' + json.dumps({'segments': [
+            {'id': 1, 'text': ' second '},
+            {'id': '0', 'text': 'first'},
+            {'id': 0, 'text': 'duplicate'},
+            {'id': 7, 'text': 'unknown id'},
+            {'id': 2, 'text': ''},
+            'not an object',
+        ]}) + '\n```'
+
+        self.assertEqual(parse_segment_results(content, range(3)), {0: 'first', 1: 'second'})
+
+    def test_streamed_items_are_yielded_as_they_complete(self):
+        content = '```json\n{"segments": [{"id": 0, "text": "a, [b]"}, {"id": 1, "text": "c"}]}\n```'
+        received = []
+
+        def chunks():
+            for i in range(0, len(content), 3):
+                yield content[i:i + 3]
+                received.append(i)
+
+        items = []
+        for item in iter_json_array_items(chunks(), 'segments'):
+            items.append((item, len(received)))
+
+        self.assertEqual([item for item, _ in items], [{'id': 0, 'text': 'a, [b]'}, {'id': 1, 'text': 'c'}])
+        self.assertLess(items[0][1], items[1][1])  # The first item did not wait for the second
+
+    def test_rejects_responses_without_segments(self):
+        for content in ['segment one --- segment two', '{"segments": [', '{"paraphrases": ["a"]}']:
+            with self.assertRaises(StructuredOutputError):
+                parse_segment_results(content, range(2))
+
+
+@override_settings(LLM_SEGMENTS_PER_REQUEST=2, LLM_CONCURRENCY=4)
+class GenerateSuggestionsTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='student', password='StrongPass123')
+        self.document = Document.objects.create(title='Essay', file_type='txt', extracted_text='Essay text', uploaded_by=user)
+        self.sources = [{
+            'url': 'https://example.com/a',
+            'title': 'Source A',
+            'matchedText': [f'segment {number}' for number in range(5)],
+        }]
+
+    def make_service(self, completions):
+        service = LLMService(api_key='test-key')
+        service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        return service
+
+    def test_batches_run_concurrently_and_keep_segment_order(self):
+        completions = StubCompletions(delay=0.05)
+        suggestions = self.make_service(completions).generate_suggestions('Essay text', self.sources, self.document.id)
+
+        # Three paraphrase batches of at most two segments plus one citation call
+        self.assertEqual(len(completions.calls), 4)
+        self.assertGreater(completions.max_in_flight, 1)
+        self.assertTrue(all(s.pk for s in suggestions))
+        self.assertEqual(
+            [s.paraphrased_text for s in sorted(suggestions, key=lambda s: s.original_text)],
+            [f'Rewritten segment {number}' for number in range(5)],
+        )
+        self.assertTrue(all(s.citation_text == 'Citation A' for s in suggestions))
+
+    def test_unparseable_batch_retries_only_its_segments(self):
+        completions = StubCompletions(garble='segment 2')
+        suggestions = self.make_service(completions).generate_suggestions('Essay text', self.sources, self.document.id)
+
+        # The unparseable batch is split; segment 3 succeeds alone and segment 2 is retried once, then dropped
+        self.assertEqual(
+            sorted(s.original_text for s in suggestions),
+            ['segment 0', 'segment 1', 'segment 3', 'segment 4'],
+        )
+        self.assertEqual(sum('segment 0' in call for call in completions.calls), 1)
+        self.assertEqual(sum('segment 2' in call for call in completions.calls), 3)
+
+    def test_api_errors_are_not_split_or_retried(self):
+        completions = StubCompletions(fail_on='segment 2')
+        failures = []
+        suggestions = list(self.make_service(completions).iter_suggestions(
+            'Essay text', self.sources, self.document.id, failures=failures
+        ))
+
+        # The client already retried the call; the whole batch of segments 2 and 3 is given up on
+        self.assertEqual(sorted({s.pk: s.original_text for s in suggestions}.values()), ['segment 0', 'segment 1', 'segment 4'])
+        self.assertEqual(sum('segment 2' in call for call in completions.calls), 1)
+        self.assertEqual(len(failures), 1)
+
+    @override_settings(LLM_INPUT_TOKEN_BUDGET=20, LLM_SEGMENTS_PER_REQUEST=10)
+    def test_batches_are_packed_to_the_token_budget(self):
+        completions = StubCompletions()
+        self.sources[0]['matchedText'] = ['a' * 40, 'b' * 4, 'c' * 200, 'd' * 8]
+        suggestions = self.make_service(completions).generate_suggestions('Essay text', self.sources, self.document.id)
+
+        paraphrase_calls = [call for call in completions.calls if 'Original text segments' in call]
+        # a and b fit together; the oversized c gets its own request
+        self.assertEqual(len(paraphrase_calls), 3)
+        self.assertEqual(len(suggestions), 4)
+
+    def test_raises_when_every_batch_fails(self):
+        completions = StubCompletions(fail_on='segment')
+        with self.assertRaisesMessage(Exception, 'Failed to generate suggestions'):
+            self.make_service(completions).generate_suggestions('Essay text', self.sources, self.document.id)
+
+    def test_cached_segments_and_citations_skip_the_model(self):
+        self.make_service(StubCompletions()).generate_suggestions('Essay text', self.sources, self.document.id)
+        self.assertEqual(ParaphraseCache.objects.count(), 5)
+        self.assertEqual(CitationCache.objects.get().citation_text, 'Citation A')
+
+        completions = StubCompletions()
+        self.sources[0]['matchedText'].append('segment 5')
+        suggestions = self.make_service(completions).generate_suggestions('Essay text', self.sources, self.document.id)
+
+        # Only the new segment is paraphrased; the citation comes from the cache
+        self.assertEqual(len(completions.calls), 1)
+        self.assertIn('segment 5', completions.calls[0])
+        self.assertEqual(len(suggestions), 6)
+        self.assertTrue(all(s.citation_text == 'Citation A' for s in suggestions))
+
+    def test_citations_are_matched_to_sources_by_id(self):
+        self.sources.append({'url': 'https://example.com/b', 'title': 'Source B', 'matchedText': ['other text']})
+        reordered = json.dumps({'citations': [{'id': 1, 'text': 'Citation B'}, {'id': 7, 'text': 'Unknown'}]})
+        service = self.make_service(StubCompletions())
+
+        with patch.object(service.client.chat.completions, 'create', return_value=SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=reordered))])):
+            citations = service._generate_citations({source['url']: source for source in self.sources})
+
+        self.assertEqual(citations, {'https://example.com/b': 'Citation B'})
+
+    def test_suggestions_do_not_wait_for_citations(self):
+        completions = StubCompletions(citation_delay=0.3)
+        service = self.make_service(completions)
+        events = [
+            (suggestion.pk, suggestion.citation_text)
+            for suggestion in service.iter_suggestions('Essay text', self.sources, self.document.id)
+        ]
+
+        first_ids = [pk for pk, _ in events[:5]]
+        self.assertEqual(events[0][1], 'Retrieved from https://example.com/a')
+        self.assertEqual([citation for _, citation in events[5:]], ['Citation A'] * 5)
+        self.assertEqual(sorted(pk for pk, _ in events[5:]), sorted(first_ids))
+        self.assertEqual(set(self.document.suggestions.values_list('citation_text', flat=True)), {'Citation A'})
+        self.assertEqual(CitationCache.objects.get().citation_text, 'Citation A')
+
+    def test_prompt_version_change_invalidates_paraphrases(self):
+        self.make_service(StubCompletions()).generate_suggestions('Essay text', self.sources, self.document.id)
+
+        completions = StubCompletions()
+        with patch.object(llm_service, 'PROMPT_VERSION', llm_service.PROMPT_VERSION + 1):
+            self.make_service(completions).generate_suggestions('Essay text', self.sources, self.document.id)
+
+        self.assertEqual(len(completions.calls), 3)
+
+    def test_missing_ids_are_requested_again_on_their_own(self):
+        completions = StubCompletions(drop='segment 3')
+        suggestions = self.make_service(completions).generate_suggestions('Essay text', self.sources, self.document.id)
+
+        # The batch with segment 2 is not repeated; segment 3 is asked for alone, then retried once
+        self.assertEqual(sum('segment 2' in call for call in completions.calls), 1)
+        self.assertEqual(sum('segment 3' in call for call in completions.calls), 3)
+        self.assertEqual(len(suggestions), 4)
+        stats = llm_metrics.stats()
+        self.assertEqual(stats['missing_segments'], 3)
+        self.assertEqual(stats['invalid_responses'], 0)
+
+    def test_invalid_json_is_counted_and_split(self):
+        completions = StubCompletions(garble='segment 0')
+        suggestions = self.make_service(completions).generate_suggestions('Essay text', self.sources, self.document.id)
+
+        self.assertEqual(sorted(s.original_text for s in suggestions), [f'segment {n}' for n in range(1, 5)])
+        stats = llm_metrics.stats()
+        self.assertEqual(stats['invalid_responses'], 3)  # The batch, then segment 0 alone and its retry
+        self.assertEqual(stats['responses'], 6)
+
+
+@override_settings(LLM_SEGMENTS_PER_REQUEST=2)
+class GenerateStreamTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.document = Document.objects.create(title='Essay', file_type='txt', extracted_text='Essay text', uploaded_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.completions = StubCompletions()
+        patcher = patch('services.llm_service.get_client',
+                        return_value=SimpleNamespace(chat=SimpleNamespace(completions=self.completions)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, **data):
+        return self.client.post('/api/suggestions/generate/stream/', {
+            'text': 'Essay text',
+            'matched_sources': [{'url': 'https://example.com/a', 'title': 'Source A',
+                                 'matchedText': ['segment 0', 'segment 1', 'segment 2']}],
+            'document_id': self.document.id,
+            **data,
+        }, format='json', HTTP_ACCEPT='text/event-stream')
+
+    def events(self, response):
+        body = b''.join(response.streaming_content).decode()
+        return [
+            (block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+            for block in body.strip().split('\n\n')
+        ]
+
+    def test_streams_each_suggestion_then_done(self):
+        response = self.post()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = [event for event in self.events(response) if event[0] != 'citation']
+        self.assertEqual([name for name, _ in events], ['suggestion'] * 3 + ['done'])
+        self.assertEqual(events[-1][1], {'count': 3})
+        self.assertEqual(
+            sorted(data['paraphrased_text'] for _, data in events[:-1]),
+            ['Rewritten segment 0', 'Rewritten segment 1', 'Rewritten segment 2'],
+        )
+        self.assertEqual(self.document.suggestions.count(), 3)
+        self.assertEqual(self.completions.streamed, 2)  # Both paraphrase batches used the streaming API
+
+    def test_late_citations_are_sent_as_citation_events(self):
+        self.completions.citation_delay = 0.3
+        events = self.events(self.post())
+
+        self.assertEqual([name for name, _ in events], ['suggestion'] * 3 + ['citation'] * 3 + ['done'])
+        suggestion_ids = {data['id'] for name, data in events if name == 'suggestion'}
+        self.assertEqual({data['id'] for name, data in events if name == 'citation'}, suggestion_ids)
+        self.assertEqual(events[3][1]['citation_text'], 'Citation A')
+
+    def test_validation_errors_are_plain_responses(self):
+        response = self.post(matched_sources=[])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(response.content), {'error': 'Missing required field: matched_sources'})
+
+    def test_failure_is_reported_as_an_error_event(self):
+        self.completions.fail_on = 'segment'
+        events = self.events(self.post())
+
+        self.assertEqual(events[-1][0], 'error')
+        self.assertEqual(events[-1][1]['error'], 'Failed to generate suggestions')
+
+    def test_rate_limit_queues_the_undelivered_segments(self):
+        self.completions.fail_on = 'segment 2'
+        self.completions.error = RATE_LIMIT_ERROR
+        events = [event for event in self.events(self.post()) if event[0] != 'citation']
+
+        self.assertEqual([name for name, _ in events], ['suggestion', 'suggestion', 'queued'])
+        job = SuggestionJob.objects.get(id=events[-1][1]['id'])
+        self.assertEqual(job.payload['matched_sources'][0]['matchedText'], ['segment 2'])
+
+    def test_rate_limit_before_any_suggestion_queues_everything(self):
+        self.completions.fail_on = 'segment'
+        self.completions.error = RATE_LIMIT_ERROR
+        events = self.events(self.post())
+
+        self.assertEqual([name for name, _ in events], ['queued'])
+        job = SuggestionJob.objects.get(id=events[0][1]['id'])
+        self.assertEqual(job.payload['matched_sources'][0]['matchedText'], ['segment 0', 'segment 1', 'segment 2'])
+
+
+
+
+@override_settings(SUGGESTION_MAX_ATTEMPTS=2, LLM_MODEL_CONCURRENCY=1, LLM_MODEL='model-a')
+class SuggestionJobTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='StrongPass123')
+        self.document = Document.objects.create(title='Essay', file_type='txt', extracted_text='Essay text', uploaded_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.completions = StubCompletions()
+        patcher = patch('services.llm_service.get_client',
+                        return_value=SimpleNamespace(chat=SimpleNamespace(completions=self.completions)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.body = {
+            'text': 'Essay text',
+            'matched_sources': [{'url': 'https://example.com/a', 'title': 'Source A', 'matchedText': ['segment 0', 'segment 1']}],
+            'document_id': self.document.id,
+        }
+
+    def enqueue(self, model=None):
+        return jobs.enqueue_suggestions(self.document, self.user, self.body['text'], self.body['matched_sources'], model)
+
+    def test_backoff_grows_with_jitter(self):
+        with override_settings(SUGGESTION_BACKOFF_BASE=4.0, SUGGESTION_BACKOFF_MAX=20.0):
+            for attempts, delay in [(1, 4.0), (2, 8.0), (3, 16.0), (6, 20.0)]:
+                for _ in range(20):
+                    self.assertTrue(delay / 2 <= jobs.backoff_delay(attempts) <= delay)
+
+    def test_queued_job_runs_and_reports_its_suggestions(self):
+        response = self.client.post('/api/suggestions/jobs/', self.body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], SuggestionJob.STATUS_QUEUED)
+
+        self.assertTrue(jobs.process_next_job())
+        self.assertFalse(jobs.process_next_job())
+
+        response = self.client.get(f"/api/suggestions/jobs/{response.data['id']}/")
+        self.assertEqual(response.data['status'], SuggestionJob.STATUS_DONE)
+        self.assertEqual(
+            sorted(s['paraphrased_text'] for s in response.data['suggestions']),
+            ['Rewritten segment 0', 'Rewritten segment 1'],
+        )
+
+    def test_rate_limited_job_backs_off_then_dead_letters(self):
+        self.completions.fail_on, self.completions.error = 'segment', RATE_LIMIT_ERROR
+        job = self.enqueue()
+
+        self.assertTrue(jobs.process_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, SuggestionJob.STATUS_QUEUED)
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        self.assertFalse(jobs.process_next_job())  # Not due yet
+
+        SuggestionJob.objects.filter(id=job.id).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(jobs.process_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, SuggestionJob.STATUS_FAILED)
+        self.assertEqual(SuggestionDeadLetter.objects.get().job, job)
+
+        self.assertEqual(jobs.requeue_dead_letters(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (SuggestionJob.STATUS_QUEUED, 0))
+        self.assertFalse(SuggestionDeadLetter.objects.exists())
+
+    @override_settings(LLM_SEGMENTS_PER_REQUEST=1)
+    def test_partly_rate_limited_job_retries_only_the_undelivered_segments(self):
+        self.completions.fail_on, self.completions.error = 'segment 1', RATE_LIMIT_ERROR
+        job = self.enqueue()
+
+        self.assertTrue(jobs.process_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, SuggestionJob.STATUS_QUEUED)
+        self.assertEqual(len(job.suggestion_ids), 1)
+        self.assertEqual(job.payload['matched_sources'][0]['matchedText'], ['segment 1'])
+
+        self.completions.fail_on = None
+        SuggestionJob.objects.filter(id=job.id).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(jobs.process_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, SuggestionJob.STATUS_DONE)
+        self.assertEqual(len(job.suggestion_ids), 2)
+        self.assertFalse(SuggestionDeadLetter.objects.exists())
+
+    def test_other_errors_fail_the_job_without_retrying(self):
+        self.completions.fail_on = 'segment'  # RuntimeError('upstream error')
+        job = self.enqueue()
+
+        self.assertTrue(jobs.process_next_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (SuggestionJob.STATUS_FAILED, 1))
+        self.assertTrue(SuggestionDeadLetter.objects.filter(job=job).exists())
+
+    def test_rate_limits_are_recognized_by_type(self):
+        self.assertTrue(jobs.is_rate_limited(RATE_LIMIT_ERROR))
+        self.assertFalse(jobs.is_rate_limited(RuntimeError('Error code: 429 - Rate limit exceeded')))
+
+    def test_running_jobs_are_capped_per_model(self):
+        busy = self.enqueue()
+        SuggestionJob.objects.filter(id=busy.id).update(status=SuggestionJob.STATUS_RUNNING, started_at=timezone.now())
+        waiting = self.enqueue()
+        other = self.enqueue(model='model-b')
+
+        self.assertTrue(jobs.process_next_job())
+        self.assertFalse(jobs.process_next_job())
+
+        waiting.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(waiting.status, SuggestionJob.STATUS_QUEUED)
+        self.assertEqual(other.status, SuggestionJob.STATUS_DONE)
+
+    @override_settings(SUGGESTION_JOB_TIMEOUT=60)
+    def test_only_jobs_with_an_expired_lease_are_requeued(self):
+        slow, dead = self.enqueue(), self.enqueue()
+        long_ago = timezone.now() - timedelta(seconds=600)
+        SuggestionJob.objects.filter(id__in=[slow.id, dead.id]).update(
+            status=SuggestionJob.STATUS_RUNNING, worker='host:1:worker', started_at=long_ago, heartbeat_at=long_ago
+        )
+        slow.refresh_from_db()
+        self.assertTrue(renew_lease(slow))  # Its worker is still alive
+
+        self.assertEqual(jobs.requeue_stale(SuggestionJob, 60), 1)
+        slow.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual(slow.status, SuggestionJob.STATUS_RUNNING)
+        self.assertEqual(dead.status, SuggestionJob.STATUS_QUEUED)
+        self.assertFalse(renew_lease(dead))
+
+    def test_rate_limited_generate_queues_a_job(self):
+        self.completions.fail_on, self.completions.error = 'segment', RATE_LIMIT_ERROR
+        response = self.client.post('/api/suggestions/generate/', self.body, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response.data['rate_limited'])
+        self.assertEqual(SuggestionJob.objects.get().id, response.data['job']['id'])
+
+    @override_settings(LLM_SEGMENTS_PER_REQUEST=1)
+    def test_partly_rate_limited_generate_queues_the_rest(self):
+        self.completions.fail_on, self.completions.error = 'segment 1', RATE_LIMIT_ERROR
+        response = self.client.post('/api/suggestions/generate/', self.body, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response.data['rate_limited'])
+        self.assertEqual([s['original_text'] for s in response.data['suggestions']], ['segment 0'])
+        job = SuggestionJob.objects.get(id=response.data['job']['id'])
+        self.assertEqual(job.payload['matched_sources'][0]['matchedText'], ['segment 1'])
+
+    def test_jobs_of_other_users_are_hidden(self):
+        job = self.enqueue()
+        other = User.objects.create_user(username='classmate', password='StrongPass123')
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get(f'/api/suggestions/jobs/{job.id}/').status_code, status.HTTP_404_NOT_FOUND)
@@ -1,8 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SuggestionViewSet
+from .views import SuggestionJobViewSet, SuggestionViewSet
 
 router = DefaultRouter()
+# Registered first so "jobs" is not taken for a suggestion id
+router.register(r'suggestions/jobs', SuggestionJobViewSet, basename='suggestion-job')
 router.register(r'suggestions', SuggestionViewSet)
 
 urlpatterns = [
@@ -1,61 +1,87 @@
 from django.shortcuts import render
-from rest_framework import viewsets, status
+from rest_framework import renderers, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Suggestion
-from .serializers import SuggestionSerializer
+from authentication import audit
+from document_processor.models import Document
+from .jobs import enqueue_suggestions, is_rate_limited, undelivered_sources
+from .models import Suggestion, SuggestionJob
+from .serializers import SuggestionJobSerializer, SuggestionSerializer
 import logging
-from decouple import config
-from services.llm_service import LLMService
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from services.llm_service import LLMService, SuggestionGenerationError
 
 logger = logging.getLogger(__name__)
 
+def generate_arguments(request):
+    """
+    Read and validate the text, matched sources and document ID of a generate request.
+
+    Returns:
+        tuple: (text, matched_sources, document_id, error Response or None)
+    """
+    text = request.data.get('text')
+    matched_sources = request.data.get('matched_sources', [])
+    document_id = request.data.get('document_id')
+    
+    # Log request data for debugging
+    logger.debug(f"Received generate request with text length: {len(text) if text else 0}")
+    logger.debug(f"Number of matched sources: {len(matched_sources)}")
+    logger.debug(f"Document ID: {document_id}")
+    
+    error = None
+    if not text:
+        error = 'Missing required field: text'
+    elif not matched_sources:
+        error = 'Missing required field: matched_sources'
+    elif not document_id:
+        error = 'Missing required field: document_id'
+    elif not isinstance(matched_sources, list):
+        # Validate matched_sources structure
+        logger.error(f"Invalid matched_sources format. Expected list, got {type(matched_sources)}")
+        error = 'Invalid matched_sources format. Expected a list.'
+    if error:
+        logger.warning(error)
+        return text, matched_sources, document_id, Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    return text, matched_sources, document_id, None
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    """Lets clients ask for text/event-stream; only error responses are rendered through it, as JSON."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode('utf-8')
+
+
 class SuggestionViewSet(viewsets.ModelViewSet):
     queryset = Suggestion.objects.all()
     serializer_class = SuggestionSerializer
 
+    def _llm_service(self):
+        # Cheap: the pooled API client is shared per process
+        return LLMService(
+            api_key=settings.OPENROUTER_API_KEY,
+            site_url=settings.SITE_URL,
+            site_name=settings.SITE_NAME
+        )
+
     @action(detail=False, methods=['post'])
     def generate(self, request):
         try:
-            text = request.data.get('text')
-            matched_sources = request.data.get('matched_sources', [])
-            document_id = request.data.get('document_id')
-            
-            # Log request data for debugging
-            logger.debug(f"Received generate request with text length: {len(text) if text else 0}")
-            logger.debug(f"Number of matched sources: {len(matched_sources)}")
-            logger.debug(f"Document ID: {document_id}")
-            
-            if not text:
-                logger.warning("Missing required field: text")
-                return Response({'error': 'Missing required field: text'}, status=status.HTTP_400_BAD_REQUEST)
-                
-            if not matched_sources:
-                logger.warning("Missing required field: matched_sources")
-                return Response({'error': 'Missing required field: matched_sources'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            if not document_id:
-                logger.warning("Missing required field: document_id")
-                return Response({'error': 'Missing required field: document_id'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Validate matched_sources structure
-            if not isinstance(matched_sources, list):
-                logger.error(f"Invalid matched_sources format. Expected list, got {type(matched_sources)}")
-                return Response(
-                    {'error': 'Invalid matched_sources format. Expected a list.'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Initialize LLM service
-            llm_service = LLMService(
-                api_key=config('OPENROUTER_API_KEY'),
-                site_url=config('SITE_URL', default='http://localhost:3000'),
-                site_name=config('SITE_NAME', default='Plagiarism Checker')
-            )
+            text, matched_sources, document_id, error = generate_arguments(request)
+            if error is not None:
+                return error
+
+            llm_service = self._llm_service()
 
             try:
                 # Generate suggestions with document_id
-                suggestions = llm_service.generate_suggestions(text, matched_sources, document_id)
+                failures = []
+                suggestions = llm_service.generate_suggestions(text, matched_sources, document_id, failures=failures)
                 
                 if not suggestions:
                     logger.warning("No suggestions were generated")
@@ -67,7 +93,21 @@ class SuggestionViewSet(viewsets.ModelViewSet):
                     })
 
                 serializer = self.get_serializer(suggestions, many=True)
+                if any(is_rate_limited(failure) for failure in failures):
+                    # Some segments were given up on because of the rate limit, as in _iter_events
+                    delivered = {suggestion.original_text for suggestion in suggestions}
+                    job = self._queue_undelivered(text, matched_sources, document_id, request.user, delivered)
+                    return Response({
+                        'suggestions': serializer.data,
+                        'rate_limited': True,
+                        'rate_limit_message': 'The AI service is busy; the remaining suggestions will be generated in the background.'
+                        if job is not None else 'The AI service is busy; some segments got no suggestion. Please try again later.',
+                        'job': SuggestionJobSerializer(job).data if job is not None else None
+                    }, status=status.HTTP_202_ACCEPTED if job is not None else status.HTTP_200_OK)
+
                 logger.info(f"Successfully generated {len(suggestions)} suggestions")
+                audit.record('info', 'suggestion-service', f'Generated {len(suggestions)} suggestions for document {document_id}',
+                             request.user, documentId=document_id)
                 return Response({
                     'suggestions': serializer.data,
                     'rate_limited': False,
@@ -77,14 +117,28 @@ class SuggestionViewSet(viewsets.ModelViewSet):
             except Exception as e:
                 error_msg = str(e)
                 logger.error(f"Error generating suggestions: {error_msg}", exc_info=True)
-                if "rate limit exceeded" in error_msg.lower():
+                if is_rate_limited(e):
+                    document = Document.objects.filter(id=document_id, uploaded_by=request.user).first()
+                    if document is None:
+                        return Response({
+                            'error': 'Rate limit exceeded',
+                            'message': error_msg,
+                            'suggestions': []
+                        }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+                    # Retry in the background with backoff instead of sending the user away
+                    job = enqueue_suggestions(document, request.user, text, matched_sources)
+                    audit.record('warning', 'suggestion-service', f'AI rate limit hit; queued suggestion job {job.id}',
+                                 request.user, documentId=document_id, jobId=job.id)
                     return Response({
-                        'error': 'Rate limit exceeded',
-                        'message': error_msg,
-                        'suggestions': []
-                    }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+                        'suggestions': [],
+                        'rate_limited': True,
+                        'rate_limit_message': 'The AI service is busy; suggestions will be generated in the background.',
+                        'job': SuggestionJobSerializer(job).data
+                    }, status=status.HTTP_202_ACCEPTED)
                     
-                if "Failed to generate suggestions" in error_msg:
+                audit.record('error', 'suggestion-service', f'Suggestion generation failed for document {document_id}',
+                             request.user, documentId=document_id, error=error_msg)
+                if isinstance(e, SuggestionGenerationError):
                     return Response({
                         'error': 'Failed to generate suggestions',
                         'message': error_msg,
@@ -102,3 +156,100 @@ class SuggestionViewSet(viewsets.ModelViewSet):
                 }, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+    @action(detail=False, methods=['post'], url_path='generate/stream',
+            renderer_classes=[renderers.JSONRenderer, EventStreamRenderer])
+    def generate_stream(self, request):
+        """
+        Generate suggestions and stream each one as a server-sent event as soon as it is saved.
+        Takes the same body as generate. Events: `suggestion` (a serialized
+        suggestion) and `citation` ({"id", "citation_text"}, for a suggestion
+        sent before its citation was ready), then `done` ({"count": n}),
+        `queued` (a background job for the remaining segments, after a rate
+        limit) or `error` ({"error", "message"}).
+        """
+        text, matched_sources, document_id, error = generate_arguments(request)
+        if error is not None:
+            return error
+
+        response = StreamingHttpResponse(
+            self._iter_events(self._llm_service(), text, matched_sources, document_id, request.user),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+        return response
+
+    def _iter_events(self, llm_service, text, matched_sources, document_id, user):
+        count = 0
+        sent = set()
+        delivered = set()
+        failures = []
+        try:
+            for suggestion in llm_service.iter_suggestions(text, matched_sources, document_id, stream=True, failures=failures):
+                if suggestion.pk in sent:
+                    yield self._event('citation', {'id': suggestion.pk, 'citation_text': suggestion.citation_text})
+                    continue
+                count += 1
+                sent.add(suggestion.pk)
+                delivered.add(suggestion.original_text)
+                yield self._event('suggestion', self.get_serializer(suggestion).data)
+        except Exception as e:
+            logger.error(f"Error streaming suggestions: {str(e)}", exc_info=True)
+            job = self._queue_undelivered(text, matched_sources, document_id, user, delivered) if is_rate_limited(e) else None
+            if job is not None:
+                yield self._event('queued', SuggestionJobSerializer(job).data)
+                return
+            error = 'Rate limit exceeded' if is_rate_limited(e) else 'Failed to generate suggestions'
+            audit.record('error', 'suggestion-service', f'Suggestion stream failed for document {document_id}',
+                         user, documentId=document_id, error=str(e))
+            yield self._event('error', {'error': error, 'message': str(e)})
+            return
+
+        logger.info(f"Streamed {count} suggestions")
+        if any(is_rate_limited(failure) for failure in failures):
+            # Some segments were given up on because of the rate limit
+            job = self._queue_undelivered(text, matched_sources, document_id, user, delivered)
+            if job is not None:
+                yield self._event('queued', SuggestionJobSerializer(job).data)
+                return
+        audit.record('info', 'suggestion-service', f'Streamed {count} suggestions for document {document_id}',
+                     user, documentId=document_id)
+        yield self._event('done', {'count': count})
+
+    def _queue_undelivered(self, text, matched_sources, document_id, user, delivered):
+        """Queue a background job for the segments not delivered yet; the client polls it."""
+        remaining = undelivered_sources(matched_sources, delivered)
+        document = Document.objects.filter(id=document_id, uploaded_by=user).first() if remaining else None
+        if document is None:
+            return None
+        job = enqueue_suggestions(document, user, text, remaining)
+        audit.record('warning', 'suggestion-service', f'AI rate limit hit; queued suggestion job {job.id}',
+                     user, documentId=document_id, jobId=job.id)
+        return job
+
+    @staticmethod
+    def _event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+class SuggestionJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background suggestion jobs of the current user.
+    POST takes the generate body and queues the job; GET on a job returns its
+    status, and its suggestions once it is done.
+    """
+    serializer_class = SuggestionJobSerializer
+
+    def get_queryset(self):
+        return SuggestionJob.objects.filter(requested_by=self.request.user).order_by('-id')
+
+    def create(self, request):
+        text, matched_sources, document_id, error = generate_arguments(request)
+        if error is not None:
+            return error
+        document = Document.objects.filter(id=document_id, uploaded_by=request.user).first()
+        if document is None:
+            return Response({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
+        job = enqueue_suggestions(document, request.user, text, matched_sources)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'turnitin_backend.settings')
 
 application = get_asgi_application()
+
+# Queue workers run inside the web process; imported once the apps are loaded
+from document_processor import ingestion  # noqa: E402
+from suggestions import jobs as suggestion_jobs  # noqa: E402
+
+ingestion.start_workers()
+suggestion_jobs.start_workers()
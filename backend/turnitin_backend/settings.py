@@ -187,3 +187,96 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@turnitin.com'
 
 # OTP Settings
 OTP_EXPIRY_MINUTES = config('OTP_EXPIRY_MINUTES', default=10, cast=int)
+
+# Uploads
+# Uploads up to FILE_UPLOAD_MAX_MEMORY_SIZE stay in memory; larger ones are streamed to a
+# temporary file. Put FILE_UPLOAD_TEMP_DIR on the same filesystem as INGESTION_SPOOL_DIR so
+# spooling a large upload is a rename instead of a copy.
+MAX_UPLOAD_SIZE = config('MAX_UPLOAD_SIZE', default=50 * 1024 * 1024, cast=int)
+FILE_UPLOAD_MAX_MEMORY_SIZE = config('FILE_UPLOAD_MAX_MEMORY_SIZE', default=2621440, cast=int)
+FILE_UPLOAD_TEMP_DIR = config('FILE_UPLOAD_TEMP_DIR', default=None)
+
+# Document ingestion queue
+# Uploads are spooled to disk and extracted by worker threads. INGESTION_WORKERS threads
+# run inside each web process; set it to 0 when running `manage.py run_ingestion_worker` instead.
+INGESTION_SPOOL_DIR = config('INGESTION_SPOOL_DIR', default=os.path.join(BASE_DIR, 'spool'))
+INGESTION_WORKERS = config('INGESTION_WORKERS', default=2, cast=int)
+INGESTION_POLL_INTERVAL = config('INGESTION_POLL_INTERVAL', default=2.0, cast=float)
+INGESTION_JOB_TIMEOUT = config('INGESTION_JOB_TIMEOUT', default=600, cast=int)  # Seconds without a heartbeat before a running job is requeued
+INGESTION_MAX_ATTEMPTS = config('INGESTION_MAX_ATTEMPTS', default=3, cast=int)
+
+# PDF extraction
+# PDFs are extracted on a pool of PDF_EXTRACTION_WORKERS processes, where the page timeout
+# can be enforced; PDFs with fewer than PDF_PARALLEL_MIN_PAGES pages are one pool task.
+PDF_EXTRACTION_WORKERS = config('PDF_EXTRACTION_WORKERS', default=os.cpu_count() or 1, cast=int)
+PDF_PAGES_PER_TASK = config('PDF_PAGES_PER_TASK', default=8, cast=int)
+PDF_PARALLEL_MIN_PAGES = config('PDF_PARALLEL_MIN_PAGES', default=16, cast=int)
+PDF_PAGE_TIMEOUT = config('PDF_PAGE_TIMEOUT', default=30, cast=int)  # Seconds before a page is skipped
+PDF_MMAP_THRESHOLD = config('PDF_MMAP_THRESHOLD', default=8 * 1024 * 1024, cast=int)  # Bytes; larger PDFs are memory-mapped
+
+# Web search for document chunks
+# SEARCH_RATE_LIMIT queries per second (bursts of SEARCH_BURST) are shared by all users of a
+# process; divide the API quota by the number of web processes. SEARCH_BACKEND=local searches
+# the offline SQLite index filled by `manage.py load_local_search`.
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='google')
+GOOGLE_SEARCH_API_KEY = config('GOOGLE_SEARCH_API_KEY', default='')
+GOOGLE_SEARCH_ENGINE_ID = config('GOOGLE_SEARCH_ENGINE_ID', default='')
+LOCAL_SEARCH_DB = config('LOCAL_SEARCH_DB', default=os.path.join(BASE_DIR, 'local_search.sqlite3'))
+SEARCH_RATE_LIMIT = config('SEARCH_RATE_LIMIT', default=1.0, cast=float)
+SEARCH_BURST = config('SEARCH_BURST', default=5, cast=int)
+SEARCH_CONCURRENCY = config('SEARCH_CONCURRENCY', default=8, cast=int)
+SEARCH_TIMEOUT = config('SEARCH_TIMEOUT', default=10, cast=int)  # Seconds per search API call
+SEARCH_CACHE_TTL = config('SEARCH_CACHE_TTL', default=7 * 24 * 3600, cast=int)  # Seconds a cached result stays valid
+SEARCH_CACHE_MAX_BYTES = config('SEARCH_CACHE_MAX_BYTES', default=50 * 1024 * 1024, cast=int)  # LRU eviction above this
+SEARCH_MAX_CHUNKS = config('SEARCH_MAX_CHUNKS', default=300, cast=int)  # Client chunks accepted per search request
+SEARCH_MAX_CHUNK_CHARS = config('SEARCH_MAX_CHUNK_CHARS', default=2000, cast=int)
+
+# LLM suggestions (OpenAI-compatible API, OpenRouter by default)
+# One pooled client per process is shared by all request threads; see services/llm_client.py.
+OPENROUTER_API_KEY = config('OPENROUTER_API_KEY', default='')
+SITE_URL = config('SITE_URL', default='http://localhost:3000')
+SITE_NAME = config('SITE_NAME', default='Plagiarism Checker')
+LLM_MODEL = config('LLM_MODEL', default='moonshotai/kimi-dev-72b:free')
+LLM_BASE_URL = config('LLM_BASE_URL', default='https://openrouter.ai/api/v1')
+LLM_MAX_CONNECTIONS = config('LLM_MAX_CONNECTIONS', default=20, cast=int)
+LLM_MAX_KEEPALIVE_CONNECTIONS = config('LLM_MAX_KEEPALIVE_CONNECTIONS', default=10, cast=int)
+LLM_KEEPALIVE_EXPIRY = config('LLM_KEEPALIVE_EXPIRY', default=30.0, cast=float)  # Seconds an idle connection is kept
+LLM_CONNECT_TIMEOUT = config('LLM_CONNECT_TIMEOUT', default=5.0, cast=float)
+LLM_READ_TIMEOUT = config('LLM_READ_TIMEOUT', default=120.0, cast=float)
+LLM_MAX_RETRIES = config('LLM_MAX_RETRIES', default=2, cast=int)
+LLM_CONCURRENCY = config('LLM_CONCURRENCY', default=4, cast=int)  # Concurrent completions per suggestion request
+LLM_SEGMENTS_PER_REQUEST = config('LLM_SEGMENTS_PER_REQUEST', default=8, cast=int)
+# Estimated tokens of segment text per paraphrase request, and max_tokens of its completion
+LLM_INPUT_TOKEN_BUDGET = config('LLM_INPUT_TOKEN_BUDGET', default=3000, cast=int)
+LLM_OUTPUT_TOKEN_BUDGET = config('LLM_OUTPUT_TOKEN_BUDGET', default=4000, cast=int)
+LLM_BATCH_RETRIES = config('LLM_BATCH_RETRIES', default=1, cast=int)  # Retries of a single failed segment
+
+# Background suggestion jobs. Rate-limited jobs are retried after an exponential backoff with
+# jitter (SUGGESTION_BACKOFF_BASE * 2^attempt seconds, capped at SUGGESTION_BACKOFF_MAX), then
+# moved to the dead-letter table; other failures go there at once. At most LLM_MODEL_CONCURRENCY
+# jobs per model run at once.
+SUGGESTION_WORKERS = config('SUGGESTION_WORKERS', default=2, cast=int)
+SUGGESTION_POLL_INTERVAL = config('SUGGESTION_POLL_INTERVAL', default=2.0, cast=float)
+SUGGESTION_JOB_TIMEOUT = config('SUGGESTION_JOB_TIMEOUT', default=900, cast=int)  # Seconds without a heartbeat before a running job is requeued
+SUGGESTION_MAX_ATTEMPTS = config('SUGGESTION_MAX_ATTEMPTS', default=6, cast=int)
+SUGGESTION_BACKOFF_BASE = config('SUGGESTION_BACKOFF_BASE', default=5.0, cast=float)
+SUGGESTION_BACKOFF_MAX = config('SUGGESTION_BACKOFF_MAX', default=300.0, cast=float)
+LLM_MODEL_CONCURRENCY = config('LLM_MODEL_CONCURRENCY', default=2, cast=int)
+
+# Cache for per-user dashboard statistics. The default is per process, so invalidation does not
+# reach other processes and entries only live DASHBOARD_LOCAL_CACHE_TTL seconds. Point CACHES at
+# a shared backend (e.g. Redis) when running several processes to cache for DASHBOARD_CACHE_TTL.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='vedrix'),
+    }
+}
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=300, cast=int)  # Seconds
+DASHBOARD_LOCAL_CACHE_TTL = config('DASHBOARD_LOCAL_CACHE_TTL', default=10, cast=int)  # Seconds, process-local cache
+
+# Near-duplicate detection (MinHash + LSH banding)
+# More bands with fewer rows raise recall at the cost of more candidates to verify;
+# the similarity threshold where detection becomes likely is about (1 / bands) ** (1 / rows).
+LSH_BANDS = config('LSH_BANDS', default=16, cast=int)
+LSH_ROWS = config('LSH_ROWS', default=8, cast=int)
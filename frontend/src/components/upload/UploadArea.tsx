@@ -4,6 +4,13 @@ import { Upload, X, FileText, Check, AlertCircle } from 'lucide-react';
 import Button from '../ui/Button';
 import { useAuth } from '../../context/AuthContext';
 
+// Give up waiting for text extraction after this long
+const EXTRACTION_TIMEOUT_MS = 5 * 60 * 1000;
+const STATUS_POLL_INTERVAL_MS = 1000;
+
+// Extraction failed or timed out on the server; its message is shown as is
+class ExtractionError extends Error {}
+
 interface UploadAreaProps {
   onFileSelected: (file: File) => void;
   onTextExtracted?: (text: string) => void;
@@ -33,9 +40,9 @@ const UploadArea: React.FC<UploadAreaProps> = ({ onFileSelected, onTextExtracted
       return;
     }
     
-    // Check file size (max 10MB)
-    if (file.size > 10 * 1024 * 1024) {
-      setUploadError('File is too large. Maximum size is 10MB.');
+    // Check file size (max 50MB)
+    if (file.size > 50 * 1024 * 1024) {
+      setUploadError('File is too large. Maximum size is 50MB.');
       return;
     }
     
@@ -85,7 +92,30 @@ const UploadArea: React.FC<UploadAreaProps> = ({ onFileSelected, onTextExtracted
       if (data.id) {
         sessionStorage.setItem('documentId', data.id.toString());
       }
-      
+
+      // Extraction runs in a background worker; poll until the document is indexed
+      let documentStatus = data.status;
+      const deadline = Date.now() + EXTRACTION_TIMEOUT_MS;
+      while (documentStatus && documentStatus !== 'indexed') {
+        if (documentStatus === 'failed') {
+          throw new ExtractionError('We could not extract text from this file. Please try another file.');
+        }
+        if (Date.now() >= deadline) {
+          throw new ExtractionError('Processing is taking longer than expected. Please try again later.');
+        }
+        await new Promise(resolve => setTimeout(resolve, STATUS_POLL_INTERVAL_MS));
+        const statusResponse = await fetch(`${import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000'}/api/documents/${data.id}/status/`, {
+          headers: {
+            'Accept': 'application/json',
+            'Authorization': `Token ${token}`,
+          }
+        });
+        if (!statusResponse.ok) {
+          throw new Error(`Failed to get document status with status: ${statusResponse.status}`);
+        }
+        documentStatus = (await statusResponse.json()).status;
+      }
+
       // The extracted text is now included in the response
       if (data.extracted_text) {
         setUploadProgress(100);
@@ -119,7 +149,7 @@ const UploadArea: React.FC<UploadAreaProps> = ({ onFileSelected, onTextExtracted
       
     } catch (error) {
       console.error('Error uploading file:', error);
-      setUploadError('Failed to upload file. Please try again.');
+      setUploadError(error instanceof ExtractionError ? error.message : 'Failed to upload file. Please try again.');
       setUploadProgress(0);
     } finally {
       setIsUploading(false);
@@ -218,7 +248,7 @@ const UploadArea: React.FC<UploadAreaProps> = ({ onFileSelected, onTextExtracted
               Browse Files
             </Button>
             <p className="mt-4 text-sm text-dark-500 dark:text-dark-400">
-              Supported formats: .docx, .pdf, .doc (max 10MB)
+              Supported formats: .docx, .pdf, .doc (max 50MB)
             </p>
           </div>
         ) : (
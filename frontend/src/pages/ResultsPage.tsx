@@ -261,6 +261,7 @@ interface Source {
   url: string;
   matchPercentage: number;
   matchedText: string[];
+  spans: [number, number][];
 }
 
 // Interface for Google Search API configuration
@@ -289,43 +290,49 @@ interface ChunkSearchResults {
   error?: string;
 }
 
-// Add this function after the imports and before the component
-const updateScoreInDatabase = async (score: number) => {
+// Similarity result computed and stored by the backend for a document
+interface SimilarityResult {
+  originality_score: number;
+  spans: [number, number][];
+  sources: Omit<Source, 'id'>[];
+}
+
+// Fetch the stored similarity result, or (with sources) have the backend score
+// the document against them. The backend owns the score it persists.
+const requestSimilarityResult = async (sources?: { title: string; url: string; snippet: string }[]): Promise<SimilarityResult | null> => {
   const documentId = sessionStorage.getItem('documentId');
   const token = localStorage.getItem('token');
-  
-  if (!documentId) {
-    return;
-  }
 
-  if (!token) {
-    return;
+  if (!documentId || !token) {
+    return null;
   }
 
-  const headers = {
-    'Content-Type': 'application/json',
-    'Authorization': `Token ${token}`,
-  };
+  const response = await fetch(`${import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000'}/api/documents/${documentId}/similarity/`, {
+    method: sources ? 'POST' : 'GET',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Token ${token}`,
+    },
+    body: sources ? JSON.stringify({ sources }) : undefined
+  });
 
-  try {
-    const response = await fetch(`${import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000'}/api/documents/${documentId}/update_originality_score/`, {
-      method: 'POST',
-      headers,
-      body: JSON.stringify({
-        score: score
-      })
-    });
-    
-    const data = await response.json();
-    
-    if (!response.ok) {
-      throw new Error(`Failed to update score: ${response.status}`);
-    }
-  } catch (error) {
-    // Silently handle errors
+  if (response.status === 404 && !sources) {
+    return null;
+  }
+  if (!response.ok) {
+    throw new Error(`Similarity request failed with status: ${response.status}`);
   }
+  return response.json();
 };
 
+const escapeHtml = (text: string): string =>
+  text
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;')
+    .replace(/'/g, '&#39;');
+
 const ResultsPage: React.FC = () => {
   const navigate = useNavigate();
   const [originalText, setOriginalText] = useState<string>('');
@@ -381,6 +388,11 @@ const ResultsPage: React.FC = () => {
           // Initialize with empty sources until API can be called
           setSources([]);
           setOverallScore(100); // Default to 100% original
+
+          // Show a result the backend already stored for this document, if any
+          requestSimilarityResult()
+            .then(similarity => similarity && applySimilarityResult(similarity))
+            .catch(error => console.error('Error loading similarity result:', error));
         }
       } else {
         // No extracted text available, can't proceed with analysis
@@ -455,44 +467,11 @@ const ResultsPage: React.FC = () => {
       // Update state with results
       setSearchResults(results);
       
-      // Update sources based on search results
-      updateSourcesFromSearchResults(results);
+      // Score the document server-side against the results
+      await updateSourcesFromSearchResults(results);
       
       clearInterval(progressInterval);
       setSearchProgress(100);
-      
-      // If we found sources, use them
-      if (sources.length > 0) {
-        setSources(sources);
-        
-        // Calculate overall plagiarism score based on total matched text
-        const totalTextLength = originalText.length;
-        let totalMatchedLength = 0;
-        
-        results.forEach(chunkResult => {
-          chunkResult.results.forEach(result => {
-            // Calculate similarity score using text comparison algorithms
-            const matchScore = calculateSimilarityScore(chunkResult.chunkText, result.snippet);
-            
-            // Calculate match percentage based on chunk length and match score
-            const chunkLength = chunkResult.chunkText.length;
-            const effectiveMatchLength = chunkLength * matchScore;
-            totalMatchedLength += effectiveMatchLength;
-          });
-        });
-        
-        const overallMatchPercentage = Math.min(100, Math.round((totalMatchedLength / totalTextLength) * 100));
-        
-        // Originality score is inverse of match percentage
-        const newScore = 100 - overallMatchPercentage;
-        
-        // Apply score with minimum threshold
-        const finalScore = Math.max(newScore, 5);
-        setOverallScore(finalScore);
-        
-        // Update score in database
-        await updateScoreInDatabase(finalScore);
-      }
     } catch (error) {
       console.error('Error performing similarity search:', error);
       clearInterval(progressInterval);
@@ -502,226 +481,44 @@ const ResultsPage: React.FC = () => {
     }
   };
 
-  // Update sources based on search results
+  // Update sources and score from the backend's comparison against the search results
   const updateSourcesFromSearchResults = async (results: ChunkSearchResults[]) => {
-    // Create new sources from search results
-    const newSources: Source[] = [];
-    let sourceId = 1;
-    
-    // Track total text length for percentage calculations
-    const totalTextLength = originalText.length;
-    let totalMatchedLength = 0;
-    
-    // Store matched text segments for highlighting
-    const matchedSegments: {text: string, sourceId: number}[] = [];
-    
-    results.forEach(chunkResult => {
-      chunkResult.results.forEach(result => {
-        // Calculate similarity score using text comparison algorithms
-        const matchScore = calculateSimilarityScore(chunkResult.chunkText, result.snippet);
-        
-        // Calculate match percentage based on chunk length and match score
-        const chunkLength = chunkResult.chunkText.length;
-        const effectiveMatchLength = chunkLength * matchScore;
-        totalMatchedLength += effectiveMatchLength;
-        
-        // Convert to percentage (0-100)
-        const matchPercentage = Math.round(matchScore * 100);
-        
-        // Only include sources with significant matches
-        if (matchPercentage > 3) {
-          const sourceId = newSources.length + 1;
-          
-          // Find specific matching text segments
-          const matchedTextSegments = findMatchingSegments(chunkResult.chunkText, result.snippet);
-          
-          newSources.push({
-            id: sourceId,
-            title: result.title,
-            url: result.link,
-            matchPercentage,
-            matchedText: matchedTextSegments.length > 0 ? matchedTextSegments : [result.snippet]
-          });
-          
-          // Store matched segments for highlighting
-          matchedTextSegments.forEach(segment => {
-            matchedSegments.push({
-              text: segment,
-              sourceId
-            });
-          });
-        }
-      });
+    // Send each result page once, however many chunks it came back for
+    const seen = new Set<string>();
+    const candidates = results.flatMap(chunkResult => chunkResult.results).filter(result => {
+      if (!result.snippet || seen.has(result.link)) return false;
+      seen.add(result.link);
+      return true;
     });
     
-    // If we found sources, use them
-    if (newSources.length > 0) {
-      setSources(newSources);
-      
-      // Calculate overall plagiarism score based on total matched text
-      const overallMatchPercentage = Math.min(100, Math.round((totalMatchedLength / totalTextLength) * 100));
-      
-      // Originality score is inverse of match percentage
-      const newScore = 100 - overallMatchPercentage;
-      
-      // Apply score with minimum threshold
-      const finalScore = Math.max(newScore, 5);
-      setOverallScore(finalScore);
-      
-      // Update score in database
-      await updateScoreInDatabase(finalScore);
-    }
-  };
-  
-  // Find specific matching text segments between two texts
-  const findMatchingSegments = (text1: string, text2: string): string[] => {
-    const segments: string[] = [];
-    
-    // Normalize texts
-    const normalizedText1 = text1.toLowerCase();
-    const normalizedText2 = text2.toLowerCase();
-    
-    // Extract phrases from text2 (3+ words)
-    const phrases = extractPhrases(normalizedText2, 3);
-    
-    // Check each phrase for matches in text1
-    for (const phrase of phrases) {
-      if (phrase.length < 15) continue; // Skip very short phrases
-      
-      if (normalizedText1.includes(phrase)) {
-        // Find the actual case-preserved text from original
-        const startIndex = text1.toLowerCase().indexOf(phrase);
-        if (startIndex >= 0) {
-          const originalPhrase = text1.substring(startIndex, startIndex + phrase.length);
-          if (!segments.includes(originalPhrase)) {
-            segments.push(originalPhrase);
-          }
-        }
-      }
+    const similarity = await requestSimilarityResult(
+      candidates.map(result => ({ title: result.title, url: result.link, snippet: result.snippet }))
+    );
+    if (similarity) {
+      applySimilarityResult(similarity);
     }
-    
-    return segments;
   };
   
-  // Extract phrases of n or more words from text
-  const extractPhrases = (text: string, minWords: number = 3): string[] => {
-    const phrases: string[] = [];
-    const words = text.split(/\s+/);
-    
-    // Generate phrases of increasing length
-    for (let length = minWords; length <= words.length; length++) {
-      for (let i = 0; i <= words.length - length; i++) {
-        const phrase = words.slice(i, i + length).join(' ');
-        phrases.push(phrase);
-      }
-    }
-    
-    return phrases;
-  };
-  
-  // Calculate similarity between two text strings
-  const calculateSimilarityScore = (text1: string, text2: string): number => {
-    // Normalize texts for comparison
-    const normalizedText1 = text1.toLowerCase().replace(/\s+/g, ' ').trim();
-    const normalizedText2 = text2.toLowerCase().replace(/\s+/g, ' ').trim();
-    
-    // If either text is empty, no similarity
-    if (!normalizedText1 || !normalizedText2) return 0;
-    
-    // Check for exact matches
-    if (normalizedText1 === normalizedText2) return 1.0;
-    
-    // Check if one text contains the other
-    if (normalizedText1.includes(normalizedText2)) {
-      return normalizedText2.length / normalizedText1.length;
-    }
-    
-    if (normalizedText2.includes(normalizedText1)) {
-      return normalizedText1.length / normalizedText2.length;
-    }
-    
-    // Calculate word overlap
-    const words1 = normalizedText1.split(' ');
-    const words2 = normalizedText2.split(' ');
-    
-    // Count matching words
-    let matchCount = 0;
-    const wordSet = new Set(words2);
-    
-    for (const word of words1) {
-      if (wordSet.has(word) && word.length > 3) { // Only count significant words
-        matchCount++;
-      }
-    }
-    
-    // Calculate Jaccard similarity coefficient
-    const uniqueWords = new Set([...words1, ...words2]);
-    const similarity = matchCount / uniqueWords.size;
-    
-    // Apply significance factor based on text lengths
-    const lengthFactor = Math.min(normalizedText1.length, normalizedText2.length) / 
-                        Math.max(normalizedText1.length, normalizedText2.length);
-    
-    // Combine factors with weights
-    const weightedSimilarity = (similarity * 0.7) + (lengthFactor * 0.3);
-    
-    return weightedSimilarity;
+  const applySimilarityResult = (similarity: SimilarityResult) => {
+    setSources(similarity.sources.map((source, index) => ({ ...source, id: index + 1 })));
+    setOverallScore(similarity.originality_score);
   };
 
+  // Highlight the selected source's matched spans, which are offsets into the extracted text
   const getHighlightedText = () => {
-    if (!selectedSource) return originalText;
-    
-    const source = sources.find(s => s.id === selectedSource);
-    if (!source) return originalText;
-    
-    let highlightedText = originalText;
+    const source = selectedSource ? sources.find(s => s.id === selectedSource) : undefined;
+    if (!source) return escapeHtml(originalText);
     
-    // Sort matched text segments by length (longest first) to avoid nested highlights
-    const sortedMatches = [...source.matchedText].sort((a, b) => b.length - a.length);
-    
-    // Create a map to track which parts of the text have been highlighted
-    const highlightedRanges: {start: number, end: number}[] = [];
-    
-    // Process each match
-    sortedMatches.forEach(match => {
-      if (match && match.trim().length > 10) { // Only highlight substantial matches
-        // Find all occurrences of the match in the text
-        let startIndex = 0;
-        let currentIndex: number = -1;
-        
-        while ((currentIndex = highlightedText.indexOf(match, startIndex)) !== -1) {
-          // Check if this range overlaps with any existing highlight
-          const overlaps = highlightedRanges.some(range => 
-            (currentIndex >= range.start && currentIndex < range.end) || 
-            (currentIndex + match.length > range.start && currentIndex + match.length <= range.end)
-          );
-          
-          if (!overlaps) {
-            // Calculate the parts before, during, and after the match
-            const before = highlightedText.substring(0, currentIndex);
-            const highlighted = `<span class="bg-accent-100 dark:bg-accent-900/50 text-accent-800 dark:text-accent-100 px-1 rounded">${match}</span>`;
-            const after = highlightedText.substring(currentIndex + match.length);
-            
-            // Reconstruct the text with the highlighted match
-            highlightedText = before + highlighted + after;
-            
-            // Track this highlighted range
-            highlightedRanges.push({
-              start: currentIndex,
-              end: currentIndex + highlighted.length
-            });
-            
-            // Adjust the start index for the next search
-            startIndex = currentIndex + highlighted.length;
-          } else {
-            // Skip this match and move to the next position
-            startIndex = currentIndex + 1;
-          }
-        }
-      }
+    let highlightedText = '';
+    let position = 0;
+    [...source.spans].sort((a, b) => a[0] - b[0]).forEach(([start, end]) => {
+      if (start < position) return;
+      highlightedText += escapeHtml(originalText.substring(position, start));
+      highlightedText += `<span class="bg-accent-100 dark:bg-accent-900/50 text-accent-800 dark:text-accent-100 px-1 rounded">${escapeHtml(originalText.substring(start, end))}</span>`;
+      position = end;
     });
     
-    return highlightedText;
+    return highlightedText + escapeHtml(originalText.substring(position));
   };
 
   const getWordCount = (text: string): number => {
@@ -1238,12 +1035,68 @@ const ResultsPage: React.FC = () => {
     }
   };
 
+  // Search all chunks through the backend search service, which queries them
+  // concurrently under a shared rate limit and streams each chunk's results as NDJSON
+  const streamBackendSearch = async (
+    chunks: string[],
+    config: GoogleSearchConfig,
+    documentId: string,
+    token: string
+  ): Promise<ChunkSearchResults[]> => {
+    const response = await fetch(`${import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000'}/api/documents/${documentId}/search/`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Token ${token}`,
+      },
+      body: JSON.stringify({ chunks, max_results: config.maxResults || 5 })
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`Search request failed with status ${response.status}`);
+    }
+
+    const results: ChunkSearchResults[] = [];
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffered += decoder.decode(value, { stream: true });
+      const lines = buffered.split('\n');
+      buffered = lines.pop() || '';
+      for (const line of lines) {
+        if (line.trim()) {
+          results.push(JSON.parse(line));
+          setSearchProgress(Math.min(90, Math.round((results.length / chunks.length) * 90)));
+        }
+      }
+    }
+    if (buffered.trim()) {
+      results.push(JSON.parse(buffered));
+    }
+
+    // Results arrive in completion order
+    return results.sort((a, b) => a.chunkId - b.chunkId);
+  };
+
   // Helper function to search for similar content for multiple chunks with rate limiting
   const batchSearchSimilarContent = async (
     chunks: string[],
     config: GoogleSearchConfig,
     delayMs: number = 2000
   ): Promise<ChunkSearchResults[]> => {
+    const documentId = sessionStorage.getItem('documentId');
+    const token = localStorage.getItem('token');
+    if (documentId && token) {
+      try {
+        return await streamBackendSearch(chunks, config, documentId, token);
+      } catch (error) {
+        console.error('Backend search failed, searching from the browser instead:', error);
+      }
+    }
+
     const results: ChunkSearchResults[] = [];
     
     // Process chunks sequentially with delay to respect rate limits
@@ -1337,7 +1190,7 @@ const ResultsPage: React.FC = () => {
       
       setLoadingSuggestions(true);
       setRateLimitError(null);
-      const backendUrl = `${import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000'}/api/suggestions/generate/`;
+      const backendUrl = `${import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000'}/api/suggestions/generate/stream/`;
       console.log('Fetching suggestions from:', backendUrl);
       console.log('Original sources:', JSON.stringify(sources, null, 2));
       
@@ -1413,30 +1266,72 @@ const ResultsPage: React.FC = () => {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
             'Authorization': `Token ${token}`
           },
           body: JSON.stringify(requestBody)
         });
 
         console.log('Response status:', response.status);
-        console.log('Response headers:', Object.fromEntries(response.headers.entries()));
-        
-        const data = await response.json();
-        console.log('Response data:', data);
 
-        if (response.status === 429) {
-          setRateLimitError(data.message || 'API rate limit exceeded. Please try again later.');
-          setSuggestions(data.suggestions || []);
-          return;
-        }
-        
-        if (!response.ok) {
+        if (!response.ok || !response.body) {
+          const data = await response.json().catch(() => ({}));
           throw new Error(`Failed to generate suggestions: ${JSON.stringify(data)}`);
         }
-        
-        setSuggestions(data.suggestions || []);
-        if (data.rate_limited) {
-          setRateLimitError(data.rate_limit_message);
+
+        // Server-sent events: each suggestion is shown as soon as it is generated
+        setSuggestions([]);
+        let queuedJobId: number | null = null;
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffered += decoder.decode(value, { stream: true });
+          const events = buffered.split('\n\n');
+          buffered = events.pop() || '';
+          for (const block of events) {
+            const name = block.match(/^event: (.*)$/m)?.[1];
+            const payload = block.match(/^data: (.*)$/m)?.[1];
+            if (!name || !payload) continue;
+            const data = JSON.parse(payload);
+            if (name === 'suggestion') {
+              setSuggestions(prev => [...prev, data]);
+              setLoadingSuggestions(false);
+            } else if (name === 'citation') {
+              // The citation arrived after its suggestion was shown
+              setSuggestions(prev => prev.map(s => s.id === data.id ? { ...s, citation_text: data.citation_text } : s));
+            } else if (name === 'queued') {
+              // Rate limited: the remaining segments are generated by a background job
+              queuedJobId = data.id;
+            } else if (name === 'error') {
+              if (data.error === 'Rate limit exceeded') {
+                setRateLimitError(data.message || 'API rate limit exceeded. Please try again later.');
+              } else {
+                console.error('Suggestion stream error:', data);
+              }
+            }
+          }
+        }
+
+        if (queuedJobId !== null) {
+          setLoadingSuggestions(false);
+          const jobUrl = `${import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000'}/api/suggestions/jobs/${queuedJobId}/`;
+          while (true) {
+            await new Promise(resolve => setTimeout(resolve, 5000));
+            const jobResponse = await fetch(jobUrl, { headers: { 'Authorization': `Token ${token}` } });
+            if (!jobResponse.ok) break;
+            const job = await jobResponse.json();
+            if (job.status === 'done') {
+              setSuggestions(prev => [...prev, ...job.suggestions]);
+              break;
+            }
+            if (job.status === 'failed') {
+              console.error('Background suggestion job failed:', job.error);
+              break;
+            }
+          }
         }
       } catch (error) {
         console.error('Error details:', error);
@@ -17,10 +17,8 @@ interface Log {
 
 interface LogsResponse {
   logs: Log[];
-  total: number;
-  page: number;
   pageSize: number;
-  totalPages: number;
+  nextCursor: string | null;
 }
 
 const AdminLogsPage: React.FC = () => {
@@ -32,9 +30,11 @@ const AdminLogsPage: React.FC = () => {
   const [expandedLogId, setExpandedLogId] = useState<string | null>(null);
   const [isRefreshing, setIsRefreshing] = useState(false);
   const [error, setError] = useState<string | null>(null);
-  const [page, setPage] = useState(1);
-  const [totalLogs, setTotalLogs] = useState(0);
-  const [totalPages, setTotalPages] = useState(1);
+  // Cursors of the pages visited so far; the last one is the current page
+  const [cursors, setCursors] = useState<(string | null)[]>([null]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const page = cursors.length;
+  const cursor = cursors[cursors.length - 1];
 
   const fetchLogs = async (refresh = false) => {
     if (refresh) {
@@ -57,7 +57,7 @@ const AdminLogsPage: React.FC = () => {
       selectedLogLevels.forEach(level => queryParams.append('levels', level));
       if (searchQuery) queryParams.append('search', searchQuery);
       queryParams.append('timeRange', selectedTimeRange);
-      queryParams.append('page', page.toString());
+      if (cursor) queryParams.append('cursor', cursor);
       
       const response = await fetch(`/api/admin/logs/?${queryParams.toString()}`, {
         headers: {
@@ -72,8 +72,7 @@ const AdminLogsPage: React.FC = () => {
       
       const data: LogsResponse = await response.json();
       setLogs(data.logs);
-      setTotalLogs(data.total);
-      setTotalPages(data.totalPages);
+      setNextCursor(data.nextCursor);
     } catch (err) {
       console.error('Failed to fetch logs:', err);
       setError(err instanceof Error ? err.message : 'Failed to fetch logs');
@@ -85,24 +84,22 @@ const AdminLogsPage: React.FC = () => {
     }
   };
 
+  // A new cursors array (next/previous page or a filter change) triggers the fetch
   useEffect(() => {
     fetchLogs();
-  }, [selectedLogLevels, selectedTimeRange, page]);
+  }, [cursors]);
   
   // Debounced search
   useEffect(() => {
     const timer = setTimeout(() => {
-      if (page !== 1) {
-        setPage(1); // Reset to page 1 when search changes
-      } else {
-        fetchLogs(); // If already on page 1, just fetch
-      }
+      setCursors([null]); // Restart from the first page when search changes
     }, 500);
     
     return () => clearTimeout(timer);
   }, [searchQuery]);
 
   const handleLogLevelToggle = (level: string) => {
+    setCursors([null]);
     setSelectedLogLevels(prev => 
       prev.includes(level) 
         ? prev.filter(l => l !== level) 
@@ -134,13 +131,13 @@ const AdminLogsPage: React.FC = () => {
   
   const handlePreviousPage = () => {
     if (page > 1) {
-      setPage(page - 1);
+      setCursors(cursors.slice(0, -1));
     }
   };
   
   const handleNextPage = () => {
-    if (page < totalPages) {
-      setPage(page + 1);
+    if (nextCursor) {
+      setCursors([...cursors, nextCursor]);
     }
   };
   
@@ -253,7 +250,10 @@ const AdminLogsPage: React.FC = () => {
             <Clock className="h-4 w-4 text-gray-500 dark:text-gray-400" />
             <select
               value={selectedTimeRange}
-              onChange={(e) => setSelectedTimeRange(e.target.value)}
+              onChange={(e) => {
+                setSelectedTimeRange(e.target.value);
+                setCursors([null]);
+              }}
               className="text-sm border-none bg-transparent text-gray-700 dark:text-gray-300 focus:ring-0 focus:outline-none py-1 px-2"
             >
               <option value="today">Today</option>
@@ -354,7 +354,7 @@ const AdminLogsPage: React.FC = () => {
       {/* Pagination */}
       <div className="flex justify-between items-center">
         <div className="text-sm text-gray-700 dark:text-gray-300">
-          Showing <span className="font-medium">{logs.length}</span> of <span className="font-medium">{totalLogs}</span> logs
+          Page <span className="font-medium">{page}</span> &middot; showing <span className="font-medium">{logs.length}</span> logs
         </div>
         <div className="flex space-x-2">
           <button 
@@ -370,9 +370,9 @@ const AdminLogsPage: React.FC = () => {
           </button>
           <button 
             onClick={handleNextPage}
-            disabled={page >= totalPages || loading}
+            disabled={!nextCursor || loading}
             className={`px-3 py-1 border border-gray-300 dark:border-dark-700 rounded-md text-sm font-medium ${
-              page >= totalPages || loading
+              !nextCursor || loading
                 ? 'bg-gray-100 text-gray-400 dark:bg-dark-800 dark:text-gray-600 cursor-not-allowed'
                 : 'text-gray-700 dark:text-gray-300 bg-white dark:bg-dark-800 hover:bg-gray-50 dark:hover:bg-dark-700'
             }`}